@@ -1,32 +1,115 @@
 from contextvars import ContextVar
+from collections.abc import Callable, Iterator
 from fastapi import Depends, Query
-from pydantic import Json
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Json
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.api.serialization import validate_fields
 from app.models.user import User
-from app.core.security import get_current_user
-from app.db.session import get_db
+from app.core.security import get_current_async_user, get_current_user
+from app.db.session import get_async_db, get_db
 from app.core.config import settings
+from app.core.enums import ExportFormat
+from app.db.export import MEDIA_TYPES
 
 language_code: ContextVar[str] = ContextVar("language_code", default=settings.DEFAULT_LANG_CODE)
 
 
-async def common_parameters(
-    db: Session = Depends(get_db),
+# The parameter dependencies are async (run in the event loop, not in the threadpool) so that
+# the language code set here is in the context that the route runs with
+async def list_parameters(
     filter_spec: Json = Query([], alias="filter"),
     sort_spec: Json = Query([], alias="sort"),
     page: int = Query(default=1, ge=1, description="Page number"),
     size: int = Query(default=50, ge=1, le=100, description="Page size"),
+    fields: str | None = Query(
+        default=None,
+        description="Comma-separated fields to return. Ex: id,name,account.name",
+    ),
     lang_code: str | None = None,
-    user: User = Depends(get_current_user),
 ):
     if lang_code is not None:
         language_code.set(lang_code)
     return {
-        "db": db,
         "filter_spec": filter_spec,
         "sort_spec": sort_spec,
         "offset": size * (page - 1),
         "limit": size,
-        "user": user,
+        "fields": parse_fields(fields),
     }
+
+
+# The requested fields are validated against the read schema of the route before the query is
+# built, so that fields outside the read schema are never queried
+def common_parameters(schema: type[BaseModel]) -> Callable:
+    async def parameters(
+        db: Session = Depends(get_db),
+        parameters: dict = Depends(list_parameters),
+        user: User = Depends(get_current_user),
+    ):
+        validate_fields(schema, parameters["fields"])
+        return {"db": db, **parameters, "user": user}
+
+    return parameters
+
+
+def async_common_parameters(schema: type[BaseModel]) -> Callable:
+    async def parameters(
+        db: AsyncSession = Depends(get_async_db),
+        parameters: dict = Depends(list_parameters),
+        user: User = Depends(get_current_async_user),
+    ):
+        validate_fields(schema, parameters["fields"])
+        return {"db": db, **parameters, "user": user}
+
+    return parameters
+
+
+def parse_fields(fields: str | None) -> list[str] | None:
+    """Parses the comma-separated fields parameter, ignoring blanks and duplicates"""
+    if not fields:
+        return None
+    parsed = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    return parsed or None
+
+
+def export_parameters(schema: type[BaseModel]) -> Callable:
+    async def parameters(
+        db: Session = Depends(get_db),
+        filter_spec: Json = Query([], alias="filter"),
+        sort_spec: Json = Query([], alias="sort"),
+        export_format: ExportFormat = Query(default=ExportFormat.csv, alias="format"),
+        fields: str | None = Query(
+            default=None,
+            description="Comma-separated fields to export. Ex: id,name,account.name",
+        ),
+        lang_code: str | None = None,
+        user: User = Depends(get_current_user),
+    ):
+        if lang_code is not None:
+            language_code.set(lang_code)
+        parsed_fields = parse_fields(fields)
+        validate_fields(schema, parsed_fields)
+        return {
+            "db": db,
+            "filter_spec": filter_spec,
+            "sort_spec": sort_spec,
+            "export_format": export_format,
+            "user": user,
+            "fields": parsed_fields,
+        }
+
+    return parameters
+
+
+def export_response(content: Iterator[str], filename: str, export_format: ExportFormat):
+    """Returns a streaming response for the exported content"""
+    return StreamingResponse(
+        content,
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{export_format.value}"'
+        },
+    )
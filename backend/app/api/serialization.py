@@ -0,0 +1,168 @@
+from collections.abc import Callable
+from decimal import Decimal
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Optional
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, create_model
+from pydantic.fields import ModelField, SHAPE_SINGLETON
+
+from app.core.config import settings
+from app.core.exceptions import BadFieldsFormat
+from app.db.fields import get_field_path
+from app.models.base import AppBase, Page
+
+Projection = Callable[[Any], dict]
+
+
+def orjson_default(value):
+    """Serializes the types which orjson does not support natively"""
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError
+
+
+def _get_converter(type_: Any) -> Callable | None:
+    """Returns the conversion Pydantic would apply for the field type (Ex: Decimal to float)"""
+    if not isinstance(type_, type) or issubclass(type_, (bool, Enum)):
+        return None
+    if issubclass(type_, int):
+        return int
+    if issubclass(type_, float):
+        return float
+    return None
+
+
+def _compile_field(field: ModelField) -> Callable[[Any], Any]:
+    name = field.name
+
+    if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+        project = compile_projection(field.type_)
+
+        if field.shape == SHAPE_SINGLETON:
+
+            def get_model(obj):
+                value = getattr(obj, name, None)
+                return None if value is None else project(value)
+
+            return get_model
+
+        def get_model_list(obj):
+            values = getattr(obj, name, None)
+            return None if values is None else [project(value) for value in values]
+
+        return get_model_list
+
+    convert = _get_converter(field.type_)
+    if convert is None or field.shape != SHAPE_SINGLETON:
+        return lambda obj: getattr(obj, name, None)
+
+    def get_converted(obj):
+        value = getattr(obj, name, None)
+        return None if value is None else convert(value)
+
+    return get_converted
+
+
+@lru_cache
+def compile_projection(schema: type[BaseModel]) -> Projection:
+    """Compiles a function that projects an ORM object into a dictionary with the fields of
+    the read schema, without running Pydantic validation"""
+    getters = [(field.alias, _compile_field(field)) for field in schema.__fields__.values()]
+
+    def project(obj) -> dict:
+        return {key: getter(obj) for key, getter in getters}
+
+    return project
+
+
+def _is_model_field(field: ModelField) -> bool:
+    return isinstance(field.type_, type) and issubclass(field.type_, BaseModel)
+
+
+@lru_cache
+def derive_subset_model(schema: type[BaseModel], fields: tuple[str, ...]) -> type[BaseModel]:
+    """Derives a model with only the requested fields of the read schema. All the fields are
+    optional since related objects are outer joined."""
+    definitions: dict[str, Any] = {}
+    related_fields: dict[str, list[str]] = {}
+
+    for path in fields:
+        name, related_name = get_field_path(path)
+        field = schema.__fields__.get(name)
+
+        if field is None:
+            raise BadFieldsFormat(f"Field {path} not valid")
+
+        if related_name is None:
+            if _is_model_field(field):
+                raise BadFieldsFormat(f"Field {name} is an object. Request '{name}.<field>' instead")
+            definitions[name] = (Optional[field.outer_type_], None)
+        else:
+            if not _is_model_field(field) or field.shape != SHAPE_SINGLETON:
+                raise BadFieldsFormat(f"Field {path} not valid")
+            related_fields.setdefault(name, []).append(related_name)
+
+    for name, names in related_fields.items():
+        related_model = derive_subset_model(schema.__fields__[name].type_, tuple(names))
+        definitions[name] = (Optional[related_model], None)
+
+    return create_model(f"{schema.__name__}Subset", __base__=AppBase, **definitions)
+
+
+def validate_fields(schema: type[BaseModel], fields: list[str] | None) -> None:
+    """Raises BadFieldsFormat if a requested field is not in the read schema. Called before the
+    query is built so that fields outside the read schema are never queried"""
+    if fields:
+        derive_subset_model(schema, tuple(fields))
+
+
+def _nest_row(row, fields: list[str]) -> dict:
+    """Converts a row labelled with field paths into a (nested) dictionary. A related object
+    whose joined columns are all NULL (no related row) is None"""
+    item: dict[str, Any] = {}
+    for path in fields:
+        name, related_name = get_field_path(path)
+        if related_name is None:
+            item[name] = row[path]
+        else:
+            item.setdefault(name, {})[related_name] = row[path]
+
+    for name, value in item.items():
+        if isinstance(value, dict) and all(column is None for column in value.values()):
+            item[name] = None
+    return item
+
+
+def page_response(page: dict, schema: type[BaseModel], fields: list[str] | None = None):
+    """Returns the page as is (to be validated against the route's response model) or,
+    if fast serialization is enabled, as a response encoded with the precompiled projection.
+
+    If only some fields were requested, the page is validated against a subset of the schema."""
+    if fields:
+        subset_model = derive_subset_model(schema, tuple(fields))
+        subset_page = Page[subset_model](  # type: ignore
+            items=[_nest_row(row, fields) for row in page["items"]],
+            total=page["total"],
+            page=page["page"],
+            size=page["size"],
+        )
+        return Response(
+            content=orjson.dumps(subset_page.dict(), default=orjson_default),
+            media_type="application/json",
+        )
+
+    if not settings.FAST_SERIALIZATION:
+        return page
+
+    project = compile_projection(schema)
+    content = {
+        "items": [project(item) for item in page["items"]],
+        "total": page["total"],
+        "page": int(page["page"]),
+        "size": page["size"],
+    }
+    return Response(
+        content=orjson.dumps(content, default=orjson_default), media_type="application/json"
+    )
@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends
 
 from app.api.v1.account import router as account_router
+from app.api.v1.analytics import router as analytics_router
 from app.api.v1.answer import router as answer_router
 from app.api.v1.industry import router as industry_router
 from app.api.v1.opp_score import router as opp_score_router
 from app.api.v1.opp_stage import router as opp_stage_router
 from app.api.v1.opp_template import opp_template_router, opp_template_task_router
 from app.api.v1.opportunity import router as opportunity_router
+from app.api.v1.search import router as search_router
 from app.api.v1.task import router as task_router
 from app.api.v1.users import auth_router
 from app.api.v1.users import router as user_router
@@ -21,12 +23,16 @@ api_router.include_router(auth_router)
 authenticated_api_router.include_router(user_router)
 authenticated_api_router.include_router(opp_stage_router)
 authenticated_api_router.include_router(industry_router)
-authenticated_api_router.include_router(account_router)
 authenticated_api_router.include_router(opportunity_router)
 authenticated_api_router.include_router(task_router)
 authenticated_api_router.include_router(opp_template_router)
 authenticated_api_router.include_router(opp_template_task_router)
 authenticated_api_router.include_router(answer_router)
 authenticated_api_router.include_router(opp_score_router)
+authenticated_api_router.include_router(search_router)
+authenticated_api_router.include_router(analytics_router)
 
 api_router.include_router(authenticated_api_router, dependencies=[Depends(get_current_user)])
+# Each account route authenticates the user itself: the async routes with the async session
+# (get_current_async_user), so that they don't take a threadpool thread and a sync connection
+api_router.include_router(account_router)
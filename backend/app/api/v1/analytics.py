@@ -0,0 +1,34 @@
+from datetime import date, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db
+from app.crud.analytics import get_pipeline_trends
+from app.models.user import User
+from app.models.analytics import PipelineTrend
+from app.core.security import get_current_user
+from app.core.enums import AnalyticsGroupBy, AnalyticsInterval
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+
+@router.get(
+    "/pipeline",
+    response_model=list[PipelineTrend],
+    summary="Get the pipeline trends by week or month from the daily pipeline snapshots",
+)
+def get_pipeline_analytics(
+    interval: AnalyticsInterval = AnalyticsInterval.month,
+    start: date | None = Query(default=None, description="Start date. Default: 1 year before end"),
+    end: date | None = Query(default=None, description="End date. Default: today"),
+    group_by: AnalyticsGroupBy | None = None,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    end = end or date.today()
+    start = start or end - timedelta(days=365)
+    if start > end:
+        raise HTTPException(status_code=400, detail="The start date must be before the end date.")
+    return get_pipeline_trends(
+        db=db, user=user, interval=interval, start=start, end=end, group_by=group_by
+    )
@@ -4,9 +4,11 @@ from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.crud.answer import answer
 from app.models.base import Page
-from app.api.common import common_parameters
+from app.api.common import common_parameters, export_parameters, export_response
+from app.api.serialization import page_response
 from app.models.user import User
 from app.core.security import get_current_user
+from app.core.executors import ml_executor
 from app.models.answer import (
     AnswerCreate,
     AnswerRead,
@@ -19,12 +21,17 @@ router = APIRouter(prefix="/answers", tags=["answers"])
 
 
 @router.get("/", response_model=Page[AnswerRead], summary="Get all answer entries")
-async def get_answers(common: dict = Depends(common_parameters)):
-    return answer.get_all(**common)
+def get_answers(common: dict = Depends(common_parameters(AnswerRead))):
+    return page_response(answer.get_all(**common), AnswerRead, common["fields"])
+
+
+@router.get("/export", summary="Export all answer entries")
+def export_answers(common: dict = Depends(export_parameters(AnswerRead))):
+    return export_response(answer.export(**common), "answers", common["export_format"])
 
 
 @router.get("/{id}", response_model=AnswerRead, summary="Get an answer entry based on the ID")
-async def get_answer(
+def get_answer(
     id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)
 ):
     result = answer.get(db=db, id=id, user=user)
@@ -34,7 +41,7 @@ async def get_answer(
 
 
 @router.post("/", response_model=AnswerRead, summary="Create an answer entry")
-async def create_answer(
+def create_answer(
     answer_in: AnswerCreate,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
@@ -43,7 +50,7 @@ async def create_answer(
 
 
 @router.put("/{id}", response_model=AnswerRead, summary="Update an existing answer entry")
-async def update_answer(
+def update_answer(
     id: int,
     answer_in: AnswerUpdate,
     db: Session = Depends(get_db),
@@ -56,7 +63,7 @@ async def update_answer(
 
 
 @router.delete("/{id}", summary="Delete an answer entry")
-async def delete_answer(
+def delete_answer(
     id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)
 ):
     answer_to_delete = answer.get(db=db, id=id, user=user)
@@ -71,9 +78,9 @@ async def delete_answer(
     response_model=list[AnswerRecommendation],
     summary="Get answer recommendations based on the question",
 )
-async def recommend_answers(
+def recommend_answers(
     question: Question,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    return answer.get_recommendations(question=question, db=db, user=user)
+    return ml_executor.run(answer.get_recommendations, question=question, db=db, user=user)
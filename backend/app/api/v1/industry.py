@@ -4,7 +4,8 @@ from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.crud.base import CRUDBaseDesc
 from app.models.base import Page
-from app.api.common import common_parameters
+from app.api.common import common_parameters, export_parameters, export_response
+from app.api.serialization import page_response
 from app.models.user import User
 from app.core.security import get_current_user
 from app.models.industry import (
@@ -22,12 +23,17 @@ industry = CRUDBaseDesc[Industry, IndustryDescription, IndustryCreate, IndustryU
 
 
 @router.get("/", response_model=Page[IndustryRead], summary="Get all industries")
-async def get_industries(common: dict = Depends(common_parameters)):
-    return industry.get_all(**common)
+def get_industries(common: dict = Depends(common_parameters(IndustryRead))):
+    return page_response(industry.get_all(**common), IndustryRead, common["fields"])
+
+
+@router.get("/export", summary="Export all industries")
+def export_industries(common: dict = Depends(export_parameters(IndustryRead))):
+    return export_response(industry.export(**common), "industries", common["export_format"])
 
 
 @router.get("/{id}", response_model=IndustryRead, summary="Get an industry based on the ID")
-async def get_industry(
+def get_industry(
     id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)
 ):
     result = industry.get(db=db, id=id, user=user)
@@ -37,7 +43,7 @@ async def get_industry(
 
 
 @router.post("/", response_model=IndustryRead, summary="Create an industry")
-async def create_industry(
+def create_industry(
     industry_in: IndustryCreate,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
@@ -46,7 +52,7 @@ async def create_industry(
 
 
 @router.put("/{id}", response_model=IndustryRead, summary="Update an existing industry")
-async def update_industry(
+def update_industry(
     id: int,
     industry_in: IndustryUpdate,
     db: Session = Depends(get_db),
@@ -59,7 +65,7 @@ async def update_industry(
 
 
 @router.delete("/{id}", summary="Delete an industry")
-async def delete_industry(
+def delete_industry(
     id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)
 ):
     industry_to_delete = industry.get(db=db, id=id, user=user)
@@ -7,6 +7,7 @@ from app.core.permissions import permission_exception
 from app.core.enums import MLAlgorithm, Scoring
 from app.models.ml import ParamDist, Params, SearchResult, TrainResult
 from app.ml.opp_score import opp_score
+from app.core.executors import ml_executor
 
 ALLOWED_ROLES = ["ADMIN"]
 router = APIRouter(prefix="/opp_score", tags=["opportunity score"])
@@ -17,7 +18,7 @@ router = APIRouter(prefix="/opp_score", tags=["opportunity score"])
     response_model=SearchResult,
     summary="Search for opportunity score ML model with the best hyperparameters",
 )
-async def search_opp_score_model(
+def search_opp_score_model(
     param_dist: ParamDist,
     algorithm: MLAlgorithm = MLAlgorithm.lightgbm,
     scoring: Scoring = Scoring.f1,
@@ -29,7 +30,8 @@ async def search_opp_score_model(
     db_schema.set(schema)
     if user.role_id not in ALLOWED_ROLES:
         raise permission_exception
-    results = opp_score.search(
+    results = ml_executor.run(
+        opp_score.search,
         param_dist=param_dist,
         algorithm=algorithm,
         scoring=scoring,
@@ -46,7 +48,7 @@ async def search_opp_score_model(
     response_model=TrainResult,
     summary="Train and evaluate opportunity score ML model",
 )
-async def train_opp_score_model(
+def train_opp_score_model(
     params: Params,
     algorithm: MLAlgorithm = MLAlgorithm.lightgbm,
     set_as_default: bool = True,
@@ -56,7 +58,9 @@ async def train_opp_score_model(
     db_schema.set(schema)
     if user.role_id not in ALLOWED_ROLES:
         raise permission_exception
-    results = opp_score.train(algorithm=algorithm, params=params, set_as_default=set_as_default)
+    results = ml_executor.run(
+        opp_score.train, algorithm=algorithm, params=params, set_as_default=set_as_default
+    )
     if not results:
         raise HTTPException(status_code=404, detail="The operation yielded no results")
     return results
@@ -4,7 +4,8 @@ from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.crud.base import CRUDBaseDesc
 from app.models.base import Page
-from app.api.common import common_parameters
+from app.api.common import common_parameters, export_parameters, export_response
+from app.api.serialization import page_response
 from app.models.user import User
 from app.core.security import get_current_user
 from app.models.opp_stage import (
@@ -22,8 +23,13 @@ opp_stage = CRUDBaseDesc[OppStage, OppStageDescription, OppStageCreate, OppStage
 
 
 @router.get("/", response_model=Page[OppStageRead], summary="Get all opportunity stages")
-async def get_opp_stages(common: dict = Depends(common_parameters)):
-    return opp_stage.get_all(**common)
+def get_opp_stages(common: dict = Depends(common_parameters(OppStageRead))):
+    return page_response(opp_stage.get_all(**common), OppStageRead, common["fields"])
+
+
+@router.get("/export", summary="Export all opportunity stages")
+def export_opp_stages(common: dict = Depends(export_parameters(OppStageRead))):
+    return export_response(opp_stage.export(**common), "opp_stages", common["export_format"])
 
 
 @router.get(
@@ -31,7 +37,7 @@ async def get_opp_stages(common: dict = Depends(common_parameters)):
     response_model=OppStageRead,
     summary="Get an opportunity stage based on the ID",
 )
-async def get_opp_stage(
+def get_opp_stage(
     id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)
 ):
     result = opp_stage.get(db=db, id=id, user=user)
@@ -43,7 +49,7 @@ async def get_opp_stage(
 
 
 @router.post("/", response_model=OppStageRead, summary="Create an opportunity stage")
-async def create_opp_stage(
+def create_opp_stage(
     opp_stage_in: OppStageCreate,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
@@ -52,7 +58,7 @@ async def create_opp_stage(
 
 
 @router.put("/{id}", response_model=OppStageRead, summary="Update an existing opportunity stage")
-async def update_opp_stage(
+def update_opp_stage(
     id: int,
     opp_stage_in: OppStageUpdate,
     db: Session = Depends(get_db),
@@ -67,7 +73,7 @@ async def update_opp_stage(
 
 
 @router.delete("/{id}", summary="Delete an opportunity stage")
-async def delete_opp_stage(
+def delete_opp_stage(
     id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)
 ):
     opp_stage_to_delete = opp_stage.get(db=db, id=id, user=user)
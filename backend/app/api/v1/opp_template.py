@@ -4,7 +4,8 @@ from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.crud.opp_template import opp_template, opp_template_task
 from app.models.base import Page
-from app.api.common import common_parameters
+from app.api.common import common_parameters, export_parameters, export_response
+from app.api.serialization import page_response
 from app.models.user import User
 from app.core.security import get_current_user
 from app.models.opp_template import (
@@ -25,8 +26,13 @@ opp_template_task_router = APIRouter(
 @opp_template_router.get(
     "/", response_model=Page[OppTemplateRead], summary="Get all opportunity templates"
 )
-async def get_opp_templates(common: dict = Depends(common_parameters)):
-    return opp_template.get_all(**common)
+def get_opp_templates(common: dict = Depends(common_parameters(OppTemplateRead))):
+    return page_response(opp_template.get_all(**common), OppTemplateRead, common["fields"])
+
+
+@opp_template_router.get("/export", summary="Export all opportunity templates")
+def export_opp_templates(common: dict = Depends(export_parameters(OppTemplateRead))):
+    return export_response(opp_template.export(**common), "opp_templates", common["export_format"])
 
 
 @opp_template_router.get(
@@ -34,7 +40,7 @@ async def get_opp_templates(common: dict = Depends(common_parameters)):
     response_model=OppTemplateRead,
     summary="Get an opportunity template based on the ID",
 )
-async def get_opp_template(
+def get_opp_template(
     id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)
 ):
     result = opp_template.get(db=db, id=id, user=user)
@@ -49,7 +55,7 @@ async def get_opp_template(
 @opp_template_router.post(
     "/", response_model=OppTemplateRead, summary="Create an opportunity template"
 )
-async def create_opp_template(
+def create_opp_template(
     opp_template_in: OppTemplateCreate,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
@@ -62,7 +68,7 @@ async def create_opp_template(
     response_model=OppTemplateRead,
     summary="Update an existing opportunity template",
 )
-async def update_opp_template(
+def update_opp_template(
     id: int,
     opp_template_in: OppTemplateUpdate,
     db: Session = Depends(get_db),
@@ -80,7 +86,7 @@ async def update_opp_template(
 
 
 @opp_template_router.delete("/{id}", summary="Delete an opportunity template")
-async def delete_opp_template(
+def delete_opp_template(
     id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)
 ):
     opp_template_to_delete = opp_template.get(db=db, id=id, user=user)
@@ -98,7 +104,7 @@ async def delete_opp_template(
     response_model=list[OppTemplateTaskRead],
     summary="Get all tasks based on opportunity template ID",
 )
-async def get_tasks_by_opp_template(
+def get_tasks_by_opp_template(
     id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)
 ):
     result = opp_template_task.get_by_opp_template(db=db, opp_template_id=id, user=user)
@@ -114,7 +120,7 @@ async def get_tasks_by_opp_template(
     response_model=OppTemplateTaskRead,
     summary="Add a task to an opportunity template",
 )
-async def create_opp_template_task(
+def create_opp_template_task(
     opp_template_task_in: OppTemplateTaskCreate,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
@@ -127,7 +133,7 @@ async def create_opp_template_task(
     response_model=OppTemplateTaskRead,
     summary="Update a task in an opportunity template",
 )
-async def update_opp_template_task(
+def update_opp_template_task(
     id: int,
     opp_template_task_in: OppTemplateTaskUpdate,
     db: Session = Depends(get_db),
@@ -148,7 +154,7 @@ async def update_opp_template_task(
 
 
 @opp_template_task_router.delete("/{id}", summary="Delete a task in an opportunity template")
-async def delete_opp_template_task(
+def delete_opp_template_task(
     id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)
 ):
     opp_template_task_to_delete = opp_template_task.get(db=db, id=id, user=user)
@@ -7,7 +7,8 @@ from pathlib import Path
 from app.db.session import get_db, get_schema_from_request, db_schema
 from app.crud.opportunity import opportunity
 from app.models.base import Page
-from app.api.common import common_parameters
+from app.api.common import common_parameters, export_parameters, export_response
+from app.api.serialization import page_response
 from app.models.user import User
 from app.core.security import get_current_user
 from app.core.permissions import permission_exception
@@ -18,13 +19,18 @@ router = APIRouter(prefix="/opportunities", tags=["opportunities"])
 
 
 @router.get("/", response_model=Page[OpportunityRead], summary="Get all opportunities")
-async def get_opportunities(common: dict = Depends(common_parameters)):
-    return opportunity.get_all(**common)
+def get_opportunities(common: dict = Depends(common_parameters(OpportunityRead))):
+    return page_response(opportunity.get_all(**common), OpportunityRead, common["fields"])
 
 
 @router.get("/open", response_model=Page[OpportunityRead], summary="Get all open opportunities")
-async def get_open_opportunities(common: dict = Depends(common_parameters)):
-    return opportunity.get_open(**common)
+def get_open_opportunities(common: dict = Depends(common_parameters(OpportunityRead))):
+    return page_response(opportunity.get_open(**common), OpportunityRead, common["fields"])
+
+
+@router.get("/export", summary="Export all opportunities")
+def export_opportunities(common: dict = Depends(export_parameters(OpportunityRead))):
+    return export_response(opportunity.export(**common), "opportunities", common["export_format"])
 
 
 @router.get(
@@ -32,7 +38,7 @@ async def get_open_opportunities(common: dict = Depends(common_parameters)):
     response_model=OpportunityRead,
     summary="Get an opportunity based on the ID",
 )
-async def get_opportunity(
+def get_opportunity(
     id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)
 ):
     result = opportunity.get(db=db, id=id, user=user)
@@ -42,7 +48,7 @@ async def get_opportunity(
 
 
 @router.post("/", response_model=OpportunityRead, summary="Create an opportunity")
-async def create_opportunity(
+def create_opportunity(
     opportunity_in: OpportunityCreate,
     db: Session = Depends(get_db),
     schema: str = Depends(get_schema_from_request),
@@ -53,7 +59,7 @@ async def create_opportunity(
 
 
 @router.put("/{id}", response_model=OpportunityRead, summary="Update an existing opportunity")
-async def update_opportunity(
+def update_opportunity(
     id: int,
     opportunity_in: OpportunityUpdate,
     db: Session = Depends(get_db),
@@ -68,7 +74,7 @@ async def update_opportunity(
 
 
 @router.delete("/{id}", summary="Delete an opportunity")
-async def delete_opportunity(
+def delete_opportunity(
     id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)
 ):
     opportunity_to_delete = opportunity.get(db=db, id=id, user=user)
@@ -79,7 +85,7 @@ async def delete_opportunity(
 
 
 @router.post("/upload", summary="Upload a file containing opportunity data")
-async def upload_opportunities(
+def upload_opportunities(
     upload_file: UploadFile = File(...),
     user: User = Depends(get_current_user),
     schema: str = Depends(get_schema_from_request),
@@ -106,7 +112,7 @@ async def upload_opportunities(
     response_model=OpportunityRead,
     summary="Update the AI score for an opportunity",
 )
-async def update_opp_score(
+def update_opp_score(
     id: int,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
@@ -120,14 +126,14 @@ async def update_opp_score(
 
 
 @router.get("/dashboard/user", summary="Get user opportunity dashboard data")
-async def get_opp_dashboard_user(
+def get_opp_dashboard_user(
     db: Session = Depends(get_db), user: User = Depends(get_current_user)
 ):
     return opportunity.get_user_dashboard(db=db, user=user)
 
 
 @router.get("/dashboard/admin", summary="Get admin opportunity dashboard data")
-async def get_opp_dashboard_admin(
+def get_opp_dashboard_admin(
     db: Session = Depends(get_db), user: User = Depends(get_current_user)
 ):
     return opportunity.get_admin_dashboard(db=db, user=user)
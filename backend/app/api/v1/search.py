@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db
+from app.crud.search import search
+from app.models.user import User
+from app.models.search import SearchHit
+from app.core.security import get_current_user
+from app.core.enums import SearchType
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+@router.get(
+    "/",
+    response_model=list[SearchHit],
+    summary="Search accounts, opportunities, tasks and answers",
+)
+def search_all(
+    q: str = Query(..., min_length=2, max_length=200, description="Words (or prefixes) to search"),
+    types: list[SearchType] = Query(default=[], description="Types to search. All if empty"),
+    limit: int = Query(default=20, ge=1, le=50),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    return search(db=db, text=q, user=user, types=types, limit=limit)
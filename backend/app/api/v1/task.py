@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.db.session import get_db
 from app.crud.task import task
 from app.models.base import Page
-from app.api.common import common_parameters
+from app.api.common import common_parameters, export_parameters, export_response
+from app.api.serialization import page_response
 from app.models.user import User
 from app.core.security import get_current_user
 from app.models.task import TaskCreate, TaskRead, TaskUpdate
@@ -14,12 +15,17 @@ router = APIRouter(prefix="/tasks", tags=["tasks"])
 
 
 @router.get("/", response_model=Page[TaskRead], summary="Get all tasks for the current user")
-async def get_tasks(common: dict = Depends(common_parameters)):
-    return task.get_all(**common)
+def get_tasks(common: dict = Depends(common_parameters(TaskRead))):
+    return page_response(task.get_all(**common), TaskRead, common["fields"])
+
+
+@router.get("/export", summary="Export all tasks for the current user")
+def export_tasks(common: dict = Depends(export_parameters(TaskRead))):
+    return export_response(task.export(**common), "tasks", common["export_format"])
 
 
 @router.get("/{id}", response_model=TaskRead, summary="Get a task based on the ID")
-async def get_task(id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def get_task(id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
     result = task.get(db=db, id=id, user=user)
     if not result:
         raise HTTPException(status_code=404, detail="The task with this ID does not exist.")
@@ -31,15 +37,15 @@ async def get_task(id: int, db: Session = Depends(get_db), user: User = Depends(
     response_model=Page[TaskRead],
     summary="Get all tasks based on the opportunity ID",
 )
-async def get_tasks_by_opp(opp_id: int, common: dict = Depends(common_parameters)):
+def get_tasks_by_opp(opp_id: int, common: dict = Depends(common_parameters(TaskRead))):
     result = task.get_by_opp(opp_id=opp_id, **common)
     if not result:
         raise HTTPException(status_code=404, detail="No tasks for this opportunity were found.")
-    return result
+    return page_response(result, TaskRead, common["fields"])
 
 
 @router.post("/", response_model=TaskRead, summary="Create a task")
-async def create_task(
+def create_task(
     task_in: TaskCreate,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
@@ -48,7 +54,7 @@ async def create_task(
 
 
 @router.put("/{id}", response_model=TaskRead, summary="Update an existing task")
-async def update_task(
+def update_task(
     id: int,
     task_in: TaskUpdate,
     db: Session = Depends(get_db),
@@ -61,7 +67,7 @@ async def update_task(
 
 
 @router.delete("/{id}", summary="Delete a task")
-async def delete_task(
+def delete_task(
     id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)
 ):
     task_to_delete = task.get(db=db, id=id, user=user)
@@ -72,5 +78,11 @@ async def delete_task(
 
 
 @router.get("/dashboard/data", summary="Get task dashboard data")
-async def get_task_dashboard(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    return task.get_dashboard_data(db=db, user=user)
+def get_task_dashboard(
+    owner_ids: list[int] | None = Query(
+        default=None, alias="owner_id", description="Owners of the team (managers only)"
+    ),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    return task.get_dashboard_data(db=db, user=user, owner_ids=owner_ids)
@@ -1,16 +1,20 @@
 from datetime import timedelta
-from fastapi import Depends, APIRouter, HTTPException
+from fastapi import Depends, APIRouter, HTTPException, Request
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
 from app.crud.user import user
 from app.models.base import Page
-from app.api.common import common_parameters
+from app.api.common import common_parameters, export_parameters, export_response
+from app.api.serialization import page_response
 from app.models.user import User, UserCreate, UserRead, UserUpdate
 from app.core.security import (
     get_current_user,
     authenticate_user,
+    check_login_rate,
+    get_client_ip,
     create_access_token,
     get_hashed_password,
     JWT_EXP,
@@ -21,12 +25,17 @@ auth_router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.get("/", response_model=Page[UserRead], summary="Get all users")
-async def get_users(common: dict = Depends(common_parameters)):
-    return user.get_all(**common)
+def get_users(common: dict = Depends(common_parameters(UserRead))):
+    return page_response(user.get_all(**common), UserRead, common["fields"])
+
+
+@router.get("/export", summary="Export all users")
+def export_users(common: dict = Depends(export_parameters(UserRead))):
+    return export_response(user.export(**common), "users", common["export_format"])
 
 
 @router.get("/{id}", response_model=UserRead, summary="Get a user based on the ID")
-async def get_user(
+def get_user(
     id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -38,7 +47,7 @@ async def get_user(
 
 
 @router.post("/", response_model=UserRead, summary="Create a user")
-async def create_user(
+def create_user(
     user_in: UserCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -48,7 +57,7 @@ async def create_user(
 
 
 @router.put("/{id}", response_model=UserRead, summary="Update an existing user")
-async def update_user(
+def update_user(
     id: int,
     user_in: UserUpdate,
     db: Session = Depends(get_db),
@@ -62,7 +71,7 @@ async def update_user(
 
 # TODO: The delete path function is for testing only and should be removed
 @router.delete("/{id}", summary="Delete a user")
-async def delete_user(
+def delete_user(
     id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -76,10 +85,12 @@ async def delete_user(
 
 @auth_router.post("/login")
 async def login_access_token(
-    db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    form_data: OAuth2PasswordRequestForm = Depends(),
 ):
-    user = authenticate_user(db=db, email=form_data.username, password=form_data.password)
-    user_data = UserRead(**vars(user))
+    check_login_rate(client_ip=get_client_ip(request), email=form_data.username)
+    user = await authenticate_user(db=db, email=form_data.username, password=form_data.password)
 
     if not user:
         raise HTTPException(
@@ -92,6 +103,7 @@ async def login_access_token(
         if not user.is_active:
             raise HTTPException(status_code=403, detail="User is not active")
 
+        user_data = UserRead(**vars(user))
         access_token_expires = timedelta(minutes=JWT_EXP)
         access_token = create_access_token(
             data={"sub": user.email}, expires_delta=access_token_expires
@@ -0,0 +1,112 @@
+"""In-process caches with a time to live, a maximum size and hit statistics (on /metrics)"""
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from threading import Lock
+from time import monotonic
+from typing import Any
+
+from app.core.metrics import register_collector
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds. Each key has a version which
+    is incremented when the key is invalidated (and the generation of the cache when several keys
+    are), so that a value loaded before an invalidation is not cached after it"""
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 1024) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = Lock()
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._versions: dict[Hashable, int] = {}
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        register_collector(f"{name}_cache", self.statistics)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the cached value of the key or the default"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > monotonic():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._set(key, value)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Returns the cached value of the key or loads (and caches) it"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > monotonic():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+            version = (self._generation, self._versions.get(key, 0))
+
+        value = loader()
+
+        with self._lock:
+            if (self._generation, self._versions.get(key, 0)) == version:
+                self._set(key, value)
+        return value
+
+    async def get_or_load_async(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Returns the cached value of the key or loads (and caches) it with an async loader"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > monotonic():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+            version = (self._generation, self._versions.get(key, 0))
+
+        value = await loader()
+
+        with self._lock:
+            if (self._generation, self._versions.get(key, 0)) == version:
+                self._set(key, value)
+        return value
+
+    def _set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._invalidations += 1
+
+    def invalidate_matching(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Invalidates the keys for which the predicate is true. Ex: all the keys of a tenant"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+            self._generation += 1
+            self._invalidations += 1
+
+    def clear(self) -> None:
+        self.invalidate_matching(lambda key: True)
+
+    def statistics(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else None,
+                "invalidations": self._invalidations,
+            }
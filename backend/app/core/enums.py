@@ -37,3 +37,26 @@ class Scoring(str, Enum):
     f1 = "f1"
     precision = "precision"
     recall = "recall"
+
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+
+
+class SearchType(str, Enum):
+    account = "account"
+    opportunity = "opportunity"
+    task = "task"
+    answer = "answer"
+
+
+class AnalyticsInterval(str, Enum):
+    week = "week"
+    month = "month"
+
+
+class AnalyticsGroupBy(str, Enum):
+    owner = "owner"
+    industry = "industry"
+    stage = "stage"
@@ -1,6 +1,16 @@
-class BadFilterFormat(Exception):
+class BadSpecFormat(Exception):
+    """Invalid filter, sort or fields spec supplied by the client"""
+
+    pass
+
+
+class BadFilterFormat(BadSpecFormat):
+    pass
+
+
+class BadSortFormat(BadSpecFormat):
     pass
 
 
-class BadSortFormat(Exception):
+class BadFieldsFormat(BadSpecFormat):
     pass
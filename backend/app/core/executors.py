@@ -0,0 +1,115 @@
+"""Execution model: the routes are sync functions run by the (bounded) AnyIO threadpool, so that
+blocking DB calls never stall the event loop. Routes on the async data path (get_async_db,
+AsyncCRUDBase) are async functions and don't take a thread while waiting on the DB. CPU-heavy ML
+work (training, hyperparameter search, sentence embeddings, scoring) runs in a separate small pool
+so that it cannot take all the threads of the route threadpool. Password hashing and verification
+(bcrypt) run in their own pool for the same reason, so that a burst of logins can't either."""
+import contextvars
+from anyio import to_thread
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from time import perf_counter
+
+from app.core.config import settings
+from app.core.metrics import Timer, register_collector
+
+
+class ExecutorBusy(Exception):
+    """The executor queue is full"""
+
+    pass
+
+
+class BoundedExecutor:
+    """Thread pool with a bounded queue and usage statistics. The context variables
+    (Ex: db_schema, db_session) of the caller are available in the submitted function."""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int) -> None:
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = BoundedSemaphore(max_workers + max_queue)
+        self._lock = Lock()
+        self._pending = 0
+        self._active = 0
+        self._rejected = 0
+        self._wait = Timer()
+        self._run = Timer()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Submits the function to the pool. Raises ExecutorBusy if the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ExecutorBusy(f"The {self.name} executor is busy. Please try again later.")
+
+        context = contextvars.copy_context()
+        submitted = perf_counter()
+        with self._lock:
+            self._pending += 1
+
+        def run():
+            started = perf_counter()
+            self._wait.record(started - submitted)
+            with self._lock:
+                self._pending -= 1
+                self._active += 1
+            try:
+                return context.run(fn, *args, **kwargs)
+            finally:
+                self._run.record(perf_counter() - started)
+                with self._lock:
+                    self._active -= 1
+                self._slots.release()
+
+        try:
+            return self._executor.submit(run)
+        except RuntimeError:
+            # The executor is shut down
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+            raise
+
+    def run(self, fn, *args, **kwargs):
+        """Runs the function in the pool and returns its result (blocks the calling thread)"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def statistics(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": self._pending,
+                "rejected": self._rejected,
+                "wait": self._wait.statistics(),
+                "run": self._run.statistics(),
+            }
+
+
+ml_executor = BoundedExecutor(
+    "ml", max_workers=settings.ML_WORKERS, max_queue=settings.ML_QUEUE_SIZE
+)
+register_collector("ml_executor", ml_executor.statistics)
+
+password_executor = BoundedExecutor(
+    "password", max_workers=settings.PASSWORD_WORKERS, max_queue=settings.PASSWORD_QUEUE_SIZE
+)
+register_collector("password_executor", password_executor.statistics)
+
+
+def configure_threadpool() -> None:
+    """Sets the size of the route threadpool of the running event loop and registers its stats"""
+    limiter = to_thread.current_default_thread_limiter()
+    limiter.total_tokens = settings.THREADPOOL_SIZE
+
+    def statistics() -> dict:
+        return {
+            "size": limiter.total_tokens,
+            "busy": limiter.borrowed_tokens,
+            "waiting": limiter.statistics().tasks_waiting,
+        }
+
+    register_collector("threadpool", statistics)
@@ -0,0 +1,163 @@
+"""Maintenance tasks run across the schemas of all the tenants (cli.py run-all). The tenants are
+processed by a thread or process pool, a failure only fails its tenant and the completed tenants
+are recorded in a checkpoint file (JSON lines) so that an interrupted run can be resumed"""
+import json
+from collections.abc import Callable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from time import perf_counter
+from typing import NamedTuple
+from sqlalchemy import text
+
+from app.crud.analytics import snapshot_pipeline
+from app.crud.dashboard import refresh_dashboards
+from app.db.session import db_schema, get_connectable, replicas, shards
+from app.db.tenant import sync_schema
+from app.ml.opp_score import opp_score
+from app.models.shared import Tenant
+
+# Maintenance tasks by name. A task takes the schema of a tenant
+MAINTENANCE_TASKS: dict[str, Callable[[str], None]] = {}
+
+
+class TaskResult(NamedTuple):
+    schema: str
+    name: str
+    seconds: float
+    error: str | None = None
+
+
+def maintenance_task(name: str):
+    """Registers the decorated function as the maintenance task of the name"""
+
+    def register(task: Callable[[str], None]) -> Callable[[str], None]:
+        MAINTENANCE_TASKS[name] = task
+        return task
+
+    return register
+
+
+@maintenance_task("sync-schema")
+def sync_schema_task(schema: str) -> None:
+    """Adds the missing tables, columns and indexes"""
+    sync_schema(schema=schema)
+
+
+@maintenance_task("refresh-dashboards")
+def refresh_dashboards_task(schema: str) -> None:
+    """Recomputes the dashboard summaries"""
+    refresh_dashboards(schema=schema)
+
+
+@maintenance_task("snapshot-pipeline")
+def snapshot_pipeline_task(schema: str) -> None:
+    """Takes today's pipeline snapshot (and the missed ones)"""
+    snapshot_pipeline(schema=schema)
+
+
+@maintenance_task("rescore")
+def rescore_task(schema: str) -> None:
+    """Recomputes the AI score of the open opportunities"""
+    opp_score.score_open()
+
+
+@maintenance_task("reindex")
+def reindex_task(schema: str) -> None:
+    """Rebuilds the indexes of the tenant tables without blocking writes"""
+    connectable = get_connectable(schema)
+    quoted_schema = connectable.dialect.identifier_preparer.quote_schema(schema)
+    with connectable.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text(f"REINDEX SCHEMA CONCURRENTLY {quoted_schema}"))
+
+
+def run_task(name: str, schema: str) -> tuple[float, str | None]:
+    """Runs the maintenance task on the schema of a tenant. Returns the duration in seconds and
+    the error, if any, as text (exceptions of the DB drivers can't always be sent back by a pool
+    process)"""
+    start = perf_counter()
+    db_schema.set(schema)
+    try:
+        MAINTENANCE_TASKS[name](schema)
+        error = None
+    except Exception as e:
+        # The first line of the DB error, without the statement
+        message = str(getattr(e, "orig", e)).strip().split("\n")[0]
+        error = f"{type(e).__name__}: {message}"
+    return perf_counter() - start, error
+
+
+def init_process() -> None:
+    """Initializes a pool process: the connections inherited from the parent process are left to
+    the parent and new ones are opened"""
+    for engine in [*shards.engines, *replicas.engines]:
+        engine.dispose(close=False)
+
+
+def read_checkpoint(checkpoint: Path, name: str) -> set[str]:
+    """Returns the schemas on which the task completed according to the checkpoint file"""
+    if not checkpoint.exists():
+        return set()
+
+    completed = set()
+    with checkpoint.open("r") as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                if entry["task"] == name and entry["error"] is None:
+                    completed.add(entry["schema"])
+    return completed
+
+
+def run_all(
+    name: str,
+    tenants: list[Tenant],
+    workers: int,
+    processes: bool,
+    checkpoint: Path,
+    resume: bool,
+) -> Iterator[TaskResult]:
+    """Runs the maintenance task on the schemas of the tenants with a pool of workers and yields
+    the result of each tenant as it completes. With resume, the tenants completed in the
+    checkpoint are skipped, otherwise the checkpoint is started anew. The checkpoint is deleted
+    once the run completed on all the tenants, so that the next run (Ex: the next night) isn't
+    resumed from it"""
+    completed = read_checkpoint(checkpoint, name) if resume else set()
+    pending = [tenant for tenant in tenants if tenant.schema not in completed]
+
+    executor: Executor
+    if processes:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_process)
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="maintenance")
+
+    failed = False
+    with executor, checkpoint.open("a" if resume else "w") as file:
+        futures = {
+            executor.submit(run_task, name, tenant.schema): tenant for tenant in pending
+        }
+        for future in as_completed(futures):
+            tenant = futures[future]
+            try:
+                seconds, error = future.result()
+            except Exception as e:
+                # The pool failed. Ex: a pool process was killed
+                seconds, error = 0.0, f"{type(e).__name__}: {e}"
+            result = TaskResult(tenant.schema, tenant.name, seconds, error)  # type: ignore
+            failed = failed or error is not None
+
+            file.write(
+                json.dumps(
+                    {
+                        "task": name,
+                        "schema": result.schema,
+                        "seconds": round(result.seconds, 3),
+                        "error": result.error,
+                    }
+                )
+                + "\n"
+            )
+            file.flush()
+            yield result
+
+    if not failed:
+        checkpoint.unlink()
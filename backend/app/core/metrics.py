@@ -0,0 +1,40 @@
+"""In-process runtime metrics (pools, executors, caches) exposed on /metrics. Components register
+a collector which returns their current statistics as a dict"""
+from collections.abc import Callable
+from threading import Lock
+
+_collectors: dict[str, Callable[[], dict]] = {}
+
+
+def register_collector(name: str, collector: Callable[[], dict]) -> None:
+    """Registers (or replaces) the statistics collector of a component"""
+    _collectors[name] = collector
+
+
+def get_metrics() -> dict:
+    """Returns the current statistics of all the registered components"""
+    return {name: collector() for name, collector in _collectors.items()}
+
+
+class Timer:
+    """Thread-safe count, total and maximum of durations (in seconds)"""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, duration: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total += duration
+            self.max = max(self.max, duration)
+
+    def statistics(self) -> dict:
+        with self._lock:
+            return {
+                "count": self.count,
+                "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+                "max_ms": round(self.max * 1000, 3),
+            }
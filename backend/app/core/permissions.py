@@ -1,7 +1,12 @@
+from itertools import chain
 from typing import Any
 from fastapi import HTTPException
-from sqlalchemy import select, and_
+from sqlalchemy import event, false, or_, select, true
+from sqlalchemy.orm import Session, object_mapper
+from sqlalchemy.sql.expression import ColumnElement
 
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.db.session import db_session
 from app.core.enums import Permission
 from app.models.auth import AccessControl
@@ -13,6 +18,9 @@ permission_exception = HTTPException(
     headers={"WWW-Authenticate": "Bearer"},
 )
 
+# Access control rules by tenant schema
+acl_cache = TTLCache("acl", ttl=settings.ACL_CACHE_TTL)
+
 
 def has_permission(user: User, resource: Any, permission: Permission) -> bool:
     user_principals = get_user_principals(user=user)
@@ -23,6 +31,72 @@ def has_permission(user: User, resource: Any, permission: Permission) -> bool:
     return False
 
 
+def has_permissions(user: User, resources: list[Any], permission: Permission) -> list[bool]:
+    """Checks the permission on resources of the same type at once: the rules are read from the
+    ACL cache and the owners of the parents (PARENT) and the members (MEMBER) of all the
+    resources are fetched with one query each, instead of lazy loads per resource. Returns
+    whether the permission is granted for each resource, in the order of the resources"""
+    if not resources:
+        return []
+
+    db = db_session.get()
+    model = type(resources[0])
+    role_ids = get_acl_rules(db).get((model.get_resource_type(), permission.name), ())
+    if user.role_id in role_ids:
+        return [True] * len(resources)
+
+    allowed = ["OWNER" in role_ids and resource.owner_id == user.id for resource in resources]
+
+    if "PARENT" in role_ids and model.__parent_relationship__:
+        # Ex: the opportunity IDs of the tasks whose opportunity is owned by the user
+        keys = _get_relationship_keys(model.__parent_relationship__, resources, allowed)
+        if keys:
+            local_key, remote_key, parent = keys
+            owned = set(
+                db.execute(
+                    select(remote_key).where(
+                        remote_key.in_(set(local_key.values())), parent.owner_id == user.id
+                    )
+                ).scalars()
+            )
+            for index, key in local_key.items():
+                allowed[index] = key in owned
+
+    if "MEMBER" in role_ids and model.__members_relationship__:
+        # Ex: the opportunity IDs of the opportunities with a task owned by the user
+        keys = _get_relationship_keys(model.__members_relationship__, resources, allowed)
+        if keys:
+            local_key, remote_key, member = keys
+            member_of = set(
+                db.execute(
+                    select(remote_key)
+                    .where(remote_key.in_(set(local_key.values())), member.owner_id == user.id)
+                    .distinct()
+                ).scalars()
+            )
+            for index, key in local_key.items():
+                allowed[index] = key in member_of
+
+    return allowed
+
+
+def _get_relationship_keys(name: str, resources: list[Any], allowed: list[bool]):
+    """Returns the join key of the resources which are not allowed yet (by index), the column
+    of the related model which matches it and the related model, or None if there are none"""
+    relationship = object_mapper(resources[0]).relationships[name]
+    local_column, remote_column = relationship.local_remote_pairs[0]
+    attribute = relationship.parent.get_property_by_column(local_column).key
+
+    local_key = {
+        index: getattr(resource, attribute)
+        for index, resource in enumerate(resources)
+        if not allowed[index] and getattr(resource, attribute) is not None
+    }
+    if not local_key:
+        return None
+    return local_key, remote_column, relationship.mapper.class_
+
+
 def get_user_principals(user: User) -> set[str]:
     user_principals = set()
     user_principals.add(f"role:{user.role_id}")
@@ -30,26 +104,27 @@ def get_user_principals(user: User) -> set[str]:
     return user_principals
 
 
+def get_acl_rules(db: Session) -> dict[tuple[str, str], tuple[str, ...]]:
+    """Returns the access control rules of the tenant of the session, (resource type, permission)
+    to role IDs, from the ACL cache"""
+
+    def load() -> dict[tuple[str, str], tuple[str, ...]]:
+        rules: dict[tuple[str, str], tuple[str, ...]] = {}
+        for entry in db.execute(select(AccessControl)).scalars():
+            key = (entry.resource_type_id, entry.permission)
+            rules[key] = rules.get(key, ()) + (entry.role_id,)
+        return rules
+
+    return acl_cache.get_or_load(db.info.get("schema"), load)
+
+
 def get_resource_acl(resource: Any, permission: Permission) -> set[str]:
     resource_acl = set()
     resource_type_id = resource.get_resource_type()
-    db = db_session.get()
-
-    results = (
-        db.execute(
-            select(AccessControl).where(
-                and_(
-                    AccessControl.resource_type_id == resource_type_id,
-                    AccessControl.permission == permission.name,
-                )
-            )
-        )
-        .scalars()
-        .all()
-    )
+    rules = get_acl_rules(db_session.get())
 
-    for entry in results:
-        match entry.role_id:
+    for role_id in rules.get((resource_type_id, permission.name), ()):
+        match role_id:
             case "OWNER":
                 resource_acl.add(f"user:{resource.owner_id}")
             case "PARENT":
@@ -59,6 +134,54 @@ def get_resource_acl(resource: Any, permission: Permission) -> set[str]:
                 formatted_members = [f"user:{member}" for member in resource.members]
                 resource_acl.update(formatted_members)
             case _:
-                resource_acl.add(f"role:{entry.role_id}")
+                resource_acl.add(f"role:{role_id}")
 
     return resource_acl
+
+
+def get_permission_filter(user: User, model: Any, permission: Permission) -> ColumnElement:
+    """Compiles the access control rules of the resource type of the model into a WHERE clause
+    which selects the records on which the user has the permission (same rules as
+    get_resource_acl): a matching role selects all the records, OWNER the records owned by the
+    user, PARENT the records whose parent (__parent_relationship__) is owned by the user and
+    MEMBER those with a member (__members_relationship__) owned by the user"""
+    rules = get_acl_rules(db_session.get())
+    conditions = []
+
+    for role_id in rules.get((model.get_resource_type(), permission.name), ()):
+        match role_id:
+            case "OWNER":
+                conditions.append(model.owner_id == user.id)
+            case "PARENT" if model.__parent_relationship__:
+                parent = getattr(model, model.__parent_relationship__)
+                conditions.append(parent.has(owner_id=user.id))
+            case "MEMBER" if model.__members_relationship__:
+                members = getattr(model, model.__members_relationship__)
+                conditions.append(members.any(owner_id=user.id))
+            case "OWNER" | "PARENT" | "MEMBER":
+                pass
+            case _ if role_id == user.role_id:
+                return true()
+
+    return or_(*conditions) if conditions else false()
+
+
+@event.listens_for(Session, "after_flush")
+def collect_acl_changes(session: Session, flush_context) -> None:
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, AccessControl):
+            session.info["acl_changed"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_acl_rules(session: Session) -> None:
+    """Reloads the rules of the tenant on the next check once the access control changes are
+    committed. Other processes reload them when their cache entry expires (ACL_CACHE_TTL)"""
+    if session.info.pop("acl_changed", False):
+        acl_cache.invalidate(session.info.get("schema"))
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_acl_changes(session: Session) -> None:
+    session.info.pop("acl_changed", None)
@@ -0,0 +1,52 @@
+"""In-process rate limits (per worker) with statistics on /metrics"""
+from threading import Lock
+from time import monotonic
+
+from app.core.metrics import register_collector
+
+
+class RateLimiter:
+    """Allows limit hits per key (Ex: a client IP) within fixed windows of window seconds"""
+
+    def __init__(self, name: str, limit: int, window: float, maxkeys: int = 100000) -> None:
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.maxkeys = maxkeys
+        self._lock = Lock()
+        self._windows: dict[str, tuple[float, int]] = {}
+        self._limited = 0
+        register_collector(f"{name}_rate_limit", self.statistics)
+
+    def hit(self, key: str) -> float | None:
+        """Records a hit of the key. Returns the seconds until the next hit is allowed if the
+        limit is exceeded, otherwise None"""
+        if not self.limit:
+            return None
+
+        now = monotonic()
+        with self._lock:
+            start, count = self._windows.get(key, (now, 0))
+            if now - start >= self.window:
+                start, count = now, 0
+
+            if count >= self.limit:
+                self._limited += 1
+                return start + self.window - now
+
+            if key not in self._windows and len(self._windows) >= self.maxkeys:
+                self._prune(now)
+            self._windows[key] = (start, count + 1)
+            return None
+
+    def _prune(self, now: float) -> None:
+        """Removes the expired windows"""
+        self._windows = {
+            key: (start, count)
+            for key, (start, count) in self._windows.items()
+            if now - start < self.window
+        }
+
+    def statistics(self) -> dict:
+        with self._lock:
+            return {"keys": len(self._windows), "limited": self._limited}
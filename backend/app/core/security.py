@@ -1,41 +1,70 @@
-from fastapi import Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer
+import asyncio
+import secrets
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer, OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
+from uuid import uuid4
 
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
 from app.core.config import settings
+from app.core.executors import password_executor
+from app.core.ratelimit import RateLimiter
 from app.models.user import User
-from app.crud.user import user
+from app.crud.user import async_user, user
 
 JWT_SECRET_KEY = settings.JWT_SECRET_KEY
 JWT_ALG = settings.JWT_ALG
 JWT_EXP = settings.JWT_EXP
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS
+)
+
+login_ip_limiter = RateLimiter(
+    "login_ip", limit=settings.LOGIN_RATE_LIMIT_IP, window=settings.LOGIN_RATE_WINDOW
+)
+login_email_limiter = RateLimiter(
+    "login_email", limit=settings.LOGIN_RATE_LIMIT_EMAIL, window=settings.LOGIN_RATE_WINDOW
+)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_URL}/auth/login")
+metrics_scheme = HTTPBearer(auto_error=False)
 
 
 def get_hashed_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_executor.run(pwd_context.hash, password)
 
 
 def verify_password(password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(password, hashed_password)
-
+    return password_executor.run(pwd_context.verify, password, hashed_password)
+
+
+credentials_exception = HTTPException(
+    status_code=401,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+
+def check_metrics_token(
+    credentials: HTTPAuthorizationCredentials | None = Depends(metrics_scheme),
+) -> None:
+    """Allows the requests with the METRICS_TOKEN bearer token. The metrics are not served when
+    METRICS_TOKEN is not set"""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if credentials is None or not secrets.compare_digest(
+        credentials.credentials, settings.METRICS_TOKEN
+    ):
+        raise credentials_exception
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-) -> User | None:
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
 
+def decode_access_token(token: str) -> tuple[str, str | None]:
+    """Returns the email and the token ID ('jti') of an access token"""
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALG])
         email = payload.get("sub")
@@ -43,22 +72,74 @@ def get_current_user(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    return email, payload.get("jti")
 
-    current_user = user.get_by_email(db=db, email=email)
+
+def check_current_user(current_user: User | None) -> User:
     if current_user is None:
         raise credentials_exception
     if not current_user.is_active:
         raise HTTPException(status_code=403, detail="User is not active")
-
     return current_user
 
 
-def authenticate_user(db: Session, email: str, password: str) -> User | bool:
-    auth_user = user.get_by_email(db=db, email=email)
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    email, token_id = decode_access_token(token)
+    # The user is read from the user cache, by the token ID ('jti') of the token
+    return check_current_user(user.get_authenticated(db=db, email=email, token_id=token_id))
+
+
+async def get_current_async_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """get_current_user of the async routes: the user is loaded with the async session of the
+    route, without taking a threadpool thread or a sync connection"""
+    email, token_id = decode_access_token(token)
+    current_user = await async_user.get_authenticated(db=db, email=email, token_id=token_id)
+    return check_current_user(current_user)
+
+
+def get_client_ip(request: Request) -> str | None:
+    """Returns the IP of the client. With LOGIN_TRUSTED_PROXIES, the IP added to X-Forwarded-For
+    by the first trusted proxy (the entries before it can be forged by the client)"""
+    if settings.LOGIN_TRUSTED_PROXIES:
+        forwarded_for = [
+            ip.strip() for ip in request.headers.get("x-forwarded-for", "").split(",") if ip.strip()
+        ]
+        if len(forwarded_for) >= settings.LOGIN_TRUSTED_PROXIES:
+            return forwarded_for[-settings.LOGIN_TRUSTED_PROXIES]
+    return request.client.host if request.client else None
+
+
+def check_login_rate(client_ip: str | None, email: str) -> None:
+    """Raises an exception if the client IP or the email exceeds its login attempts"""
+    retry_after = max(
+        login_ip_limiter.hit(client_ip or "") or 0, login_email_limiter.hit(email.lower()) or 0
+    )
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts. Please try again later.",
+            headers={"Retry-After": str(int(retry_after) + 1)},
+        )
+
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> User | bool:
+    """Returns the user if the password is correct. The password is verified in the password
+    executor and the hash is replaced if it was made with other parameters (Ex: bcrypt rounds)"""
+    auth_user = await async_user.get_by_email(db=db, email=email)
     if auth_user is None:
         return False
-    if not verify_password(password, auth_user.password):  # type: ignore
+
+    verified, new_hash = await asyncio.wrap_future(
+        password_executor.submit(pwd_context.verify_and_update, password, auth_user.password)
+    )
+    if not verified:
         return False
+
+    if new_hash is not None:
+        auth_user.password = new_hash
+        await db.commit()
     return auth_user
 
 
@@ -67,6 +148,6 @@ def create_access_token(
 ) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + expires_delta  # type: ignore
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALG)
     return encoded_jwt
@@ -0,0 +1,17 @@
+from sqlalchemy.orm import selectinload
+
+from app.crud.base import AsyncCRUDBase, CRUDBase
+from app.models.account import Account, AccountCreate, AccountUpdate
+from app.models.industry import Industry
+
+account = CRUDBase[Account, AccountCreate, AccountUpdate](Account)
+
+# Loads the relationships returned by AccountRead
+async_account = AsyncCRUDBase[Account, AccountCreate, AccountUpdate](
+    Account,
+    options=[
+        selectinload(Account.industry).selectinload(Industry.descriptions),
+        selectinload(Account.created_by),
+        selectinload(Account.updated_by),
+    ],
+)
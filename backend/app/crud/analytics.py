@@ -0,0 +1,190 @@
+"""Pipeline analytics. A daily job (cli.py tenant snapshot-pipeline) rolls the opportunities up into
+pipeline_snapshot rows by owner, industry and stage, and the trends are computed from those rows"""
+from datetime import date, timedelta
+from typing import Final
+from sqlalchemy import Date, DateTime, case, cast, delete, false, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.enums import AnalyticsGroupBy, AnalyticsInterval, OppStatus
+from app.core.permissions import permission_exception
+from app.db.session import using_replica, with_db
+from app.models.account import Account
+from app.models.analytics import PipelineSnapshot
+from app.models.opportunity import Opportunity
+from app.models.user import User
+
+# Roles which may get the pipeline analytics
+ALLOWED_ROLES: Final = ["ADMIN"]
+
+GROUP_BY_COLUMNS: Final = {
+    AnalyticsGroupBy.owner: PipelineSnapshot.owner_id,
+    AnalyticsGroupBy.industry: PipelineSnapshot.industry_id,
+    AnalyticsGroupBy.stage: PipelineSnapshot.stage_id,
+}
+
+
+def get_closed_until(snapshot_date: date, taken_on):
+    """Returns the end of the closures counted by a snapshot: when it was taken or, if taken after
+    its date (backfilled or rerun), the end of its date"""
+    return func.least(taken_on, cast(snapshot_date + timedelta(days=1), DateTime))
+
+
+def take_pipeline_snapshot(db: Session, snapshot_date: date, backfill: bool = False) -> None:
+    """Replaces the snapshot rows of the date with the current rollup of the opportunities. The
+    closed opportunities are those whose status was changed to won or lost (closed_on, or the close
+    date if closed before closed_on was recorded) since the previous snapshot, so that a closure is
+    counted once whatever its close date and even if the job skipped days. The backfilled snapshots
+    of past dates have the closures only (flagged rows), the open pipeline of the date being lost"""
+    previous = db.execute(
+        select(
+            PipelineSnapshot.snapshot_date, func.max(PipelineSnapshot.created_on).label("taken_on")
+        )
+        .where(PipelineSnapshot.snapshot_date < snapshot_date)
+        .group_by(PipelineSnapshot.snapshot_date)
+        .order_by(PipelineSnapshot.snapshot_date.desc())
+        .limit(1)
+    ).one_or_none()
+    # The first snapshot counts the closures of its date only
+    closed_after = (
+        get_closed_until(previous.snapshot_date, previous.taken_on)
+        if previous
+        else cast(snapshot_date, DateTime)
+    )
+    closed_on = func.coalesce(Opportunity.closed_on, cast(Opportunity.close_date, DateTime))
+    closed_in_window = (closed_on >= closed_after) & (
+        closed_on < get_closed_until(snapshot_date, func.now())
+    )
+
+    is_open = false() if backfill else Opportunity.status == OppStatus.open
+    is_won = (Opportunity.status == OppStatus.won) & closed_in_window
+    is_lost = (Opportunity.status == OppStatus.lost) & closed_in_window
+
+    query = (
+        select(
+            literal(snapshot_date).label("snapshot_date"),
+            Opportunity.owner_id,
+            Account.industry_id,
+            Opportunity.stage_id,
+            func.count().filter(is_open).label("open_count"),
+            func.sum(Opportunity.expected_amount).filter(is_open).label("pipeline_amount"),
+            func.sum(Opportunity.weighted_amount).filter(is_open).label("weighted_amount"),
+            func.count().filter(is_won).label("won_count"),
+            func.sum(Opportunity.expected_amount).filter(is_won).label("won_amount"),
+            func.sum(Opportunity.age).filter(is_won).label("won_age"),
+            func.count().filter(is_lost).label("lost_count"),
+            literal(backfill).label("backfilled"),
+        )
+        .join_from(Opportunity, Account)
+        .where(is_open | is_won | is_lost)
+        .group_by(Opportunity.owner_id, Account.industry_id, Opportunity.stage_id)
+    )
+
+    db.execute(delete(PipelineSnapshot).where(PipelineSnapshot.snapshot_date == snapshot_date))
+    db.execute(
+        insert(PipelineSnapshot).from_select(
+            [column.name for column in query.selected_columns], query
+        )
+    )
+
+
+def get_missed_dates(db: Session, snapshot_date: date) -> list[date]:
+    """Returns the dates without snapshot since the last snapshot before the date (at most
+    PIPELINE_BACKFILL_DAYS days)"""
+    last_date = db.execute(
+        select(func.max(PipelineSnapshot.snapshot_date)).where(
+            PipelineSnapshot.snapshot_date < snapshot_date
+        )
+    ).scalar()
+    if last_date is None:
+        return []
+
+    first_date = max(
+        last_date + timedelta(days=1),
+        snapshot_date - timedelta(days=settings.PIPELINE_BACKFILL_DAYS),
+    )
+    return [first_date + timedelta(days=i) for i in range((snapshot_date - first_date).days)]
+
+
+def snapshot_pipeline(schema: str, snapshot_date: date | None = None) -> None:
+    """Takes the pipeline snapshot of a tenant for the date. By default, takes today's snapshot
+    after backfilling the closures of the dates missed since the last snapshot (Ex: the job did not
+    run)"""
+    with with_db(schema) as db:
+        if snapshot_date is None:
+            snapshot_date = date.today()
+            for missed_date in get_missed_dates(db, snapshot_date):
+                take_pipeline_snapshot(db, missed_date, backfill=True)
+        take_pipeline_snapshot(db, snapshot_date)
+        db.commit()
+
+
+def get_pipeline_trends(
+    db: Session,
+    user: User,
+    interval: AnalyticsInterval,
+    start: date,
+    end: date,
+    group_by: AnalyticsGroupBy | None = None,
+) -> list[dict]:
+    """Returns the pipeline metrics by week or month (and group) between the dates. The open
+    pipeline of a period is the one of its last snapshot which was not backfilled (None if there is
+    none) and the closed opportunities are summed over all the snapshots of the period"""
+    if user.role_id not in ALLOWED_ROLES:
+        raise permission_exception
+
+    snapshot = PipelineSnapshot
+    period = cast(func.date_trunc(interval.value, snapshot.snapshot_date), Date)
+    in_range = snapshot.snapshot_date.between(start, end)
+
+    last_snapshots = (
+        select(
+            period.label("period"),
+            func.max(snapshot.snapshot_date)
+            .filter(snapshot.backfilled.is_(False))
+            .label("snapshot_date"),
+        )
+        .where(in_range)
+        .group_by(period)
+        .subquery()
+    )
+    is_last = snapshot.snapshot_date == last_snapshots.c.snapshot_date
+    group_columns = [GROUP_BY_COLUMNS[group_by].label("group_id")] if group_by else []
+
+    query = (
+        select(
+            period.label("period"),
+            *group_columns,
+            func.coalesce(func.sum(case((is_last, snapshot.open_count))), 0).label("open"),
+            func.coalesce(func.sum(case((is_last, snapshot.pipeline_amount))), 0).label("amount"),
+            func.coalesce(func.sum(case((is_last, snapshot.weighted_amount))), 0).label("weighted"),
+            func.sum(snapshot.won_count).label("won"),
+            func.sum(snapshot.lost_count).label("lost"),
+            func.coalesce(func.sum(snapshot.won_amount), 0).label("won_amount"),
+            func.sum(snapshot.won_age).label("won_age"),
+            func.max(last_snapshots.c.snapshot_date).label("open_date"),
+        )
+        .join(last_snapshots, period == last_snapshots.c.period)
+        .where(in_range)
+        .group_by(period, *group_columns)
+        .order_by(period, *group_columns)
+    )
+
+    with using_replica(db):
+        rows = db.execute(query).all()
+
+    return [
+        {
+            "period": row.period,
+            "group_id": row.group_id if group_by else None,
+            "open_opportunities": row.open if row.open_date else None,
+            "pipeline_amount": row.amount if row.open_date else None,
+            "weighted_amount": row.weighted if row.open_date else None,
+            "won_opportunities": row.won,
+            "lost_opportunities": row.lost,
+            "won_amount": row.won_amount,
+            "win_rate": row.won / (row.won + row.lost) if row.won + row.lost else None,
+            "velocity": row.won_age / row.won if row.won else None,
+        }
+        for row in rows
+    ]
@@ -2,6 +2,7 @@ from typing import Final
 from sentence_transformers import SentenceTransformer, util
 from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import Select
 from functools import lru_cache
 
 from app.crud.base import CRUDBase
@@ -19,17 +20,9 @@ class CRUDAnswer(CRUDBase[Answer, AnswerCreate, AnswerUpdate]):
         model = SentenceTransformer(settings.SENT_EMB_MODEL_PATH)
         return model
 
-    def get_all(
-        self,
-        db: Session,
-        filter_spec: list[dict],
-        sort_spec: list[dict],
-        offset: int,
-        limit: int,
-        user: User,
-    ):
+    def get_query(self, user: User) -> Select:
         if user.role_id in self.ALLOWED_ROLES:
-            return super().get_all(db, filter_spec, sort_spec, offset, limit, user)
+            return super().get_query(user)
         else:
             raise permission_exception
 
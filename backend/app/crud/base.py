@@ -1,8 +1,10 @@
+from collections.abc import Iterator
 from typing import Any, Generic, Type, TypeVar
 from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy.sql.expression import Select
 from pathlib import Path
@@ -10,10 +12,13 @@ from pathlib import Path
 from app.db.base import Base
 from app.db.filter import apply_filters
 from app.db.sort import apply_sort
-from app.db.paginate import apply_pagination
-from app.db.session import db_session, engine, db_schema
-from app.core.permissions import permission_exception, has_permission
-from app.core.enums import Permission
+from app.db.paginate import apply_async_pagination, apply_pagination
+from app.db.fields import apply_fields
+from app.db.export import apply_export_columns, stream_query
+from app.db.advisor import log_query_spec
+from app.db.session import db_session, db_schema, using_replica, with_db
+from app.core.permissions import get_permission_filter, has_permission, permission_exception
+from app.core.enums import ExportFormat, Permission
 from app.models.user import User
 
 # SQLAlchemy model type for the main object. Ex: "OppStage"
@@ -44,6 +49,11 @@ class CRUDBase(Generic[Model, CreateSchema, UpdateSchema]):
 
         return result
 
+    def get_query(self, user: User) -> Select:
+        """Returns the base query for the records that the user may list (read permission filter
+        compiled from the access control rules)"""
+        return select(self.model).where(get_permission_filter(user, self.model, Permission.read))
+
     def get_all(
         self,
         db: Session,
@@ -53,10 +63,12 @@ class CRUDBase(Generic[Model, CreateSchema, UpdateSchema]):
         limit: int,
         user: User,
         query: Select | None = None,
+        fields: list[str] | None = None,
     ):
-        """Returns all records"""
+        """Returns all records. If fields are given, the items are rows with only those fields"""
+        db_session.set(db)
         if query is None:
-            query = select(self.model)
+            query = self.get_query(user)
 
         if filter_spec:
             query = apply_filters(query=query, default_model=self.model, filter_spec=filter_spec)  # type: ignore
@@ -64,18 +76,56 @@ class CRUDBase(Generic[Model, CreateSchema, UpdateSchema]):
         if sort_spec:
             query = apply_sort(query=query, default_model=self.model, sort_spec=sort_spec)  # type: ignore
 
-        query, pagination = apply_pagination(db=db, query=query, offset=offset, limit=limit)  # type: ignore
+        log_query_spec(model=self.model, filter_spec=filter_spec, sort_spec=sort_spec)
 
-        if pagination.total == 0:
-            raise HTTPException(status_code=404, detail="No records were found.")
+        with using_replica(db):
+            query, pagination = apply_pagination(db=db, query=query, offset=offset, limit=limit)  # type: ignore
+
+            if pagination.total == 0:
+                raise HTTPException(status_code=404, detail="No records were found.")
+
+            if fields:
+                query = apply_fields(query=query, default_model=self.model, fields=fields)  # type: ignore
+                items = db.execute(query).mappings().all()
+            else:
+                items = db.execute(query).scalars().all()
 
         return {
-            "items": db.execute(query).scalars().all(),
+            "items": items,
             "total": pagination.total,
             "page": pagination.page,
             "size": pagination.size,
         }
 
+    def export(
+        self,
+        db: Session,
+        filter_spec: list[dict] | dict,
+        sort_spec: list[dict] | dict,
+        export_format: ExportFormat,
+        user: User,
+        query: Select | None = None,
+        fields: list[str] | None = None,
+    ) -> Iterator[str]:
+        """Returns an iterator streaming all the filtered and sorted records in the export format"""
+        db_session.set(db)
+        if query is None:
+            query = self.get_query(user)
+
+        if filter_spec:
+            query = apply_filters(query=query, default_model=self.model, filter_spec=filter_spec)  # type: ignore
+
+        if sort_spec:
+            query = apply_sort(query=query, default_model=self.model, sort_spec=sort_spec)  # type: ignore
+
+        log_query_spec(model=self.model, filter_spec=filter_spec, sort_spec=sort_spec)
+
+        if fields:
+            query = apply_fields(query=query, default_model=self.model, fields=fields)  # type: ignore
+        else:
+            query = apply_export_columns(query=query, default_model=self.model)
+        return stream_query(db=db, query=query, export_format=export_format)
+
     def create(self, db: Session, obj_in: CreateSchema, user: User) -> Model:
         """Creates the record"""
         db_session.set(db)
@@ -123,9 +173,9 @@ class CRUDBase(Generic[Model, CreateSchema, UpdateSchema]):
         """Creates records in bulk using psycopg's COPY FROM functionality"""
         schema = db_schema.get()
 
-        with filepath.open("r") as f:
-            conn = engine.raw_connection()
-            cursor = conn.cursor()
+        # The connection is returned to the pool (and the COPY rolled back on error) on exit
+        with filepath.open("r") as f, with_db(schema) as db:
+            cursor = db.connection().connection.cursor()
             cmd = None
 
             if self.model.__name__ == "Account":
@@ -142,7 +192,7 @@ class CRUDBase(Generic[Model, CreateSchema, UpdateSchema]):
                 FROM STDIN WITH (FORMAT CSV, HEADER TRUE)"""
 
             cursor.copy_expert(cmd, f)  # type: ignore
-            conn.commit()
+            db.commit()
 
 
 # Extends the Create and Update methods in the Base CRUD class for objects with associated descriptions object
@@ -216,3 +266,134 @@ class CRUDBaseDesc(
         db.commit()
         db.refresh(db_obj)
         return db_obj
+
+
+# Async variant of the Base CRUD class with the same contract, for the async DB sessions (get_async_db).
+# Relationships can't be lazy loaded in an async session, so the relationships returned by the Read
+# schema must be eagerly loaded with the loader options. Ex: [selectinload(Account.industry)]
+class AsyncCRUDBase(Generic[Model, CreateSchema, UpdateSchema]):
+    def __init__(self, model: Type[Model], options: list | None = None) -> None:
+        self.model = model
+        self.options = options or []
+
+    async def has_permission(
+        self, db: AsyncSession, user: User, resource: Model, permission: Permission
+    ) -> bool:
+        """Checks the permission in the sync session of the async session, where the parent and
+        members of the resource can be lazy loaded"""
+
+        def check(session: Session) -> bool:
+            db_session.set(session)
+            return has_permission(user=user, resource=resource, permission=permission)
+
+        return await db.run_sync(check)
+
+    async def _get(self, db: AsyncSession, id: Any) -> Model | None:
+        query = (
+            select(self.model)
+            .where(self.model.id == id)
+            .options(*self.options)
+            .execution_options(populate_existing=True)
+        )
+        return (await db.execute(query)).scalars().one_or_none()
+
+    async def get(self, db: AsyncSession, id: Any, user: User) -> Model | None:
+        """Returns the record based on the ID"""
+        result = await self._get(db=db, id=id)
+        if result is not None:
+            if not await self.has_permission(db, user, result, Permission.read):
+                raise permission_exception
+
+        return result
+
+    async def get_query(self, db: AsyncSession, user: User) -> Select:
+        """Returns the base query for the records that the user may list (read permission filter
+        compiled from the access control rules)"""
+
+        def build(session: Session) -> Select:
+            db_session.set(session)
+            return select(self.model).where(
+                get_permission_filter(user, self.model, Permission.read)
+            )
+
+        return await db.run_sync(build)
+
+    async def get_all(
+        self,
+        db: AsyncSession,
+        filter_spec: list[dict] | dict,
+        sort_spec: list[dict] | dict,
+        offset: int,
+        limit: int,
+        user: User,
+        query: Select | None = None,
+        fields: list[str] | None = None,
+    ):
+        """Returns all records. If fields are given, the items are rows with only those fields"""
+        if query is None:
+            query = await self.get_query(db, user)
+
+        if filter_spec:
+            query = apply_filters(query=query, default_model=self.model, filter_spec=filter_spec)  # type: ignore
+
+        if sort_spec:
+            query = apply_sort(query=query, default_model=self.model, sort_spec=sort_spec)  # type: ignore
+
+        log_query_spec(model=self.model, filter_spec=filter_spec, sort_spec=sort_spec)
+
+        query, pagination = await apply_async_pagination(
+            db=db, query=query, offset=offset, limit=limit  # type: ignore
+        )
+
+        if pagination.total == 0:
+            raise HTTPException(status_code=404, detail="No records were found.")
+
+        if fields:
+            query = apply_fields(query=query, default_model=self.model, fields=fields)  # type: ignore
+            items = (await db.execute(query)).mappings().all()
+        else:
+            items = (await db.execute(query.options(*self.options))).scalars().all()
+
+        return {
+            "items": items,
+            "total": pagination.total,
+            "page": pagination.page,
+            "size": pagination.size,
+        }
+
+    async def create(self, db: AsyncSession, obj_in: CreateSchema, user: User) -> Model:
+        """Creates the record"""
+        db_obj = self.model(**obj_in.dict(), created_by_id=user.id)
+
+        if not await self.has_permission(db, user, db_obj, Permission.create):
+            raise permission_exception
+
+        db.add(db_obj)
+        await db.commit()
+        return await self._get(db=db, id=db_obj.id)  # type: ignore
+
+    async def update(
+        self, db: AsyncSession, db_obj: Model, obj_in: UpdateSchema, user: User
+    ) -> Model:
+        """Updates the record"""
+        if not await self.has_permission(db, user, db_obj, Permission.update):
+            raise permission_exception
+
+        update_data = obj_in.dict(exclude_unset=True)
+
+        for field in update_data:
+            if field in self.model.__table__.columns:
+                setattr(db_obj, field, update_data[field])
+        db_obj.updated_by_id = user.id
+
+        db.add(db_obj)
+        await db.commit()
+        return await self._get(db=db, id=db_obj.id)  # type: ignore
+
+    async def delete(self, db: AsyncSession, db_obj: Model, user: User) -> None:
+        """Deletes the record"""
+        if not await self.has_permission(db, user, db_obj, Permission.delete):
+            raise permission_exception
+
+        await db.delete(db_obj)
+        await db.commit()
@@ -0,0 +1,109 @@
+"""Dashboard summaries. The opportunity KPIs are kept by owner and stage in the opp_summary table:
+the rows of the owners of the opportunities written by CRUDOpp are refreshed once the write is
+committed, and all the rows are refreshed for a new month, either on the first dashboard read or by
+the scheduled CLI command (tenant refresh-dashboards)"""
+import logging
+from datetime import date
+from sqlalchemy import delete, exists, func, insert, literal, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.enums import OppStatus
+from app.db.session import with_db
+from app.models.dashboard import OppSummary
+from app.models.opportunity import Opportunity
+
+logger = logging.getLogger(__name__)
+
+
+def add_months(month_start: date, months: int) -> date:
+    """Returns the first day of the month which is a number of months after the given month"""
+    month = month_start.month - 1 + months
+    return date(month_start.year + month // 12, month % 12 + 1, 1)
+
+
+def get_current_period() -> date:
+    return date.today().replace(day=1)
+
+
+def get_opp_stats(period: date, owner_ids: set | None = None):
+    """Returns the query of the opportunity KPIs by owner and stage for the period (month)"""
+    quarter_start = period.replace(month=(period.month - 1) // 3 * 3 + 1)
+    close_date = Opportunity.close_date
+    closed_in_month = (close_date >= period) & (close_date < add_months(period, 1))
+    closed_in_quarter = (close_date >= quarter_start) & (close_date < add_months(quarter_start, 3))
+    is_open = Opportunity.status == OppStatus.open
+    is_won = Opportunity.status == OppStatus.won
+
+    query = select(
+        Opportunity.owner_id,
+        Opportunity.stage_id,
+        literal(period).label("period"),
+        func.count().filter(is_open).label("open_count"),
+        func.count().filter(is_won & closed_in_month).label("won_month_count"),
+        func.count().filter(is_won & closed_in_quarter).label("won_quarter_count"),
+        func.count().filter(is_won).label("won_count"),
+        func.sum(Opportunity.age).filter(is_won).label("won_age"),
+        func.sum(Opportunity.expected_amount).filter(is_open).label("expected_amount"),
+    ).group_by(Opportunity.owner_id, Opportunity.stage_id)
+
+    if owner_ids is not None:
+        query = query.where(owner_filter(Opportunity.owner_id, owner_ids))
+    return query
+
+
+def owner_filter(column, owner_ids: set):
+    """Returns the filter of the owners (None: no owner)"""
+    condition = column.in_([owner_id for owner_id in owner_ids if owner_id is not None])
+    if None in owner_ids:
+        condition = or_(condition, column.is_(None))
+    return condition
+
+
+def refresh_opp_summary(db: Session, owner_ids: set | None = None) -> None:
+    """Recomputes the summary rows of the owners (all the owners if None) in the transaction.
+    Concurrent refreshes of a tenant are serialized by advisory locks: exclusive for a full
+    refresh, shared plus a lock per owner for the refresh of some owners"""
+    key = func.hashtext(f"opp_summary:{db.info.get('schema')}")
+    if owner_ids is None:
+        db.execute(select(func.pg_advisory_xact_lock(key)))
+    else:
+        db.execute(select(func.pg_advisory_xact_lock_shared(key)))
+        for owner_id in sorted(owner_ids, key=lambda owner_id: owner_id or 0):
+            db.execute(select(func.pg_advisory_xact_lock(key, owner_id or 0)))
+
+    query = get_opp_stats(get_current_period(), owner_ids)
+    statement = delete(OppSummary)
+    if owner_ids is not None:
+        statement = statement.where(owner_filter(OppSummary.owner_id, owner_ids))
+    db.execute(statement)
+    db.execute(
+        insert(OppSummary).from_select([column.name for column in query.selected_columns], query)
+    )
+
+
+def refresh_dashboards(schema: str) -> None:
+    """Recomputes all the dashboard summaries of a tenant"""
+    with with_db(schema) as db:
+        refresh_opp_summary(db)
+        db.commit()
+
+
+def is_opp_summary_stale(db: Session) -> bool:
+    """Whether the summary is for a previous month or was never computed for the opportunities"""
+    period = db.scalar(select(func.min(OppSummary.period)))
+    if period is None:
+        return db.scalar(select(exists().where(Opportunity.id.isnot(None))))  # type: ignore
+    return period < get_current_period()
+
+
+def refresh_owner_summaries(db: Session, owner_ids: set | None = None) -> None:
+    """Refreshes the summary rows of the owners (all the owners if None) after a committed write,
+    in their own transaction. A failed refresh (Ex: the tenant has no opp_summary table before
+    tenant sync-schema) doesn't fail the write: the rows are fixed by the next full refresh"""
+    try:
+        refresh_opp_summary(db, owner_ids)
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        logger.exception(f"The opportunity summary of the owners {owner_ids} was not refreshed")
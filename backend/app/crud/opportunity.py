@@ -1,39 +1,30 @@
-import math
-import pandas as pd
+import logging
 from typing import Final
-from datetime import timedelta, datetime
-from sqlalchemy import select
+from datetime import timedelta
+from pathlib import Path
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
-from app.db.session import db_session
+from app.db.session import db_schema, db_session, using_replica, with_db
 from app.crud.base import CRUDBase
+from app.crud.dashboard import is_opp_summary_stale, refresh_opp_summary, refresh_owner_summaries
 from app.models.user import User
 from app.core.permissions import has_permission, permission_exception
 from app.core.enums import Permission, OppStatus, TaskStatus
 from app.models.opp_template import OppTemplateTask
 from app.models.opp_stage import OppStage
+from app.models.dashboard import OppSummary
 from app.models.task import Task
 from app.models.opportunity import Opportunity, OpportunityCreate, OpportunityUpdate
 from app.ml.opp_score import opp_score
+from app.core.executors import ExecutorBusy, ml_executor
+
+logger = logging.getLogger(__name__)
 
 
 class CRUDOpp(CRUDBase[Opportunity, OpportunityCreate, OpportunityUpdate]):
     ALLOWED_ROLES_ALL: Final = ["ADMIN"]
 
-    def get_all(
-        self,
-        db: Session,
-        filter_spec: list[dict],
-        sort_spec: list[dict],
-        offset: int,
-        limit: int,
-        user: User,
-    ):
-        query = select(self.model)
-        if user.role_id not in self.ALLOWED_ROLES_ALL:
-            query = query.where(Opportunity.owner_id == user.id)
-        return super().get_all(db, filter_spec, sort_spec, offset, limit, user, query)
-
     def get_open(
         self,
         db: Session,
@@ -42,18 +33,18 @@ class CRUDOpp(CRUDBase[Opportunity, OpportunityCreate, OpportunityUpdate]):
         offset: int,
         limit: int,
         user: User,
+        fields: list[str] | None = None,
     ):
         """Returns all open opportunities based on the role"""
-        query = select(self.model).where(Opportunity.status == OppStatus.open)
-        if user.role_id not in self.ALLOWED_ROLES_ALL:
-            query = query.where(Opportunity.owner_id == user.id)
-        return super().get_all(db, filter_spec, sort_spec, offset, limit, user, query)
+        db_session.set(db)
+        query = self.get_query(user).where(Opportunity.status == OppStatus.open)
+        return super().get_all(db, filter_spec, sort_spec, offset, limit, user, query, fields)
 
     def create(self, db: Session, obj_in: OpportunityCreate, user: User) -> Opportunity:
         """Creates an opportunity"""
         db_session.set(db)
-        status = get_status_from_opp_stage(db=db, stage_id=obj_in.stage_id)
-        db_opp = Opportunity(**obj_in.dict(), status=status, created_by_id=user.id)
+        db_opp = Opportunity(**obj_in.dict(), created_by_id=user.id)
+        set_status(db_opp, get_status_from_opp_stage(db=db, stage_id=obj_in.stage_id))
 
         if not has_permission(user=user, resource=db_opp, permission=Permission.create):
             raise permission_exception
@@ -93,22 +84,45 @@ class CRUDOpp(CRUDBase[Opportunity, OpportunityCreate, OpportunityUpdate]):
                 db.add(db_opp)
 
         db.commit()
-        return self.update_opp_score(db=db, opportunity=db_opp)
+        db_opp = self.update_opp_score(db=db, opportunity=db_opp)
+        refresh_owner_summaries(db, {db_opp.owner_id})
+        return db_opp
 
     def update(
         self, db: Session, db_obj: Opportunity, obj_in: OpportunityUpdate, user: User
     ) -> Opportunity:
         """Updates an opportunity"""
+        owner_ids = {db_obj.owner_id}
         if obj_in.stage_id is not None:
-            db_obj.status = get_status_from_opp_stage(db=db, stage_id=obj_in.stage_id)  # type: ignore
+            set_status(db_obj, get_status_from_opp_stage(db=db, stage_id=obj_in.stage_id))
 
         super().update(db, db_obj, obj_in, user)
-        return self.update_opp_score(db=db, opportunity=db_obj)
+        db_obj = self.update_opp_score(db=db, opportunity=db_obj)
+        refresh_owner_summaries(db, owner_ids | {db_obj.owner_id})
+        return db_obj
+
+    def delete(self, db: Session, db_obj: Opportunity, user: User) -> None:
+        """Deletes an opportunity"""
+        owner_id = db_obj.owner_id
+        super().delete(db, db_obj, user)
+        refresh_owner_summaries(db, {owner_id})
+
+    def bulk_create(self, user: User, filepath: Path) -> None:
+        """Creates opportunities in bulk, then refreshes the whole opportunity summary"""
+        super().bulk_create(user, filepath)
+        with with_db(db_schema.get()) as db:
+            refresh_owner_summaries(db)
 
     def update_opp_score(self, db: Session, opportunity: Opportunity):
-        """Calculates & updates the opportunity AI Score in the database"""
+        """Calculates & updates the opportunity AI Score in the database. If the ML executor is
+        busy, the committed opportunity is returned without (or with its previous) AI Score, which
+        is recomputed by the 'rescore' maintenance task"""
         # This must be called after the underlying Create or Update has been committed
-        opportunity.ai_score = opp_score.predict(opportunity_id=opportunity.id)  # type: ignore
+        try:
+            opportunity.ai_score = ml_executor.run(opp_score.predict, opportunity_id=opportunity.id)  # type: ignore
+        except ExecutorBusy:
+            logger.warning(f"Opportunity {opportunity.id} was saved without scoring (busy)")
+            return opportunity
         db.add(opportunity)
         db.commit()
         db.refresh(opportunity)
@@ -116,118 +130,77 @@ class CRUDOpp(CRUDBase[Opportunity, OpportunityCreate, OpportunityUpdate]):
 
     def get_user_dashboard(self, db: Session, user: User):
         """Returns opportunity dashboard data for the user"""
-        opp_df = pd.read_sql_query(
-            select(
-                Opportunity.id,
-                Opportunity.status,
-                Opportunity.age,
-                Opportunity.close_month.label("close_month"),
-                Opportunity.close_quarter.label("close_quarter"),
-                Opportunity.close_year.label("close_year"),
-            ).where(Opportunity.owner_id == user.id),
-            db.connection(),
-        )
-
-        (
-            open_opportunities,
-            won_opp_current_month,
-            won_opp_current_quarter,
-            average_time_to_close,
-        ) = self._calc_dashboard_kpi(opp_df=opp_df)
-
-        return {
-            "open_opportunities": open_opportunities,
-            "won_opp_current_month": won_opp_current_month,
-            "won_opp_current_quarter": won_opp_current_quarter,
-            "average_time_to_close": average_time_to_close,
-        }
+        kpi, _ = self._get_dashboard_data(db=db, owner_id=user.id)  # type: ignore
+        return kpi
 
     def get_admin_dashboard(self, db: Session, user: User):
         """Returns dashboard data for all opportunities"""
         if user.role_id not in self.ALLOWED_ROLES_ALL:
             raise permission_exception
 
-        opp_df = pd.read_sql_query(
-            select(
-                Opportunity.id,
-                Opportunity.status,
-                Opportunity.stage_id,
-                Opportunity.expected_amount,
-                Opportunity.age,
-                Opportunity.close_month.label("close_month"),
-                Opportunity.close_quarter.label("close_quarter"),
-                Opportunity.close_year.label("close_year"),
-            ),
-            db.connection(),
-        )
-
-        (
-            open_opportunities,
-            won_opp_current_month,
-            won_opp_current_quarter,
-            average_time_to_close,
-        ) = self._calc_dashboard_kpi(opp_df=opp_df)
-
-        stages, expected_amount = self._calc_pipeline(opp_df=opp_df, db=db)
-
-        return {
-            "open_opportunities": open_opportunities,
-            "won_opp_current_month": won_opp_current_month,
-            "won_opp_current_quarter": won_opp_current_quarter,
-            "average_time_to_close": average_time_to_close,
-            "pipeline": {"stages": stages, "expected_amount": expected_amount},
+        kpi, pipeline = self._get_dashboard_data(db=db)
+        return {**kpi, "pipeline": pipeline}
+
+    def _get_dashboard_data(self, db: Session, owner_id: int | None = None):
+        """Returns the KPIs and the open pipeline by stage from the opportunity summary (one row
+        per owner and stage), which is refreshed first if it is for a previous month"""
+        with using_replica(db):
+            stale = is_opp_summary_stale(db)
+        if stale:
+            refresh_opp_summary(db)
+            db.commit()
+
+        stats = select(
+            OppSummary.stage_id,
+            func.sum(OppSummary.open_count).label("open"),
+            func.sum(OppSummary.won_month_count).label("won_month"),
+            func.sum(OppSummary.won_quarter_count).label("won_quarter"),
+            func.sum(OppSummary.won_count).label("won"),
+            func.sum(OppSummary.won_age).label("won_age"),
+            func.sum(OppSummary.expected_amount).label("expected_amount"),
+            func.max(OppSummary.refreshed_on).label("refreshed_on"),
+        ).group_by(OppSummary.stage_id)
+        if owner_id is not None:
+            stats = stats.where(OppSummary.owner_id == owner_id)
+        stats = stats.subquery()
+
+        with using_replica(db):
+            rows = db.execute(
+                select(stats, OppStage.description.label("stage"))
+                .outerjoin(OppStage, OppStage.id == stats.c.stage_id)
+                .order_by(OppStage.sort_order, stats.c.stage_id)
+            ).all()
+
+        won = sum(row.won for row in rows)
+        won_age = sum(row.won_age or 0 for row in rows)
+        kpi = {
+            "open_opportunities": sum(row.open for row in rows),
+            "won_opp_current_month": sum(row.won_month for row in rows),
+            "won_opp_current_quarter": sum(row.won_quarter for row in rows),
+            "average_time_to_close": float(won_age) / won if won else 0,
+            "refreshed_on": max((row.refreshed_on for row in rows), default=None),
         }
 
-    def _calc_dashboard_kpi(self, opp_df: pd.DataFrame):
-        current_month = datetime.now().month
-        current_quarter = (current_month - 1) // 3 + 1
-        current_year = datetime.now().year
-
-        open_opp_df = opp_df[opp_df["status"] == OppStatus.open].copy()
-        won_opp_df = opp_df[opp_df["status"] == OppStatus.won].copy()
-
-        won_opp_current_month = len(
-            won_opp_df[
-                (won_opp_df["close_month"] == current_month)
-                & (won_opp_df["close_year"] == current_year)
-            ]
-        )
-        won_opp_current_quarter = len(
-            won_opp_df[
-                (won_opp_df["close_quarter"] == current_quarter)
-                & (won_opp_df["close_year"] == current_year)
-            ]
-        )
-        open_opportunities = len(open_opp_df)
-        average_time_to_close = won_opp_df["age"].mean()
-
-        if math.isnan(average_time_to_close):
-            average_time_to_close = 0
-
-        return (
-            open_opportunities,
-            won_opp_current_month,
-            won_opp_current_quarter,
-            average_time_to_close,
-        )
-
-    def _calc_pipeline(self, opp_df: pd.DataFrame, db: Session):
-        open_opp_df = opp_df[opp_df["status"] == OppStatus.open].copy()
-        open_opp_df_sum = open_opp_df.groupby("stage_id")["expected_amount"].sum()
-        opp_stage_df = pd.read_sql_query(
-            select(OppStage.id, OppStage.sort_order, OppStage.description.label("stage")),
-            db.connection(),
-        )
-        pipeline_df = pd.merge(
-            open_opp_df_sum, opp_stage_df, how="left", left_on="stage_id", right_on="id"
-        )
-
-        return pipeline_df["stage"].tolist(), pipeline_df["expected_amount"].tolist()
+        pipeline_rows = [row for row in rows if row.open and row.stage_id is not None]
+        pipeline = {
+            "stages": [row.stage for row in pipeline_rows],
+            "expected_amount": [float(row.expected_amount or 0) for row in pipeline_rows],
+        }
+        return kpi, pipeline
 
 
 opportunity = CRUDOpp(Opportunity)
 
 
+def set_status(opportunity: Opportunity, status: str) -> None:
+    """Sets the status of the opportunity and, if it changes, when it was closed (won or lost)"""
+    if opportunity.status == status:
+        return
+
+    opportunity.status = status  # type: ignore
+    opportunity.closed_on = None if status == OppStatus.open else func.now()  # type: ignore
+
+
 def get_status_from_opp_stage(db: Session, stage_id: int) -> str:
     """Gets the default status from the Opportunity Stage"""
     opp_stage = db.execute(select(OppStage).where(OppStage.id == stage_id)).scalars().one_or_none()
@@ -0,0 +1,84 @@
+import re
+from fastapi import HTTPException
+from psycopg2.errors import QueryCanceled
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.enums import SearchType
+from app.core.permissions import permission_exception
+from app.crud.account import account
+from app.crud.answer import answer
+from app.crud.opportunity import opportunity
+from app.crud.task import task
+from app.db.base import SEARCH_CONFIG
+from app.db.session import db_session
+from app.models.user import User
+
+# CRUD object (its base query applies the list permissions) and title field of the searchable types
+SEARCH_SOURCES = {
+    SearchType.account: (account, "name"),
+    SearchType.opportunity: (opportunity, "name"),
+    SearchType.task: (task, "description"),
+    SearchType.answer: (answer, "question"),
+}
+
+
+def get_tsquery(text: str):
+    """Returns a prefix match tsquery of all the words in the text, or None if there are no words.
+    Ex: 'acme ren' -> 'acme:* & ren:*'"""
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return func.to_tsquery(SEARCH_CONFIG, " & ".join(f"{word}:*" for word in words))
+
+
+def search(db: Session, text: str, user: User, types: list[SearchType], limit: int) -> list:
+    """Returns the records of the searchable types that the user may list and that match the text,
+    ranked by relevance. All the types are searched in one query within the search timeout"""
+    db_session.set(db)
+    tsquery = get_tsquery(text)
+    if tsquery is None:
+        return []
+
+    queries = []
+    for search_type, (crud, title_field) in SEARCH_SOURCES.items():
+        if types and search_type not in types:
+            continue
+
+        try:
+            query = crud.get_query(user)
+        except HTTPException as e:
+            # The user may not list the records of this type
+            if e is permission_exception:
+                continue
+            raise
+
+        model = crud.model
+        rank = func.ts_rank(model.search_vector, tsquery)
+        queries.append(
+            query.with_only_columns(
+                literal(search_type.value).label("type"),
+                model.id.label("id"),
+                getattr(model, title_field).label("title"),
+                rank.label("rank"),
+            )
+            .where(model.search_vector.op("@@")(tsquery))
+            .order_by(rank.desc())
+            .limit(limit)
+        )
+
+    if not queries:
+        return []
+
+    hits = union_all(*queries).subquery()
+    db.execute(select(func.set_config("statement_timeout", str(settings.SEARCH_TIMEOUT_MS), True)))
+    try:
+        return db.execute(select(hits).order_by(hits.c.rank.desc()).limit(limit)).mappings().all()
+    except OperationalError as e:
+        if isinstance(e.orig, QueryCanceled):
+            raise HTTPException(
+                status_code=504, detail="The search took too long. Please refine the search."
+            )
+        raise
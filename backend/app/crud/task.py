@@ -1,11 +1,11 @@
-import pandas as pd
-import numpy as np
-from datetime import datetime, date
+from typing import Final
+from datetime import date, datetime, timedelta
 from fastapi.exceptions import HTTPException
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import Select
 
-from app.db.session import db_session
+from app.db.session import db_session, using_replica
 from app.crud.base import CRUDBase
 from app.models.user import User
 from app.core.permissions import has_permission, permission_exception
@@ -15,18 +15,12 @@ from app.models.task import Task, TaskCreate, TaskUpdate
 
 
 class CRUDTask(CRUDBase[Task, TaskCreate, TaskUpdate]):
-    def get_all(
-        self,
-        db: Session,
-        filter_spec: list[dict],
-        sort_spec: list[dict],
-        offset: int,
-        limit: int,
-        user: User,
-    ):
+    # Roles which may get the task dashboard of a team
+    ALLOWED_ROLES_TEAM: Final = ["ADMIN"]
+
+    def get_query(self, user: User) -> Select:
         """Returns all the tasks for the current user"""
-        query = select(Task).where(Task.owner_id == user.id)
-        return super().get_all(db, filter_spec, sort_spec, offset, limit, user, query)
+        return select(Task).where(Task.owner_id == user.id)
 
     def get_by_opp(
         self,
@@ -37,6 +31,7 @@ class CRUDTask(CRUDBase[Task, TaskCreate, TaskUpdate]):
         offset: int,
         limit: int,
         user: User,
+        fields: list[str] | None = None,
     ):
         """Returns all the tasks based on the Opportunity ID"""
         db_session.set(db)
@@ -54,7 +49,7 @@ class CRUDTask(CRUDBase[Task, TaskCreate, TaskUpdate]):
             raise permission_exception
 
         query = select(Task).where(Task.opportunity_id == opp_id)
-        return super().get_all(db, filter_spec, sort_spec, offset, limit, user, query)
+        return super().get_all(db, filter_spec, sort_spec, offset, limit, user, query, fields)
 
     def update(self, db: Session, db_obj: Task, obj_in: TaskUpdate, user: User) -> Task:
         """Updates a task"""
@@ -62,65 +57,34 @@ class CRUDTask(CRUDBase[Task, TaskCreate, TaskUpdate]):
             db_obj.completed_on = datetime.utcnow()  # type: ignore
         return super().update(db, db_obj, obj_in, user)
 
-    def get_dashboard_data(self, db: Session, user: User):
-        """Returns dashboard data for Tasks"""
-        tasks_df = pd.read_sql_query(select(Task).where(Task.owner_id == user.id), db.connection())
-        open_tasks_df = tasks_df[tasks_df["status"] != TaskStatus.completed].copy()
-        open_tasks_df["diff_due_date"] = (
-            open_tasks_df["due_date"] - date.today()
-        ) / np.timedelta64(  # type: ignore
-            1, "D"
-        )
-        completed_tasks_df = tasks_df[tasks_df["status"] == TaskStatus.completed].copy()
-        completed_tasks_df["diff_completed"] = (
-            datetime.today() - completed_tasks_df["completed_on"]
-        ) / np.timedelta64(  # type: ignore
-            1, "D"
-        )
-
-        due_today = self._get_due_task_count(open_tasks_df, 0)
-        due_in_7_days = self._get_due_task_count(open_tasks_df, 7)
-        overdue = self._get_overdue_task_count(open_tasks_df)
-        completed_last_7_days = self._get_completed_task_count(completed_tasks_df, 7)
-
-        return {
-            "due_today": due_today,
-            "due_in_7_days": due_in_7_days,
-            "overdue": overdue,
-            "completed_last_7_days": completed_last_7_days,
-        }
-
-    def _get_due_task_count(self, df: pd.DataFrame, days: int):
-        """Returns number of tasks due today or in the future
-
-        Args:
-            df (pd.DataFrame): DataFrame of Open Tasks
-            days (int): Number of days (0 = today)
-        """
-        if days == 0:
-            # Get tasks due today
-            return len(df[df["diff_due_date"] == 0])
-
-        if days > 0:
-            # Get tasks due in the future
-            return len(df[(df["diff_due_date"] > 0) & (df["diff_due_date"] <= days)])
-
-    def _get_overdue_task_count(self, df: pd.DataFrame) -> int:
-        """Returns number of tasks overdue
-
-        Args:
-            df (pd.DataFrame): DataFrame of Open Tasks
-        """
-        return len(df[df["diff_due_date"] < 0])
-
-    def _get_completed_task_count(self, df: pd.DataFrame, days: int):
-        """Returns number of completed tasks
+    def get_dashboard_data(self, db: Session, user: User, owner_ids: list[int] | None = None):
+        """Returns dashboard data for the tasks of the user or, for managers, of a team (owner IDs).
+        The counts are computed in one aggregate over the owner's tasks (owner, status and due
+        date index)"""
+        if not owner_ids:
+            owner_ids = [user.id]  # type: ignore
+        elif set(owner_ids) != {user.id} and user.role_id not in self.ALLOWED_ROLES_TEAM:
+            raise permission_exception
 
-        Args:
-            df (pd.DataFrame): DataFrame of Completed Tasks
-            days (int): Number of days in the past
-        """
-        return len(df[df["diff_completed"] <= days])
+        today = date.today()
+        week_end = today + timedelta(days=7)
+        completed_since = datetime.today() - timedelta(days=7)
+        is_open = Task.status != TaskStatus.completed
+        is_completed = Task.status == TaskStatus.completed
+
+        query = select(
+            func.count().filter(is_open & (Task.due_date == today)).label("due_today"),
+            func.count()
+            .filter(is_open & (Task.due_date > today) & (Task.due_date <= week_end))
+            .label("due_in_7_days"),
+            func.count().filter(is_open & (Task.due_date < today)).label("overdue"),
+            func.count()
+            .filter(is_completed & (Task.completed_on >= completed_since))
+            .label("completed_last_7_days"),
+        ).where(Task.owner_id.in_(owner_ids))
+
+        with using_replica(db):
+            return dict(db.execute(query).one()._mapping)
 
 
 task = CRUDTask(Task)
@@ -1,14 +1,80 @@
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.crud.base import CRUDBase
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.crud.base import AsyncCRUDBase, CRUDBase
 from app.models.user import User, UserCreate, UserUpdate
 
+# Authenticated users by (tenant schema, email, token ID). The cached users are detached and
+# merged into the session of each request without a query
+user_cache = TTLCache("user", ttl=settings.USER_CACHE_TTL, maxsize=10000)
+
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
     def get_by_email(self, db: Session, email: str) -> User | None:
         """Returns a user based on the given email"""
         return db.execute(select(User).where(User.email == email)).scalars().one_or_none()
 
+    def get_authenticated(self, db: Session, email: str, token_id: str | None) -> User | None:
+        """Returns the user of an access token from the user cache"""
+
+        def load() -> User | None:
+            result = self.get_by_email(db=db, email=email)
+            if result is not None:
+                db.expunge(result)
+            return result
+
+        cached_user = user_cache.get_or_load((db.info.get("schema"), email, token_id), load)
+        if cached_user is None:
+            return None
+        return db.merge(cached_user, load=False)
+
+    def update(self, db: Session, db_obj: User, obj_in: UserUpdate, user: User) -> User:
+        """Updates the user. Deactivations, role and password changes apply to the next request"""
+        email = db_obj.email
+        result = super().update(db=db, db_obj=db_obj, obj_in=obj_in, user=user)
+        invalidate_user(db=db, email=email)  # type: ignore
+        invalidate_user(db=db, email=result.email)  # type: ignore
+        return result
+
+    def delete(self, db: Session, db_obj: User, user: User) -> None:
+        """Deletes the user"""
+        email = db_obj.email
+        super().delete(db=db, db_obj=db_obj, user=user)
+        invalidate_user(db=db, email=email)  # type: ignore
+
+
+def invalidate_user(db: Session, email: str) -> None:
+    """Removes the user from the user cache (all the access tokens)"""
+    schema = db.info.get("schema")
+    user_cache.invalidate_matching(lambda key: key[:2] == (schema, email))
+
+
+class AsyncCRUDUser(AsyncCRUDBase[User, UserCreate, UserUpdate]):
+    async def get_by_email(self, db: AsyncSession, email: str) -> User | None:
+        """Returns a user based on the given email"""
+        result = await db.execute(select(User).where(User.email == email))
+        return result.scalars().one_or_none()
+
+    async def get_authenticated(
+        self, db: AsyncSession, email: str, token_id: str | None
+    ) -> User | None:
+        """Returns the user of an access token from the user cache (shared with CRUDUser)"""
+
+        async def load() -> User | None:
+            result = await self.get_by_email(db=db, email=email)
+            if result is not None:
+                db.expunge(result)
+            return result
+
+        key = (db.info.get("schema"), email, token_id)
+        cached_user = await user_cache.get_or_load_async(key, load)
+        if cached_user is None:
+            return None
+        return await db.merge(cached_user, load=False)
+
 
 user = CRUDUser(User)
+async_user = AsyncCRUDUser(User)
@@ -0,0 +1,228 @@
+"""Index advisor: logs the filter and sort specs of the list queries (without the filter values,
+which may be personal data) and replays them through EXPLAIN, with values sampled from the tenant
+tables, to report the filtered and sorted columns which are not covered by an index"""
+import json
+import logging
+from collections import Counter, namedtuple
+from sqlalchemy import inspect, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.core.config import settings
+from app.core.exceptions import BadSpecFormat
+from app.db.base import get_class_by_tablename
+from app.db.filter import apply_filters, get_filter_shape
+from app.db.session import with_db
+from app.db.sort import Sort, apply_sort
+from app.db.utilities import get_model_from_spec, get_sqlalchemy_field
+
+SpecReport = namedtuple(
+    "SpecReport", ["model", "filter", "sort", "count", "scans", "missing", "error"]
+)
+
+# Logged instead of the filter values
+VALUE_PLACEHOLDER = "?"
+
+spec_logger = logging.getLogger("presalesly.query_specs")
+if settings.QUERY_SPEC_LOG:
+    spec_handler = logging.FileHandler(settings.QUERY_SPEC_LOG)
+    spec_handler.setFormatter(logging.Formatter("%(message)s"))
+    spec_logger.addHandler(spec_handler)
+    spec_logger.setLevel(logging.INFO)
+    spec_logger.propagate = False
+
+
+def mask_filter_values(filter_spec):
+    """Returns the filter spec with its values replaced by placeholders (one per item of a list
+    value). None values are kept since they change the SQL (IS NULL)"""
+    if isinstance(filter_spec, list):
+        return [mask_filter_values(item) for item in filter_spec]
+    if not isinstance(filter_spec, dict):
+        return filter_spec
+
+    masked = {}
+    for key, value in filter_spec.items():
+        if key != "value":
+            masked[key] = mask_filter_values(value)
+        elif isinstance(value, (list, tuple)):
+            masked[key] = [VALUE_PLACEHOLDER] * len(value)
+        else:
+            masked[key] = None if value is None else VALUE_PLACEHOLDER
+    return masked
+
+
+def log_query_spec(model, filter_spec, sort_spec) -> None:
+    """Logs the filter (without its values) and sort specs of a list query as a JSON line (if
+    enabled in the settings)"""
+    if settings.QUERY_SPEC_LOG and (filter_spec or sort_spec):
+        spec_logger.info(
+            json.dumps(
+                {
+                    "model": model.__tablename__,
+                    "filter": mask_filter_values(filter_spec),
+                    "sort": sort_spec,
+                },
+                default=str,
+            )
+        )
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN of a statement. The plan is returned as JSON"""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def compile_explain(element, compiler, **kw):
+    return f"EXPLAIN (FORMAT JSON) {compiler.process(element.statement, **kw)}"
+
+
+def read_query_specs(log_file: str) -> Counter:
+    """Returns the distinct logged specs with the number of times they were logged"""
+    specs = Counter()
+    with open(log_file) as file:
+        for line in file:
+            if line.strip():
+                spec = json.loads(line)
+                specs[json.dumps([spec["model"], spec["filter"], spec["sort"]], sort_keys=True)] += 1
+    return specs
+
+
+def fill_filter_values(db, filter_spec, default_model, samples: dict):
+    """Returns the logged filter spec with each placeholder replaced by a value of its field in
+    the tenant table (None if the field has no values)"""
+    if isinstance(filter_spec, list):
+        return [fill_filter_values(db, item, default_model, samples) for item in filter_spec]
+    if not isinstance(filter_spec, dict):
+        return filter_spec
+    if "field" not in filter_spec:
+        # Boolean function. Ex: {"or": [...]}
+        return {
+            key: fill_filter_values(db, value, default_model, samples)
+            for key, value in filter_spec.items()
+        }
+
+    model = get_model_from_spec(filter_spec, default_model)
+    key = (model, filter_spec["field"])
+    if key not in samples:
+        field = get_sqlalchemy_field(model, filter_spec["field"])
+        samples[key] = db.execute(select(field).where(field.isnot(None)).limit(1)).scalar()
+
+    def fill(value):
+        return samples[key] if value == VALUE_PLACEHOLDER else value
+
+    value = filter_spec.get("value")
+    if isinstance(value, list):
+        return {**filter_spec, "value": [fill(item) for item in value]}
+    return {**filter_spec, "value": fill(value)}
+
+
+def _get_shape_fields(shape: tuple):
+    """Yields the (model name, field name) of the filters in a filter spec structure"""
+    for item in shape:
+        if len(item) == 2:
+            yield from _get_shape_fields(item[1])
+        else:
+            yield item[0], item[1]
+
+
+def get_spec_columns(default_model, filter_spec, sort_spec) -> list:
+    """Returns the table columns filtered or sorted by the specs. Column properties and
+    hybrids are skipped since they can't be indexed as plain columns"""
+    fields = list(_get_shape_fields(get_filter_shape(filter_spec or [], [])))
+    if isinstance(sort_spec, dict):
+        sort_spec = [sort_spec]
+    for item in sort_spec or []:
+        sort = Sort(item)
+        fields.append((item.get("model"), sort.field_name))
+
+    columns = []
+    for model_name, field_name in fields:
+        model = get_model_from_spec({"model": model_name} if model_name else {}, default_model)
+        column = model.__table__.columns.get(field_name)
+        if column is not None and column not in columns:
+            columns.append(column)
+    return columns
+
+
+def get_indexed_columns(connection, schema: str, table) -> set[str]:
+    """Returns the columns of the table which are the leading column of an index"""
+    inspector = inspect(connection)
+    table_schema = schema if table.schema == "tenant" else table.schema
+    primary_key = inspector.get_pk_constraint(table.name, schema=table_schema)
+    indexed = set(primary_key["constrained_columns"][:1])
+    for index in inspector.get_indexes(table.name, schema=table_schema):
+        if index["column_names"] and index["column_names"][0] is not None:
+            indexed.add(index["column_names"][0])
+    return indexed
+
+
+def get_scans(plan: dict) -> list[str]:
+    """Returns the sequential scans and sorts of a plan (without using an index)"""
+    scans = []
+    if plan["Node Type"] == "Seq Scan":
+        scan = f"Seq Scan on {plan['Relation Name']} (~{plan['Plan Rows']} rows)"
+        if "Filter" in plan:
+            scan += f" filter: {plan['Filter']}"
+        scans.append(scan)
+    elif plan["Node Type"] == "Sort":
+        scans.append(f"Sort on {', '.join(plan['Sort Key'])} (~{plan['Plan Rows']} rows)")
+
+    for child in plan.get("Plans", []):
+        scans.extend(get_scans(child))
+    return scans
+
+
+def advise(schema: str, log_file: str) -> list[SpecReport]:
+    """Replays the logged specs through EXPLAIN in the tenant schema and returns, for each distinct
+    spec, the sequential scans and sorts of its plan and the spec columns without an index. Each
+    spec is explained in its own savepoint: a spec which fails (Ex: a field which is no longer
+    filterable) is reported with its error"""
+    reports = []
+    samples = {}
+    with with_db(schema) as db:
+        connection = db.connection()
+        indexed_columns = {}
+
+        for key, count in read_query_specs(log_file).most_common():
+            tablename, filter_spec, sort_spec = json.loads(key)
+            model = get_class_by_tablename(tablename)
+            if model is None:
+                reports.append(
+                    SpecReport(tablename, filter_spec, sort_spec, count, [], [], "Unknown model")
+                )
+                continue
+
+            try:
+                with db.begin_nested():
+                    query = select(model)
+                    if filter_spec:
+                        filters = fill_filter_values(db, filter_spec, model, samples)
+                        query = apply_filters(query=query, default_model=model, filter_spec=filters)
+                    if sort_spec:
+                        query = apply_sort(query=query, default_model=model, sort_spec=sort_spec)
+                    plan = db.execute(Explain(query)).scalar()[0]["Plan"]
+
+                    missing = []
+                    for column in get_spec_columns(model, filter_spec, sort_spec):
+                        if column.table not in indexed_columns:
+                            indexed_columns[column.table] = get_indexed_columns(
+                                connection, schema, column.table
+                            )
+                        if column.name not in indexed_columns[column.table]:
+                            missing.append(f"{column.table.name}.{column.name}")
+            except (BadSpecFormat, SQLAlchemyError) as e:
+                error = str(getattr(e, "orig", e)).strip().splitlines()[0]
+                reports.append(SpecReport(tablename, filter_spec, sort_spec, count, [], [], error))
+                continue
+
+            reports.append(
+                SpecReport(tablename, filter_spec, sort_spec, count, get_scans(plan), missing, None)
+            )
+
+    return reports
@@ -1,11 +1,24 @@
-from sqlalchemy import MetaData
-from sqlalchemy.orm import declarative_base, declared_attr
+from sqlalchemy import MetaData, Column, Computed, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import declarative_base, declared_attr, deferred
 
 
 class CustomBase:
     """Base class which provides automated table name and
     resource type (for permissions)"""
 
+    # Fields which API clients may filter, sort, select and export (allow-list, so that new columns
+    # are not exposed until they are added here. Ex: password hashes are never listed)
+    __filterable_fields__: tuple[str, ...] = ()
+
+    # Whether the model may be referenced by name in client filter and sort specs
+    __filterable__: bool = False
+
+    # Relationship to the parent resource (PARENT permissions) and to the member resources, whose
+    # owners are the members (MEMBER permissions). Used to filter the lists in SQL
+    __parent_relationship__: str | None = None
+    __members_relationship__: str | None = None
+
     @declared_attr
     def __tablename__(cls):
         return cls.__name__.lower()  # type: ignore
@@ -19,13 +32,56 @@ metadata = MetaData(schema="tenant")
 Base = declarative_base(cls=CustomBase, metadata=metadata)
 
 
+# Index of the mapped classes by table name. Built once all the models are imported
+_classes_by_tablename: dict[str, type] = {}
+
+
+def build_model_index() -> None:
+    """Builds the table name to class index from the mapped classes"""
+    _classes_by_tablename.clear()
+    for mapper in Base.registry.mappers:
+        cls = mapper.class_
+        # 'name' instead of 'fullname' since fullname includes the schema name ('tenant') also
+        _classes_by_tablename[cls.__table__.name] = cls
+
+
 def get_class_by_tablename(tablename: str):
     """Return class reference mapped to table
 
     :param tablename: String with name of table.
     :return: Class reference or None.
     """
-    for cls in Base.registry._class_registry.values():  # type: ignore
-        if hasattr(cls, "__table__") and cls.__table__.name == tablename:
-            # Replaced 'fullname' with 'name' above since fullname included the schema name ('tenant') also
-            return cls
+    if not _classes_by_tablename:
+        build_model_index()
+    return _classes_by_tablename.get(tablename)
+
+
+def trigram_index(tablename: str, column_name: str) -> Index:
+    """Returns a trigram (pg_trgm) GIN index on a text column, used by the case insensitive
+    pattern and similarity filters"""
+    return Index(
+        f"ix_{tablename}_{column_name}_trgm",
+        column_name,
+        postgresql_using="gin",
+        postgresql_ops={column_name: "gin_trgm_ops"},
+    )
+
+
+# Text search configuration of the search vectors. 'simple' as the content may be in any language
+SEARCH_CONFIG = "simple"
+
+
+def search_vector_column(*weighted_columns: tuple[str, str]):
+    """Returns a generated (maintained by PostgreSQL on write) tsvector column of the text columns,
+    used by the global search. The column is deferred so that it is never loaded with the objects.
+    Ex: search_vector_column(("name", "A"), ("city", "B"))"""
+    expression = " || ".join(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({column_name}, '')), '{weight}')"
+        for column_name, weight in weighted_columns
+    )
+    return deferred(Column(TSVECTOR, Computed(expression, persisted=True)))
+
+
+def search_index(tablename: str) -> Index:
+    """Returns the GIN index of the search vector of a table"""
+    return Index(f"ix_{tablename}_search_vector", "search_vector", postgresql_using="gin")
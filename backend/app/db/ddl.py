@@ -0,0 +1,17 @@
+import sqlalchemy as sa
+from sqlalchemy.ext.compiler import compiles
+
+
+class AddColumn(sa.schema.DDLElement):
+    """ALTER TABLE ... ADD COLUMN of a column of a table"""
+
+    def __init__(self, table: sa.Table, column: sa.Column):
+        self.table = table
+        self.column = column
+
+
+@compiles(AddColumn)
+def compile_add_column(element, compiler, **kw):
+    table = compiler.preparer.format_table(element.table)
+    column = compiler.process(sa.schema.CreateColumn(element.column), **kw)
+    return f"ALTER TABLE {table} ADD COLUMN {column}"
@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+from collections.abc import Iterator
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy.engine import Result
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import Select
+
+from app.core.enums import ExportFormat
+
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    ExportFormat.csv: "text/csv",
+    ExportFormat.ndjson: "application/x-ndjson",
+}
+
+
+def get_export_columns(model) -> list:
+    """Returns the table columns of the model which are exported: those which API clients may
+    select (__filterable_fields__)"""
+    return [
+        column for column in model.__table__.columns if column.key in model.__filterable_fields__
+    ]
+
+
+def apply_export_columns(query: Select, default_model) -> Select:
+    """Replaces the ORM entity in the query with its plain table columns so that
+    rows are not hydrated into (and kept in the identity map as) ORM objects"""
+    return query.with_only_columns(*get_export_columns(default_model))
+
+
+def stream_query(db: Session, query: Select, export_format: ExportFormat) -> Iterator[str]:
+    """Streams the results of the query in batches using a server-side cursor"""
+    result = db.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+    if export_format == ExportFormat.ndjson:
+        yield from _stream_ndjson(result)
+    else:
+        yield from _stream_csv(result)
+
+
+def _stream_csv(result: Result) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(result.keys())
+    for partition in result.partitions():
+        writer.writerows(partition)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+    if buffer.tell():
+        # Only the header was written since there were no rows
+        yield buffer.getvalue()
+
+
+def _stream_ndjson(result: Result) -> Iterator[str]:
+    for partition in result.partitions():
+        yield "".join(
+            json.dumps(dict(row._mapping), default=_json_default) + "\n" for row in partition
+        )
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
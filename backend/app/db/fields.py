@@ -0,0 +1,47 @@
+from sqlalchemy import inspect
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql.expression import Select
+
+from app.core.exceptions import BadFieldsFormat
+from app.db.utilities import get_sqlalchemy_field
+
+
+def get_field_path(path: str) -> tuple[str, str | None]:
+    """Splits a field path into the field (or relationship) name and the name of the field
+    in the related model. Ex: 'account.name' -> ('account', 'name')"""
+    name, _, related_name = path.partition(".")
+    return name, related_name or None
+
+
+def apply_fields(query: Select, default_model, fields: list[str]) -> Select:
+    """Narrows the query to the requested fields. Fields of related models are requested as
+    '<relationship>.<field>' and are selected through an outer join on the relationship.
+    Each column is labelled with its requested path."""
+    relationships = inspect(default_model).relationships
+    joined_models = {}
+    columns = []
+
+    for path in fields:
+        name, related_name = get_field_path(path)
+
+        if related_name is None:
+            columns.append(get_sqlalchemy_field(default_model, name).label(path))
+            continue
+
+        if (
+            name not in relationships
+            or relationships[name].uselist
+            or not relationships[name].mapper.class_.__filterable__
+        ):
+            raise BadFieldsFormat(f"Field {path} not valid")
+
+        if name not in joined_models:
+            # Aliased since several relationships may point to the same model (Ex: owner and created_by)
+            joined_models[name] = aliased(relationships[name].mapper.class_)
+            query = query.outerjoin(
+                joined_models[name], getattr(default_model, name).of_type(joined_models[name])
+            )
+
+        columns.append(get_sqlalchemy_field(joined_models[name], related_name).label(path))
+
+    return query.with_only_columns(*columns)
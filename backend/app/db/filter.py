@@ -1,13 +1,17 @@
 from collections import namedtuple
 from collections.abc import Iterable
+from functools import lru_cache
 from six import string_types
-from itertools import chain
-from sqlalchemy import and_, not_, or_, func
+from itertools import chain, count
+from sqlalchemy import and_, not_, or_, bindparam
 from sqlalchemy.sql.expression import Select
 
 from app.core.exceptions import BadFilterFormat
 from app.db.utilities import auto_join, get_model_from_spec, get_sqlalchemy_field
 
+# Maximum number of distinct filter spec structures kept compiled
+FILTER_CACHE_SIZE = 512
+
 
 BooleanFunction = namedtuple("BooleanFunction", ("key", "sqlalchemy_fn", "only_one_arg"))
 BOOLEAN_FUNCTIONS = [
@@ -32,10 +36,14 @@ class Operator:
         "gte": lambda f, v: f >= v,
         "<=": lambda f, v: f <= v,
         "lte": lambda f, v: f <= v,
-        "startsWith": lambda f, v: func.lower(f).startswith(v.lower()),
-        "endsWith": lambda f, v: func.lower(f).endswith(v.lower()),
-        "contains": lambda f, v: func.lower(f).contains(v.lower()),
-        "notContains": lambda f, v: ~func.lower(f).contains(v.lower()),
+        # Case insensitive pattern matches. The values are turned into patterns (see PATTERNS)
+        # so that the comparisons can use the trigram indexes of the searchable fields
+        "startsWith": lambda f, v: f.ilike(v),
+        "endsWith": lambda f, v: f.ilike(v),
+        "contains": lambda f, v: f.ilike(v),
+        "notContains": lambda f, v: ~f.ilike(v),
+        # Trigram similarity (pg_trgm), for misspelled searches
+        "similar": lambda f, v: f.op("%")(v),
         "in": lambda f, v: f.in_(v),
         "not_in": lambda f, v: ~f.in_(v),
         "dateIs": lambda f, v: f == v,
@@ -45,6 +53,16 @@ class Operator:
         "between": lambda f, v: f.between(v[0], v[1]),
     }
 
+    # Operators which compare with IS NULL / IS NOT NULL when the value is None
+    NULL_OPERATORS = {"==", "equals", "!=", "notEquals", "dateIs", "dateIsNot"}
+
+    PATTERNS = {
+        "startsWith": "{}%",
+        "endsWith": "%{}",
+        "contains": "%{}%",
+        "notContains": "%{}%",
+    }
+
     def __init__(self, operator: str | None = None):
         if not operator:
             operator = "=="
@@ -61,12 +79,15 @@ class Filter:
         self.filter_spec = filter_spec
 
         try:
-            filter_spec["field"]
+            field_name = filter_spec["field"]
         except KeyError:
             raise BadFilterFormat("'field' is a mandatory filter attribute")
         except TypeError:
             raise BadFilterFormat(f"Filter spec {filter_spec} should be a dictionary")
 
+        if not isinstance(field_name, str) or not isinstance(filter_spec.get("model", ""), str):
+            raise BadFilterFormat("'field' and 'model' must be strings")
+
         self.operator = Operator(filter_spec.get("operator"))
         if "value" in filter_spec:
             self.value = filter_spec.get("value")
@@ -110,16 +131,53 @@ def _is_iterable_filter(filter_spec):
     return isinstance(filter_spec, Iterable) and not isinstance(filter_spec, (string_types, dict))
 
 
-def build_filters(filter_spec):
-    """Recursively process `filter_spec`"""
+def get_named_models(filters):
+    models = set()
+    for filter in filters:
+        models.update(filter.get_named_models())
+    return models
+
+
+def _get_placeholder(operator: str, name: str):
+    """Returns the bound parameter(s) standing in for the value of a filter"""
+    if operator == "between":
+        return (bindparam(f"{name}_0"), bindparam(f"{name}_1"))
+    if operator in ("in", "not_in"):
+        return bindparam(name, expanding=True)
+    return bindparam(name)
+
+
+def _escape_like(value: str) -> str:
+    """Escapes the LIKE wildcards in a value so that they are matched literally"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _get_parameters(operator: str, name: str, value) -> dict:
+    """Returns the values of the bound parameter(s) of a filter"""
+    if operator in Operator.PATTERNS:
+        if not isinstance(value, str):
+            raise BadFilterFormat(f"'{operator}' value must be a string")
+        return {name: Operator.PATTERNS[operator].format(_escape_like(value))}
+
+    if operator == "between":
+        try:
+            return {f"{name}_0": value[0], f"{name}_1": value[1]}
+        except (IndexError, KeyError, TypeError):
+            raise BadFilterFormat("'between' value must be a list of two values")
+    return {name: value}
+
+
+def get_filter_shape(filter_spec, values: list) -> tuple:
+    """Validates `filter_spec` and returns its structure (boolean functions, models, fields,
+    operators and null comparisons) as a hashable tuple. The operator and value of each filter
+    are appended to `values` in the order of the filters in the structure, except for the null
+    comparisons (Ex: == None) which have no value since they compile to IS NULL / IS NOT NULL."""
     if _is_iterable_filter(filter_spec):
-        return list(chain.from_iterable(build_filters(item) for item in filter_spec))
+        return tuple(chain.from_iterable(get_filter_shape(item, values) for item in filter_spec))
 
     if isinstance(filter_spec, dict):
         for boolean_function in BOOLEAN_FUNCTIONS:
             if boolean_function.key in filter_spec:
-                # The filter spec is for a boolean function
-                # Get the function argument definitions and validate
                 fn_args = filter_spec[boolean_function.key]
 
                 if not _is_iterable_filter(fn_args):
@@ -127,28 +185,65 @@ def build_filters(filter_spec):
                         f"{boolean_function.key} value must be an iterable across the function"
                     )
 
-                return [BooleanFilter(boolean_function.sqlalchemy_fn, *build_filters(fn_args))]
-
-    return [Filter(filter_spec=filter_spec)]
+                return ((boolean_function.key, get_filter_shape(fn_args, values)),)
 
-
-def get_named_models(filters):
-    models = set()
-    for filter in filters:
-        models.update(filter.get_named_models())
-    return models
+    filter = Filter(filter_spec=filter_spec)
+    is_null = filter.value is None and filter.operator.operator in Operator.NULL_OPERATORS
+    if not is_null:
+        values.append((filter.operator.operator, filter.value))
+    return ((filter_spec.get("model"), filter_spec["field"], filter.operator.operator, is_null),)
 
 
-def apply_filters(query: Select, default_model, filter_spec: list[dict] | dict):
-    filters = build_filters(filter_spec=filter_spec)
-    filter_models = get_named_models(filters=filters)
-    query = auto_join(query, filter_models)
+def _build_filters_from_shape(shape: tuple, names) -> list:
+    """Builds the filters of a filter spec structure with bound parameters as values"""
+    boolean_functions = {function.key: function.sqlalchemy_fn for function in BOOLEAN_FUNCTIONS}
+    filters = []
 
+    for item in shape:
+        if len(item) == 2:
+            # (boolean function key, structure of the function arguments)
+            key, fn_args = item
+            filters.append(
+                BooleanFilter(boolean_functions[key], *_build_filters_from_shape(fn_args, names))
+            )
+        else:
+            model_name, field_name, operator, is_null = item
+            filter_spec = {
+                "field": field_name,
+                "operator": operator,
+                "value": None if is_null else _get_placeholder(operator, next(names)),
+            }
+            if model_name is not None:
+                filter_spec["model"] = model_name
+            filters.append(Filter(filter_spec=filter_spec))
+
+    return filters
+
+
+@lru_cache(maxsize=FILTER_CACHE_SIZE)
+def compile_filters(default_model, shape: tuple):
+    """Returns the named models and the SQLAlchemy filter of a filter spec structure.
+    The filter is built once per model and structure, with bound parameters in place
+    of the values, so that SQLAlchemy's compiled cache is hit for repeated filters."""
+    filters = _build_filters_from_shape(shape, names=(f"filter_{i}" for i in count()))
     sqlalchemy_filters = [
         filter.format_for_sqlalchemy(default_model=default_model) for filter in filters
     ]
+    return frozenset(get_named_models(filters)), and_(*sqlalchemy_filters)
+
+
+def apply_filters(query: Select, default_model, filter_spec: list[dict] | dict):
+    values: list[tuple] = []
+    shape = get_filter_shape(filter_spec, values)
+
+    if not shape:
+        return query
+
+    filter_models, sqlalchemy_filter = compile_filters(default_model, shape)
+    query = auto_join(query, filter_models)
 
-    if sqlalchemy_filters:
-        query = query.where(*sqlalchemy_filters)
+    parameters = {}
+    for i, (operator, value) in enumerate(values):
+        parameters.update(_get_parameters(operator, f"filter_{i}", value))
 
-    return query
+    return query.where(sqlalchemy_filter.params(parameters))
@@ -1,3 +1,4 @@
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
@@ -17,10 +18,7 @@ def init_roles(db: Session) -> None:
         {"id": "MEMBER", "is_reserved": True, "is_standard": True},
         {"id": "TECHNICAL", "is_reserved": True, "is_standard": True},
     ]
-    for role in roles:
-        db.add(Role(**role))
-    # Flush seems to be needed here to ensure sequence of inserts, otherwise it errors out
-    db.flush()
+    db.execute(insert(Role).values(roles))
 
 
 def init_resource_types(db: Session) -> None:
@@ -32,9 +30,7 @@ def init_resource_types(db: Session) -> None:
         {"id": "task"},
         {"id": "answer"},
     ]
-    for resource_type in resource_types:
-        db.add(ResourceType(**resource_type))
-    db.flush()
+    db.execute(insert(ResourceType).values(resource_types))
 
 
 def init_access_control(db: Session) -> None:
@@ -80,19 +76,17 @@ def init_access_control(db: Session) -> None:
         {"resource_type_id": "answer", "role_id": "PROF", "permission": "update"},
         {"resource_type_id": "answer", "role_id": "PROF", "permission": "delete"},
     ]
-    for entry in access_control_entries:
-        db.add(AccessControl(**entry))
-    db.flush()
+    db.execute(insert(AccessControl).values(access_control_entries))
 
 
 def init_user(db: Session) -> None:
     """Initializes the Initial user"""
-    initial_user = User(
-        first_name="Initial",
-        last_name="User",
-        email=settings.INITIAL_EMAIL,
-        password=get_hashed_password(settings.INITIAL_PASSWORD),
-        role_id=settings.INITIAL_USER_ROLE,
+    db.execute(
+        insert(User).values(
+            first_name="Initial",
+            last_name="User",
+            email=settings.INITIAL_EMAIL,
+            password=get_hashed_password(settings.INITIAL_PASSWORD),
+            role_id=settings.INITIAL_USER_ROLE,
+        )
     )
-    db.add(initial_user)
-    db.flush()
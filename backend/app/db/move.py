@@ -0,0 +1,218 @@
+"""Moves a tenant schema to another shard with logical replication, with the tenant online: the
+tenant tables are created on the target shard and replicated from the source shard (initial copy,
+then the ongoing changes). At the cutover, the writes to the tenant tables are blocked until the
+target has caught up, the sequences are copied, the tenant is switched to the target shard and the
+source schema is renamed, so that the writes are only blocked for the catch-up (usually seconds).
+Writes blocked during the cutover fail once the source schema is renamed. The replication starts
+once the transactions running on the source shard have finished.
+
+Requirements: PostgreSQL 15+, wal_level=logical on the source shard, a role allowed to create
+publications, replication slots and subscriptions, and the target shard must be able to connect to
+the source shard with the URI of the source shard. The workers must listen to the tenant changes
+(TENANT_LISTEN, with a direct LISTEN_DATABASE_URI under PgBouncer): otherwise they keep the source shard of the tenant cached for up to
+TENANT_CACHE_TTL seconds after the cutover, and all its requests fail since the source schema is
+renamed"""
+from collections.abc import Callable
+from time import monotonic, perf_counter, sleep
+from sqlalchemy import select, text, update
+
+from app.core.config import settings
+from app.db.base import Base
+from app.db.session import notify_tenant_changed, shards, with_db
+from app.db.shared import init_database
+from app.db.tenant import drop_schema, get_tenant_script
+from app.models.shared import Tenant
+
+
+def wait_until(check: Callable[[], bool], timeout: float, what: str) -> None:
+    """Polls the check until it is true. Raises TimeoutError after timeout seconds"""
+    deadline = monotonic() + timeout
+    while not check():
+        if monotonic() > deadline:
+            raise TimeoutError(f"Timed out after {timeout:.0f} seconds waiting for {what}")
+        sleep(0.2)
+
+
+def drop_replication(name: str, source: str, target: str) -> None:
+    """Drops the subscription (target shard), the replication slot and the publication (source
+    shard) of a move, if they exist"""
+    with shards.get_engine(target).connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        if connection.execute(
+            text("SELECT 1 FROM pg_subscription WHERE subname = :name"), {"name": name}
+        ).scalar():
+            # The slot is dropped below, without connecting to the source from the subscription
+            connection.execute(text(f"ALTER SUBSCRIPTION {name} DISABLE"))
+            connection.execute(text(f"ALTER SUBSCRIPTION {name} SET (slot_name = NONE)"))
+            connection.execute(text(f"DROP SUBSCRIPTION {name}"))
+
+    with shards.get_engine(source).connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        slot_query = text("SELECT active FROM pg_replication_slots WHERE slot_name = :name")
+        if connection.execute(slot_query, {"name": name}).first() is not None:
+            # The walsender of a disabled subscription exits asynchronously
+            wait_until(
+                lambda: not connection.execute(slot_query, {"name": name}).scalar(),
+                timeout=60,
+                what="the replication slot to be released",
+            )
+            connection.execute(text("SELECT pg_drop_replication_slot(:name)"), {"name": name})
+        connection.execute(text(f"DROP PUBLICATION IF EXISTS {name}"))
+
+
+def move_tenant(
+    name: str,
+    target: str,
+    keep_source: bool = False,
+    sync_timeout: float = 3600,
+    lock_timeout: float = 5,
+    catchup_timeout: float = 30,
+    progress: Callable[[str], None] = lambda message: None,
+) -> float:
+    """
+    Moves the schema of the tenant to the target shard. The source schema is renamed to
+    <schema>_moved at the cutover and dropped, unless keep_source. If the writes can't be blocked
+    within lock_timeout seconds (Ex: long transactions) or the target doesn't catch up within
+    catchup_timeout seconds, the move is cancelled and the tenant stays on its shard. Returns the
+    seconds the writes were blocked
+    """
+    if not settings.TENANT_LISTEN:
+        raise Exception(
+            "Tenants can't be moved while the workers don't listen to the tenant changes "
+            "(TENANT_LISTEN, which requires LISTEN_DATABASE_URI with DB_PGBOUNCER): they would use "
+            "the source shard until their cache expires"
+        )
+
+    with with_db(None) as db:
+        tenant = db.execute(select(Tenant).where(Tenant.name == name)).scalar_one_or_none()
+
+    if not tenant:
+        raise Exception("No tenant matches the name")
+    source = tenant.shard
+    if source == target:
+        raise Exception(f"The tenant is already on the shard {target}")
+
+    source_engine = shards.get_engine(source)  # type: ignore
+    preparer = source_engine.dialect.identifier_preparer
+    quoted_schema = preparer.quote_schema(tenant.schema)
+    moved_schema = f"{tenant.schema}_moved"
+    tables = [
+        f"{quoted_schema}.{preparer.quote(table.name)}"
+        for table in Base.metadata.sorted_tables
+        if table.schema == "tenant"
+    ]
+    # Name of the publication, replication slot and subscription
+    replication = f"move_tenant_{tenant.id}"
+
+    # Leftovers of an interrupted move. The schema names are unique across the tenants
+    drop_replication(replication, source, target)  # type: ignore
+    init_database(target)
+    with with_db(None, shard=target) as db:
+        db.execute(text(f"DROP SCHEMA IF EXISTS {quoted_schema} CASCADE"))
+        db.commit()
+
+    progress(f"Creating the tenant tables on the shard {target}")
+    with with_db(None, shard=target) as db:
+        db.connection().connection.cursor().execute(get_tenant_script(tenant.schema))
+        db.commit()
+
+    switched = False
+    try:
+        progress("Replicating the tenant tables")
+        with source_engine.connect() as connection:
+            connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+            connection.execute(
+                text(f"CREATE PUBLICATION {replication} FOR TABLES IN SCHEMA {quoted_schema}")
+            )
+            # Created here rather than by the subscription, which can't create it if the shards
+            # are databases of the same server
+            connection.execute(
+                text("SELECT pg_create_logical_replication_slot(:name, 'pgoutput')"),
+                {"name": replication},
+            )
+
+        source_uri = source_engine.url.set(drivername="postgresql")
+        with shards.get_engine(target).connect() as connection:
+            connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+            connection.execute(
+                text(
+                    f"CREATE SUBSCRIPTION {replication} CONNECTION :uri PUBLICATION {replication} "
+                    f"WITH (create_slot = false, slot_name = {replication})"
+                ),
+                {"uri": source_uri.render_as_string(hide_password=False)},
+            )
+            wait_until(
+                lambda: not connection.execute(
+                    text(
+                        "SELECT count(*) FROM pg_subscription_rel r "
+                        "JOIN pg_subscription s ON s.oid = r.srsubid "
+                        "WHERE s.subname = :name AND r.srsubstate <> 'r'"
+                    ),
+                    {"name": replication},
+                ).scalar(),
+                timeout=sync_timeout,
+                what="the initial copy of the tenant tables",
+            )
+
+        progress("Blocking the writes and waiting for the shard to catch up")
+        with source_engine.connect() as connection, connection.begin():
+            connection.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout * 1000)}"))
+            connection.execute(text(f"LOCK TABLE {', '.join(tables)} IN EXCLUSIVE MODE"))
+            blocked = perf_counter()
+
+            lsn = connection.execute(text("SELECT pg_current_wal_lsn()")).scalar()
+            wait_until(
+                lambda: connection.execute(
+                    text(
+                        "SELECT confirmed_flush_lsn >= CAST(:lsn AS pg_lsn) "
+                        "FROM pg_replication_slots WHERE slot_name = :name"
+                    ),
+                    {"lsn": lsn, "name": replication},
+                ).scalar(),
+                timeout=catchup_timeout,
+                what="the shard to catch up",
+            )
+
+            # The sequences are not replicated
+            sequences = connection.execute(
+                text(
+                    "SELECT sequencename, last_value FROM pg_sequences "
+                    "WHERE schemaname = :schema AND last_value IS NOT NULL"
+                ),
+                {"schema": tenant.schema},
+            ).all()
+            with with_db(None, shard=target) as db:
+                for sequence, last_value in sequences:
+                    db.execute(
+                        text("SELECT setval(CAST(:sequence AS regclass), :value)"),
+                        {
+                            "sequence": f"{quoted_schema}.{preparer.quote(sequence)}",
+                            "value": last_value,
+                        },
+                    )
+                db.commit()
+
+            # Committed after the switch: the blocked writes then fail instead of being applied
+            # to the source schema
+            connection.execute(
+                text(f"ALTER SCHEMA {quoted_schema} RENAME TO {preparer.quote(moved_schema)}")
+            )
+            with with_db(None) as db:
+                db.execute(update(Tenant).where(Tenant.id == tenant.id).values(shard=target))
+                notify_tenant_changed(db, tenant.host)  # type: ignore
+                db.commit()
+            switched = True
+        downtime = perf_counter() - blocked
+    except Exception:
+        if not switched:
+            progress("Move cancelled, dropping the tenant tables on the target shard")
+            drop_replication(replication, source, target)  # type: ignore
+            drop_schema(tenant.schema, target)  # type: ignore
+        raise
+
+    progress("Dropping the replication")
+    drop_replication(replication, source, target)  # type: ignore
+    if not keep_source:
+        progress(f"Dropping the source schema {moved_schema}")
+        drop_schema(moved_schema, source)  # type: ignore
+    return downtime
@@ -0,0 +1,55 @@
+"""Listeners of PostgreSQL notifications (LISTEN/NOTIFY). Each listener runs in a daemon thread
+with a dedicated connection (LISTEN_DATABASE_URI), outside the connection pool, and reconnects when
+it is lost"""
+import logging
+import select
+from collections.abc import Callable
+from threading import Thread
+from time import sleep
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds between the reconnection attempts
+RECONNECT_DELAY = 5
+
+
+def start_listener(
+    channel: str,
+    on_notify: Callable[[str], None],
+    on_connect: Callable[[], None],
+    on_disconnect: Callable[[], None] | None = None,
+) -> Thread:
+    """Starts a thread which calls on_notify with the payload of each notification of the channel.
+    on_connect is called whenever the listener (re)connects, since notifications are lost while
+    disconnected. Ex: to invalidate a cache. on_disconnect is called when the connection is lost
+    (or can't be opened)"""
+
+    def listen() -> None:
+        while True:
+            try:
+                connection = psycopg2.connect(str(settings.LISTEN_DATABASE_URI))
+                try:
+                    connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                    connection.cursor().execute(f"LISTEN {channel}")
+                    on_connect()
+                    while True:
+                        if select.select([connection], [], [], 60) == ([], [], []):
+                            continue
+                        connection.poll()
+                        while connection.notifies:
+                            on_notify(connection.notifies.pop(0).payload)
+                finally:
+                    connection.close()
+            except Exception:
+                logger.exception(f"The listener of '{channel}' failed. Reconnecting")
+                if on_disconnect is not None:
+                    on_disconnect()
+                sleep(RECONNECT_DELAY)
+
+    thread = Thread(target=listen, name=f"listen-{channel}", daemon=True)
+    thread.start()
+    return thread
@@ -1,5 +1,6 @@
 from collections import namedtuple
 from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy.sql.expression import Select
 
@@ -7,9 +8,18 @@ from sqlalchemy.sql.expression import Select
 Pagination = namedtuple("Pagination", ["total", "page", "size"])
 
 
-def apply_pagination(db: Session, query: Select, offset: int, limit: int):
-    total = db.scalar(select(func.count()).select_from(query.subquery()))
+def _get_page(query: Select, offset: int, limit: int, total: int):
     query = query.limit(limit).offset(offset)
     page = (offset / limit) + 1
     size = limit
     return query, Pagination(total, page, size)
+
+
+def apply_pagination(db: Session, query: Select, offset: int, limit: int):
+    total = db.scalar(select(func.count()).select_from(query.subquery()))
+    return _get_page(query, offset, limit, total)
+
+
+async def apply_async_pagination(db: AsyncSession, query: Select, offset: int, limit: int):
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
+    return _get_page(query, offset, limit, total)
@@ -0,0 +1,74 @@
+"""Connection pools which record the checkout wait times and timeouts, and the engine options of
+the pool settings"""
+from time import perf_counter
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+from app.core.metrics import Timer
+
+
+class PoolStatisticsMixin:
+    """Records the time waited for a connection on checkout and the checkout timeouts"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._wait = Timer()
+        self._timeouts = 0
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            return super()._do_get()  # type: ignore
+        except exc.TimeoutError:
+            self._timeouts += 1
+            raise
+        finally:
+            self._wait.record(perf_counter() - start)
+
+    def recreate(self):
+        # The statistics are kept when the pool is recreated (Ex: Engine.dispose())
+        pool = super().recreate()  # type: ignore
+        pool._wait = self._wait
+        pool._timeouts = self._timeouts
+        return pool
+
+    def statistics(self) -> dict:
+        return {
+            "size": self.size(),  # type: ignore
+            "in_use": self.checkedout(),  # type: ignore
+            "idle": self.checkedin(),  # type: ignore
+            "overflow": max(self.overflow(), 0),  # type: ignore
+            "timeouts": self._timeouts,
+            "checkout_wait": self._wait.statistics(),
+        }
+
+
+class InstrumentedQueuePool(PoolStatisticsMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(PoolStatisticsMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def get_engine_options(asynchronous: bool = False) -> dict:
+    """Returns the create_engine options of the pool settings. New connections time out after
+    DB_CONNECT_TIMEOUT seconds (Ex: an unreachable replica or shard). In PgBouncer mode
+    (transaction pooling), the asyncpg prepared statement caches are disabled since consecutive
+    transactions may run on different server connections (psycopg2 doesn't prepare statements)"""
+    options = {
+        "poolclass": InstrumentedAsyncQueuePool if asynchronous else InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+    if asynchronous:
+        options["connect_args"] = {"timeout": settings.DB_CONNECT_TIMEOUT}
+        if settings.DB_PGBOUNCER:
+            options["connect_args"].update(statement_cache_size=0, prepared_statement_cache_size=0)
+    else:
+        options["connect_args"] = {"connect_timeout": settings.DB_CONNECT_TIMEOUT}
+    return options
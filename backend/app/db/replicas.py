@@ -0,0 +1,78 @@
+"""Read replicas. Read-only queries (lists, dashboards, ML data extraction) are sent to the replicas
+round-robin, skipping the replicas which failed their last health check"""
+import os
+from threading import Event, Lock, Thread
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+
+class ReplicaSet:
+    """Round-robin over the replica engines. The replicas are checked (SELECT 1) every
+    check_interval seconds by a background thread, started on the first pick (in each process),
+    so that a replica which doesn't answer never stalls a request. A replica which fails a check,
+    or is marked down after a failed query, is skipped until its next successful check"""
+
+    def __init__(self, engines: list[Engine], check_interval: float = 30) -> None:
+        self.engines = engines
+        self.check_interval = check_interval
+        self._lock = Lock()
+        self._next = 0
+        self._healthy = {engine: True for engine in engines}
+        self._reads = {engine: 0 for engine in engines}
+        self._checker_pid: int | None = None
+        self._stop = Event()
+
+    def _check(self, engine: Engine) -> bool:
+        try:
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            return True
+        except SQLAlchemyError:
+            return False
+
+    def _run_checks(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            for engine in self.engines:
+                self._healthy[engine] = self._check(engine)
+
+    def _start_checker(self) -> None:
+        """Starts the health check thread of the process if it is not running (Ex: in a process
+        forked after it was started)"""
+        with self._lock:
+            if self._checker_pid == os.getpid():
+                return
+            self._checker_pid = os.getpid()
+        Thread(target=self._run_checks, name="replica-checks", daemon=True).start()
+
+    def next(self) -> Engine | None:
+        """Returns the next healthy replica or None if there are no healthy replicas"""
+        if not self.engines:
+            return None
+        self._start_checker()
+
+        for _ in range(len(self.engines)):
+            with self._lock:
+                engine = self.engines[self._next % len(self.engines)]
+                self._next += 1
+                if self._healthy[engine]:
+                    self._reads[engine] += 1
+                    return engine
+
+        return None
+
+    def mark_down(self, engine: Engine) -> None:
+        """Skips the replica until its next successful health check"""
+        with self._lock:
+            self._healthy[engine] = False
+
+    def statistics(self) -> dict:
+        return {
+            engine.url.render_as_string(hide_password=True): {
+                "healthy": self._healthy[engine],
+                "reads": self._reads[engine],
+                "pool": engine.pool.statistics(),  # type: ignore
+            }
+            for engine in self.engines
+        }
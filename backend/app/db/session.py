@@ -1,57 +1,311 @@
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
 from contextvars import ContextVar
+from functools import lru_cache
+from threading import Lock
+from time import monotonic
 from fastapi import Depends, HTTPException, Request
-from sqlalchemy import create_engine, select
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
 
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.metrics import register_collector
+from app.db.pool import get_engine_options
+from app.db.replicas import ReplicaSet
+from app.db.shards import DEFAULT_SHARD, ShardRegistry
 from app.models.shared import Tenant
 
-tenants_cache = dict[str, Tenant]()
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)  # type: ignore
+engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, **get_engine_options())  # type: ignore
+async_engine = create_async_engine(
+    settings.ASYNC_SQLALCHEMY_DATABASE_URI, **get_engine_options(asynchronous=True)  # type: ignore
+)
+replicas = ReplicaSet(
+    [create_engine(uri, **get_engine_options()) for uri in settings.REPLICA_DATABASE_URIS],
+    check_interval=settings.REPLICA_CHECK_INTERVAL,
+)
+shards = ShardRegistry(settings.SHARD_DATABASE_URIS, engine, async_engine)  # type: ignore
+register_collector("db_pool", lambda: engine.pool.statistics())  # type: ignore
+register_collector("async_db_pool", lambda: async_engine.pool.statistics())  # type: ignore
+register_collector("replicas", replicas.statistics)
+register_collector("shards", shards.statistics)
 db_session: ContextVar[Session] = ContextVar("db_session")
 db_schema: ContextVar[str] = ContextVar("db_schema")
 
 
-@contextmanager
-def with_db(tenant_schema: str | None):
-    """Returns a DB session with a specific tenant schema"""
+@lru_cache(maxsize=1024)
+def with_schema(bind, tenant_schema: str | None):
+    """Returns the engine with the schema translation of a specific tenant schema. The engines
+    share the connection pool of the bind and are created once per schema"""
     if tenant_schema:
         schema_translate_map = dict(tenant=tenant_schema)
     else:
         schema_translate_map = None
 
-    connectable = engine.execution_options(schema_translate_map=schema_translate_map)
+    return bind.execution_options(schema_translate_map=schema_translate_map)
+
+
+def get_shard(tenant_schema: str | None) -> str:
+    """Returns the shard of a tenant schema (the default shard for the shared schema)"""
+    return tenant_registry.get_shard(tenant_schema) if tenant_schema else DEFAULT_SHARD
+
+
+def get_connectable(
+    tenant_schema: str | None, asynchronous: bool = False, shard: str | None = None
+):
+    """Returns the primary engine for a specific tenant schema, on the shard of the schema unless
+    a shard is given"""
+    bind = shards.get_engine(shard or get_shard(tenant_schema), asynchronous)
+    return with_schema(bind, tenant_schema)
+
+
+def get_read_connectable(tenant_schema: str | None):
+    """Returns a replica engine (or the primary if there are no healthy replicas) for a specific
+    tenant schema, for read-only queries outside a session. The replicas are replicas of the
+    default shard"""
+    shard = get_shard(tenant_schema)
+    if shard != DEFAULT_SHARD:
+        return with_schema(shards.get_engine(shard), tenant_schema)
+    return with_schema(replicas.next() or engine, tenant_schema)
+
+
+class RoutingSession(Session):
+    """Session which sends the reads in using_replica blocks to a read replica and everything else
+    to the primary. Once the session has written, all its reads go to the primary so that the
+    request reads its own writes"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info["has_writes"] = True
+        elif self.info.get("replica") is not None and not self.info.get("has_writes"):
+            return with_schema(self.info["replica"], self.info.get("schema"))
+        return super().get_bind(mapper, clause, **kw)
+
+
+@contextmanager
+def using_replica(db: Session):
+    """Sends the read-only queries of the block to a read replica, if there is a healthy one and
+    the session has not written yet. A replica raising an OperationalError is marked down"""
+    replica = None
+    if isinstance(db, RoutingSession) and "replica" not in db.info:
+        if not db.info.get("has_writes") and db.info.get("shard") == DEFAULT_SHARD:
+            replica = replicas.next()
+
+    if replica is None:
+        yield db
+        return
 
+    db.info["replica"] = replica
+    try:
+        yield db
+    except OperationalError:
+        replicas.mark_down(replica)
+        raise
+    finally:
+        del db.info["replica"]
+
+
+@contextmanager
+def with_db(tenant_schema: str | None, shard: str | None = None):
+    """Returns a DB session with a specific tenant schema, on the shard of the schema unless a
+    shard is given"""
+    shard = shard or get_shard(tenant_schema)
     try:
-        db = Session(autocommit=False, autoflush=False, bind=connectable)
+        db = RoutingSession(
+            autocommit=False,
+            autoflush=False,
+            bind=get_connectable(tenant_schema, shard=shard),
+            info={"schema": tenant_schema, "shard": shard},
+        )
         yield db
     finally:
         db.close()
 
 
+@asynccontextmanager
+async def with_async_db(tenant_schema: str | None, shard: str | None = None):
+    """Returns an async DB session with a specific tenant schema, on the shard of the schema
+    unless a shard is given. The objects are not expired on commit since expired attributes can't
+    be lazy loaded in async sessions"""
+    shard = shard or get_shard(tenant_schema)
+    connectable = get_connectable(tenant_schema, asynchronous=True, shard=shard)
+    db = AsyncSession(
+        bind=connectable,
+        autoflush=False,
+        expire_on_commit=False,
+        info={"schema": tenant_schema, "shard": shard},
+    )
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+# Channel on which the tenant changes are notified (payload: host of the tenant, empty for all)
+TENANT_CHANNEL = "tenant_changed"
+
+
+class TenantRegistry:
+    """Cache of the tenants by host. Unknown hosts are cached separately (so that they can't evict
+    the tenants) for TENANT_NEGATIVE_TTL seconds. While the listener of the tenant channel is
+    connected, unknown hosts are answered without a query for TENANT_CACHE_TTL seconds after all
+    the tenants were preloaded, since the tenant changes are then notified. The shards of the tenant
+    schemas are cached by schema"""
+
+    def __init__(self, ttl: float, maxsize: int, negative_ttl: float) -> None:
+        self.maxsize = maxsize
+        self._tenants = TTLCache("tenant", ttl=ttl, maxsize=maxsize)
+        self._unknown_hosts = TTLCache("unknown_host", ttl=negative_ttl, maxsize=maxsize)
+        self._shards = TTLCache("tenant_shard", ttl=ttl, maxsize=maxsize)
+        self._lock = Lock()
+        self._version = 0
+        self._complete_until = 0.0
+        self._listening = False
+        self._hits = 0
+        self._lookups = 0
+
+    def get(self, host: str) -> Tenant | None:
+        """Returns the tenant of the host, or None if there is none"""
+        tenant = self._tenants.get(host)
+        if tenant is None:
+            with self._lock:
+                known = self._listening and monotonic() < self._complete_until
+            if known or self._unknown_hosts.get(host, False):
+                self._record(hit=True)
+                return None
+            return self._load(host)
+
+        self._record(hit=True)
+        return tenant
+
+    def _load(self, host: str) -> Tenant | None:
+        self._record(hit=False)
+        version = self._version
+        with with_db(None) as db:
+            tenant = db.execute(select(Tenant).where(Tenant.host == host)).scalar_one_or_none()
+
+        with self._lock:
+            if version == self._version:
+                if tenant is None:
+                    self._unknown_hosts.set(host, True)
+                else:
+                    self._tenants.set(host, tenant)
+        return tenant
+
+    def get_shard(self, schema: str) -> str:
+        """Returns the shard of the tenant schema (the default shard if no tenant has the schema)"""
+        shard = self._shards.get(schema)
+        if shard is None:
+            version = self._version
+            with with_db(None) as db:
+                shard = db.execute(
+                    select(Tenant.shard).where(Tenant.schema == schema)
+                ).scalar_one_or_none()
+            shard = shard or DEFAULT_SHARD
+            with self._lock:
+                if version == self._version:
+                    self._shards.set(schema, shard)
+        return shard
+
+    def preload(self) -> int:
+        """Caches all the tenants (if they fit in the cache). Returns the number of tenants"""
+        version = self._version
+        with with_db(None) as db:
+            tenants = db.execute(select(Tenant).limit(self.maxsize + 1)).scalars().all()
+
+        with self._lock:
+            if version == self._version and len(tenants) <= self.maxsize:
+                for tenant in tenants:
+                    self._tenants.set(tenant.host, tenant)
+                    self._shards.set(tenant.schema, tenant.shard)
+                self._complete_until = monotonic() + self._tenants.ttl
+        return len(tenants)
+
+    def listener_connected(self) -> None:
+        """Reloads all the tenants since the notifications are lost while the listener is
+        disconnected"""
+        with self._lock:
+            self._listening = True
+        self.invalidate()
+        self.preload()
+
+    def listener_disconnected(self) -> None:
+        """Stops answering unknown hosts from the preloaded tenants until the listener reconnects"""
+        with self._lock:
+            self._listening = False
+
+    def invalidate(self, host: str | None = None) -> None:
+        """Removes the tenant of the host (all the tenants if no host) from the cache"""
+        with self._lock:
+            self._version += 1
+            self._complete_until = 0.0
+            if host:
+                self._tenants.invalidate(host)
+                self._unknown_hosts.invalidate(host)
+            else:
+                self._tenants.clear()
+                self._unknown_hosts.clear()
+            # The schema of the host is not known here
+            self._shards.clear()
+
+    def _record(self, hit: bool) -> None:
+        with self._lock:
+            self._lookups += 1
+            self._hits += hit
+
+    def statistics(self) -> dict:
+        with self._lock:
+            return {
+                "lookups": self._lookups,
+                "hits": self._hits,
+                "hit_rate": round(self._hits / self._lookups, 4) if self._lookups else None,
+                "listening": self._listening,
+                "preloaded": monotonic() < self._complete_until,
+            }
+
+
+tenant_registry = TenantRegistry(
+    ttl=settings.TENANT_CACHE_TTL,
+    maxsize=settings.TENANT_CACHE_SIZE,
+    negative_ttl=settings.TENANT_NEGATIVE_TTL,
+)
+register_collector("tenant_registry", tenant_registry.statistics)
+
+
+def notify_tenant_changed(db: Session, host: str | None = None) -> None:
+    """Notifies the workers that the tenant of the host (all tenants if no host) changed. The
+    notification is delivered when the transaction is committed"""
+    db.execute(select(func.pg_notify(TENANT_CHANNEL, host or "")))
+    tenant_registry.invalidate(host)
+
+
+def reload_tenants(host: str | None = None) -> None:
+    """Invalidates the tenant of the host (all the tenants if no host) and preloads the tenants"""
+    tenant_registry.invalidate(host)
+    tenant_registry.preload()
+
+
 def get_tenant(req: Request) -> Tenant:
     """Returns the tenant based on the host in the request"""
     host_without_port = req.headers["host"].split(":", 1)[0]
 
-    if host_without_port in tenants_cache:
-        return tenants_cache[host_without_port]
-
-    with with_db(None) as db:
-        tenant = db.execute(
-            select(Tenant).where(Tenant.host == host_without_port)
-        ).scalar_one_or_none()
-
+    tenant = tenant_registry.get(host_without_port)
     if tenant is None:
         raise HTTPException(status_code=403, detail="No tenant was found")
-
-    tenants_cache[host_without_port] = tenant
     return tenant
 
 
 def get_db(tenant: Tenant = Depends(get_tenant)):
     """Dependency to get the DB session"""
-    with with_db(tenant.schema) as db:  # type: ignore
+    with with_db(tenant.schema, tenant.shard) as db:  # type: ignore
+        yield db
+
+
+async def get_async_db(tenant: Tenant = Depends(get_tenant)):
+    """Dependency to get the async DB session"""
+    async with with_async_db(tenant.schema, tenant.shard) as db:  # type: ignore
         yield db
 
 
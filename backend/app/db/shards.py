@@ -0,0 +1,86 @@
+"""Tenant shards: the tenant schemas are spread over several PostgreSQL nodes. The shared tables
+(tenants, languages, countries, currencies) are on the default shard; each tenant schema is on the
+shard of its tenant (Tenant.shard). The other shards have a copy of the reference tables (languages,
+countries, currencies) referenced by the tenant tables"""
+from collections.abc import Callable
+from threading import Lock
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db.pool import get_engine_options
+
+DEFAULT_SHARD = "default"
+
+# Placement policies by name. A policy takes the name of the new tenant and the number of tenants
+# of each shard, and returns the shard of the new tenant
+PLACEMENT_POLICIES: dict[str, Callable[[str, dict[str, int]], str]] = {}
+
+
+def placement_policy(name: str):
+    """Registers the decorated function as the tenant placement policy of the name"""
+
+    def register(policy: Callable[[str, dict[str, int]], str]):
+        PLACEMENT_POLICIES[name] = policy
+        return policy
+
+    return register
+
+
+@placement_policy("least-tenants")
+def least_tenants(name: str, tenant_counts: dict[str, int]) -> str:
+    """Places the tenant on the shard with the fewest tenants"""
+    return min(tenant_counts, key=lambda shard: tenant_counts[shard])
+
+
+@placement_policy("default")
+def default_shard(name: str, tenant_counts: dict[str, int]) -> str:
+    """Places all the tenants on the default shard"""
+    return DEFAULT_SHARD
+
+
+class ShardRegistry:
+    """Engines of the shards by shard name. The default shard uses the primary engines, the engines
+    of the other shards are created on first use (with the pool settings of the primary)"""
+
+    def __init__(self, uris: dict[str, str], default_engine, default_async_engine) -> None:
+        self.uris = {name: make_url(uri) for name, uri in uris.items() if name != DEFAULT_SHARD}
+        self._engines = {DEFAULT_SHARD: default_engine}
+        self._async_engines = {DEFAULT_SHARD: default_async_engine}
+        self._lock = Lock()
+
+    @property
+    def names(self) -> list[str]:
+        return [DEFAULT_SHARD, *self.uris]
+
+    def get_engine(self, shard: str, asynchronous: bool = False):
+        """Returns the (sync or async) engine of the shard"""
+        engines = self._async_engines if asynchronous else self._engines
+        engine = engines.get(shard)
+        if engine is not None:
+            return engine
+
+        if shard not in self.uris:
+            raise Exception(f"No shard is configured with the name {shard}")
+        with self._lock:
+            if shard not in engines:
+                if asynchronous:
+                    uri = self.uris[shard].set(drivername="postgresql+asyncpg")
+                    engines[shard] = create_async_engine(uri, **get_engine_options(True))
+                else:
+                    engines[shard] = create_engine(self.uris[shard], **get_engine_options())
+            return engines[shard]
+
+    @property
+    def engines(self) -> list[Engine]:
+        """The sync engines created so far"""
+        return list(self._engines.values())
+
+    def statistics(self) -> dict:
+        """Pool statistics of the engines of the shards other than the default one"""
+        with self._lock:
+            engines = {shard: engine for shard, engine in self._engines.items()}
+            for shard, engine in self._async_engines.items():
+                engines[f"{shard}_async"] = engine
+        del engines[DEFAULT_SHARD], engines[f"{DEFAULT_SHARD}_async"]
+        return {name: engine.pool.statistics() for name, engine in engines.items()}
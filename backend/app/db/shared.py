@@ -1,9 +1,11 @@
-from sqlalchemy import MetaData, schema
+from sqlalchemy import MetaData, inspect, schema
 
 from app.db.base import Base
-from app.db.session import with_db, engine
+from app.db.ddl import AddColumn
+from app.db.session import with_db
+from app.db.shards import DEFAULT_SHARD
 from app.core.constants import LANGUAGES, COUNTRIES, CURRENCIES
-from app.models.shared import Language, Country, Currency
+from app.models.shared import Language, Country, Currency, Tenant
 
 
 def get_shared_metadata():
@@ -15,19 +17,29 @@ def get_shared_metadata():
     return meta
 
 
-def init_database():
-    """Creates the 'shared' database schema and the shared tables"""
+def init_database(shard: str = DEFAULT_SHARD):
+    """Creates the 'shared' database schema and the shared tables on the shard, or adds the
+    columns of the shared tables which don't exist yet. The tenant table is only on the default
+    shard, the other shards have the reference tables (languages, countries, currencies)"""
 
-    with with_db(None) as db:
+    with with_db(None, shard=shard) as db:
         """context = MigrationContext.configure(db)
         if context.get_current_revision() is not None:
             print("Database already exists.")
             return"""
 
-        if not engine.dialect.has_schema(engine, "shared"):  # type: ignore
+        connection = db.connection()
+        metadata = get_shared_metadata()
+        tables = [
+            table
+            for table in metadata.sorted_tables
+            if shard == DEFAULT_SHARD or table.name != Tenant.__tablename__
+        ]
+
+        if not connection.dialect.has_schema(connection, "shared"):
             db.execute(schema.CreateSchema("shared"))
 
-            get_shared_metadata().create_all(bind=db.connection())
+            metadata.create_all(bind=connection, tables=tables)
 
             for lang in LANGUAGES:
                 db.add(Language(code=lang))
@@ -37,8 +49,21 @@ def init_database():
 
             for currency in CURRENCIES:
                 db.add(Currency(code=currency))
+        else:
+            inspector = inspect(connection)
+            for table in tables:
+                if not inspector.has_table(table.name, table.schema):
+                    table.create(bind=connection)
+                    continue
+
+                existing_columns = {
+                    column["name"] for column in inspector.get_columns(table.name, table.schema)
+                }
+                for column in table.columns:
+                    if column.name not in existing_columns:
+                        db.execute(AddColumn(table, column))
 
-            db.commit()
+        db.commit()
 
         """ alembic_config.attributes["connection"] = db
         command.stamp(alembic_config, "head", purge=True) """
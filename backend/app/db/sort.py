@@ -1,3 +1,4 @@
+from functools import lru_cache
 from sqlalchemy.sql.expression import Select
 
 from app.core.exceptions import BadSortFormat
@@ -6,6 +7,9 @@ from app.db.utilities import auto_join, get_model_from_spec, get_sqlalchemy_fiel
 SORT_ASCENDING = 1
 SORT_DESCENDING = -1
 
+# Maximum number of distinct sort specs kept compiled
+SORT_CACHE_SIZE = 512
+
 
 class Sort:
     def __init__(self, sort_spec: dict):
@@ -22,6 +26,9 @@ class Sort:
         if order not in [SORT_ASCENDING, SORT_DESCENDING]:
             raise BadSortFormat(f"Order {order} not valid")
 
+        if not isinstance(field_name, str) or not isinstance(sort_spec.get("model", ""), str):
+            raise BadSortFormat("'field' and 'model' must be strings")
+
         self.field_name = field_name
         self.order = order
 
@@ -53,17 +60,30 @@ def get_named_models(sorts):
     return models
 
 
+@lru_cache(maxsize=SORT_CACHE_SIZE)
+def compile_sorts(default_model, shape: tuple):
+    """Returns the named models and the SQLAlchemy sorts of a sort spec structure,
+    built once per model and structure"""
+    sorts = [
+        Sort({"model": model_name, "field": field_name, "order": order})
+        if model_name is not None
+        else Sort({"field": field_name, "order": order})
+        for model_name, field_name, order in shape
+    ]
+    sqlalchemy_sorts = [sort.format_for_sqlalchemy(default_model=default_model) for sort in sorts]
+    return frozenset(get_named_models(sorts)), tuple(sqlalchemy_sorts)
+
+
 def apply_sort(query: Select, default_model, sort_spec: list[dict] | dict):
     if isinstance(sort_spec, dict):
         sort_spec = [sort_spec]
 
     sorts = [Sort(item) for item in sort_spec]
-    sort_models = get_named_models(sorts)
-    query = auto_join(query, sort_models)
-
-    sqlalchemy_sorts = [sort.format_for_sqlalchemy(default_model=default_model) for sort in sorts]
+    shape = tuple((sort.sort_spec.get("model"), sort.field_name, sort.order) for sort in sorts)
 
-    if sqlalchemy_sorts:
-        query = query.order_by(*sqlalchemy_sorts)
+    if not shape:
+        return query
 
-    return query
+    sort_models, sqlalchemy_sorts = compile_sorts(default_model, shape)
+    query = auto_join(query, sort_models)
+    return query.order_by(*sqlalchemy_sorts)
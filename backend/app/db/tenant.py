@@ -1,8 +1,16 @@
+import csv
+from functools import lru_cache
+from pathlib import Path
 import sqlalchemy as sa
 from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
 
-from app.db.base import Base
-from app.db.session import with_db
+from app.core.config import settings
+from app.db.base import Base, build_model_index
+from app.db.ddl import AddColumn
+from app.db.session import notify_tenant_changed, shards, with_db
+from app.db.shards import DEFAULT_SHARD, PLACEMENT_POLICIES
+from app.db.shared import init_database
 
 """Import all the SQLAlchemy models
 (Imported here instead of in __init__.py in models to avoid circular import issues)"""
@@ -16,6 +24,10 @@ from app.models.opp_template import *
 from app.models.opportunity import *
 from app.models.task import *
 from app.models.answer import *
+from app.models.dashboard import *
+from app.models.analytics import *
+
+build_model_index()
 
 from app.db.init_tenant import (
     init_roles,
@@ -25,11 +37,75 @@ from app.db.init_tenant import (
 )
 
 
-def create_tenant(name: str, schema: str, host: str) -> None:
+# PostgreSQL extensions required by the tenant tables (pg_trgm: trigram indexes of text filters)
+EXTENSIONS = ["pg_trgm"]
+
+
+def create_extensions(db) -> None:
+    """Creates the PostgreSQL extensions required by the tenant tables if they don't exist"""
+    for extension in EXTENSIONS:
+        db.execute(sa.text(f"CREATE EXTENSION IF NOT EXISTS {extension}"))
+
+
+@lru_cache
+def get_tenant_ddl() -> str:
+    """Returns the script which creates the tenant tables, indexes and constraints (same DDL as
+    create_all). The tables are not schema qualified, so that they are created in the first schema
+    of the search path. Generated once"""
+    statements = []
+    # The names of the column indexes include the schema of the tenant tables ('tenant')
+    metadata = sa.MetaData(naming_convention={"ix": "ix_tenant_%(column_0_label)s"})
+    for table in Base.metadata.sorted_tables:
+        table.to_metadata(metadata, schema=None if table.schema == "tenant" else table.schema)
+    tables = [table for table in metadata.sorted_tables if table.schema is None]
+
+    def collect(ddl, *args, **kwargs):
+        statements.append(str(ddl.compile(dialect=engine.dialect)).strip())
+
+    engine = sa.create_mock_engine("postgresql://", collect)
+    metadata.create_all(bind=engine, tables=tables, checkfirst=False)
+    return ";\n".join(statements) + ";"
+
+
+def get_tenant_script(schema: str) -> str:
+    """Returns the script which creates the tenant schema, the extensions and the tenant tables"""
+    quoted_schema = postgresql.dialect().identifier_preparer.quote_schema(schema)
+    extensions = "".join(f"CREATE EXTENSION IF NOT EXISTS {name};\n" for name in EXTENSIONS)
+    # The search path is set for the transaction only
+    search_path = f"{quoted_schema}, ".replace("'", "''")
+    return (
+        f"CREATE SCHEMA {quoted_schema};\n{extensions}"
+        "SELECT set_config('search_path', "
+        f"'{search_path}' || current_setting('search_path'), true);\n"
+        f"{get_tenant_ddl()}"
+    )
+
+
+def place_tenant(name: str) -> str:
+    """Returns the shard of a new tenant according to the placement policy (TENANT_PLACEMENT)"""
+    policy = PLACEMENT_POLICIES.get(settings.TENANT_PLACEMENT)
+    if policy is None:
+        raise Exception(f"No placement policy is registered as {settings.TENANT_PLACEMENT}")
+
+    with with_db(None) as db:
+        query = select(Tenant.shard, sa.func.count()).group_by(Tenant.shard)
+        counts = dict(db.execute(query).all())
+    return policy(name, {shard: counts.get(shard, 0) for shard in shards.names})
+
+
+def create_tenant(name: str, schema: str, host: str, shard: str | None = None) -> None:
     """
-    Creates a tenant schema and the tenant specific tables, and initializes the tenant
+    Creates a tenant schema and the tenant specific tables, and initializes the tenant. The schema
+    is created on the given shard or on the shard chosen by the placement policy. The schema,
+    extensions and tables are created by one script (one round trip) and the seed data is inserted
+    with one multi-row insert per table. The tenant is added to the tenant table (default shard)
+    once its schema is committed
     """
-    with with_db(schema) as db:
+    shard = shard or place_tenant(name)
+    if shard != DEFAULT_SHARD:
+        init_database(shard)
+
+    with with_db(None) as shared_db:
         """context = MigrationContext.configure(db.connection())
         script = alembic.script.ScriptDirectory.from_config(alembic_config)
         if context.get_current_revision() != script.get_current_head():
@@ -37,19 +113,72 @@ def create_tenant(name: str, schema: str, host: str) -> None:
                 "Database is not up-to-date. Execute migrations before adding new tenants."
             )"""
 
-        tenant = Tenant(
-            name=name,
-            schema=schema,
-            host=host,
-        )
-        db.add(tenant)
+        # Fails on a duplicate name, schema or host before the schema is created
+        shared_db.add(Tenant(name=name, schema=schema, host=host, shard=shard))
+        shared_db.flush()
+
+        with with_db(schema, shard=shard) as db:
+            connection = db.connection()
+            connection.connection.cursor().execute(get_tenant_script(schema))
+            init_roles(db)
+            init_resource_types(db)
+            init_access_control(db)
+            init_user(db)
+            db.commit()
 
-        db.execute(sa.schema.CreateSchema(schema))
-        Base.metadata.create_all(bind=db.connection())
-        init_roles(db)
-        init_resource_types(db)
-        init_access_control(db)
-        init_user(db)
+        try:
+            notify_tenant_changed(shared_db, host)
+            shared_db.commit()
+        except Exception:
+            drop_schema(schema, shard)
+            raise
+
+
+def create_tenants(filepath: Path) -> list[tuple[str, Exception | None]]:
+    """Creates the tenants of a CSV file with the columns name, schema, host and, optionally, shard
+    (the placement policy chooses the shard if empty). Each tenant is created in its own
+    transaction. Returns the name of each tenant with the error, if any"""
+    results = []
+    with filepath.open("r", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                create_tenant(
+                    name=row["name"],
+                    schema=row["schema"],
+                    host=row["host"],
+                    shard=row.get("shard") or None,
+                )
+                results.append((row["name"], None))
+            except Exception as e:
+                results.append((row["name"], e))
+    return results
+
+
+def sync_schema(schema: str) -> None:
+    """Adds the tables, columns and indexes of the tenant tables which don't exist yet in the tenant
+    schema. Used to roll out new tables, nullable or generated columns and indexes to existing
+    tenants"""
+    with with_db(schema) as db:
+        create_extensions(db)
+        connection = db.connection()
+        inspector = sa.inspect(connection)
+
+        for table in Base.metadata.sorted_tables:
+            if table.schema != "tenant":
+                continue
+
+            if not inspector.has_table(table.name, schema):
+                table.create(bind=connection)
+                continue
+
+            columns = inspector.get_columns(table.name, schema)
+            existing_columns = {column["name"] for column in columns}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    db.execute(AddColumn(table, column))
+
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
 
         db.commit()
 
@@ -61,8 +190,15 @@ def get_tenants() -> list[Tenant] | None:
     return tenants
 
 
+def drop_schema(schema: str, shard: str) -> None:
+    """Drops a tenant schema on a shard"""
+    with with_db(None, shard=shard) as db:
+        db.execute(sa.schema.DropSchema(schema, cascade=True))
+        db.commit()
+
+
 def delete_tenant(name: str) -> None:
-    """Drops the tenant schema and removes the tenant from the tenant table"""
+    """Removes the tenant from the tenant table and drops the tenant schema"""
     with with_db(None) as db:
         tenant = db.execute(select(Tenant).where(Tenant.name == name)).scalar_one_or_none()
 
@@ -71,5 +207,14 @@ def delete_tenant(name: str) -> None:
 
     with with_db(None) as db:
         db.delete(tenant)
-        db.execute(sa.schema.DropSchema(tenant.schema, cascade=True))
+        notify_tenant_changed(db, tenant.host)  # type: ignore
+        db.commit()
+
+    drop_schema(tenant.schema, tenant.shard)  # type: ignore
+
+
+def reload_tenant_caches() -> None:
+    """Notifies the workers to reload all the tenants. Ex: after the tenant table was edited"""
+    with with_db(None) as db:
+        notify_tenant_changed(db)
         db.commit()
@@ -1,15 +1,20 @@
-from sqlalchemy.sql.expression import Select
-from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy import inspect
+from sqlalchemy.orm.attributes import QueryableAttribute
+from sqlalchemy.sql.expression import ColumnElement, Select
+from sqlalchemy.sql.util import find_tables
 import types
 
+from app.core.exceptions import BadSpecFormat
 from app.db.base import get_class_by_tablename
 
 
 def get_model_from_spec(spec, default_model):
     model_name = spec.get("model")
     if model_name is not None:
-        # get model from model_name
+        # get model from model_name. Only whitelisted models may be referenced by clients
         model = get_class_by_tablename(model_name)
+        if model is None or not model.__filterable__:
+            raise BadSpecFormat(f"Model {model_name} not valid")
     else:
         # use the default model
         model = default_model
@@ -18,22 +23,47 @@ def get_model_from_spec(spec, default_model):
 
 
 def get_sqlalchemy_field(model, field_name: str):
-    sqlalchemy_field = getattr(model, field_name)
+    """Returns the column or SQL expression of a field. Only columns, column properties and
+    hybrids with a SQL expression listed in the __filterable_fields__ of the model may be
+    referenced; any other field is rejected."""
+    mapper = inspect(model).mapper
+    if (
+        field_name not in mapper.class_.__filterable_fields__
+        or field_name not in mapper.all_orm_descriptors
+        or field_name in mapper.relationships
+    ):
+        raise BadSpecFormat(f"Field {field_name} not valid")
 
-    # If it's a hybrid method, then we call it so that we can work with
-    # the result of the execution and not with the method object itself
-    if isinstance(sqlalchemy_field, types.MethodType):
-        sqlalchemy_field = sqlalchemy_field()
+    try:
+        sqlalchemy_field = getattr(model, field_name)
+
+        # If it's a hybrid method, then we call it so that we can work with
+        # the result of the execution and not with the method object itself
+        if isinstance(sqlalchemy_field, types.MethodType):
+            sqlalchemy_field = sqlalchemy_field()
+    except (TypeError, NotImplementedError):
+        # Hybrids without a SQL expression
+        raise BadSpecFormat(f"Field {field_name} not valid")
+
+    if not isinstance(sqlalchemy_field, (QueryableAttribute, ColumnElement)):
+        raise BadSpecFormat(f"Field {field_name} not valid")
 
     return sqlalchemy_field
 
 
 def auto_join(query: Select, models):
-    for model_name in models:
+    """Joins the named models to the query unless their tables are already part of it"""
+    if not models:
+        return query
+
+    joined_tables = set()
+    for from_clause in query.get_final_froms():
+        joined_tables.update(find_tables(from_clause, include_joins=False))
+
+    for model_name in sorted(models):
         model = get_class_by_tablename(model_name)
-        try:
+        if model.__table__ not in joined_tables:
             query = query.join(model)
-        except InvalidRequestError:
-            pass
+            joined_tables.add(model.__table__)
 
     return query
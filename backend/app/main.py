@@ -1,13 +1,19 @@
 import logging
 import time
 
-from fastapi import FastAPI, Request, status
+from fastapi import Depends, FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from sentence_transformers import SentenceTransformer
 
 from app.api.v1 import api_router
 from app.core.config import settings
+from app.core.exceptions import BadSpecFormat
+from app.core.executors import ExecutorBusy, configure_threadpool
+from app.core.metrics import get_metrics
+from app.core.security import check_metrics_token
+from app.db.notifications import start_listener
+from app.db.session import TENANT_CHANNEL, reload_tenants, tenant_registry
 from app.db.shared import init_database
 
 logger = logging.getLogger(__name__)
@@ -30,6 +36,25 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def configure_executors():
+    configure_threadpool()
+
+
+@app.on_event("startup")
+async def load_tenants():
+    """Preloads the tenants and, if enabled, reloads them whenever a tenant change is notified"""
+    if settings.TENANT_LISTEN:
+        start_listener(
+            TENANT_CHANNEL,
+            on_notify=lambda host: reload_tenants(host or None),
+            on_connect=tenant_registry.listener_connected,
+            on_disconnect=tenant_registry.listener_disconnected,
+        )
+    else:
+        tenant_registry.preload()
+
+
 @app.on_event("startup")
 async def startup_event():
     # Loading and saving the SBERT sentence embedding model on startup so that recommendations are faster
@@ -48,6 +73,21 @@ async def exception_handler(request: Request, exc: Exception):
     )
 
 
+@app.exception_handler(BadSpecFormat)
+async def bad_spec_exception_handler(request: Request, exc: BadSpecFormat):
+    """Invalid filter, sort or fields specs are client errors"""
+    return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"detail": str(exc)})
+
+
+@app.exception_handler(ExecutorBusy)
+async def executor_busy_exception_handler(request: Request, exc: ExecutorBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "5"},
+    )
+
+
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     """Adds processing time to each header response"""
@@ -73,3 +113,10 @@ async def root(request: Request):
 async def health():
     # TODO: Add code to check database connection and other infrastructure statuses
     return {"health": "OK"}
+
+
+@app.get("/metrics", dependencies=[Depends(check_metrics_token)])
+async def metrics():
+    """Runtime statistics of the threadpool, executors and caches of this worker (requires the
+    METRICS_TOKEN bearer token since they include the tenant hosts)"""
+    return get_metrics()
@@ -5,9 +5,9 @@ from catboost import CatBoostClassifier
 from sklearn.model_selection import cross_validate
 from skopt import BayesSearchCV
 from numpy import mean
-from sqlalchemy import select
+from sqlalchemy import bindparam, select, update
 
-from app.db.session import engine, db_schema
+from app.db.session import get_connectable, get_read_connectable, db_schema, with_db
 from app.core.enums import MLAlgorithm, OppStatus, Scoring
 from app.models.account import Account
 from app.models.opportunity import Opportunity
@@ -39,7 +39,7 @@ class OppScore:
             )
             .join_from(Opportunity, Account)
             .where((Opportunity.status == OppStatus.lost) | (Opportunity.status == OppStatus.won)),
-            con=engine.execution_options(schema_translate_map=dict(tenant=db_schema.get())),
+            con=get_read_connectable(db_schema.get()),
         )
         opp_data_X = opp_data.drop(columns="status")
         for feature in self.CAT_FEATURES:
@@ -63,7 +63,7 @@ class OppScore:
             )
             .join_from(Opportunity, Account)
             .where(Opportunity.id == opportunity_id),
-            con=engine.execution_options(schema_translate_map=dict(tenant=db_schema.get())),
+            con=get_connectable(db_schema.get()),
         )
         for feature in self.CAT_FEATURES:
             opp_record[feature] = opp_record[feature].astype("category")
@@ -186,20 +186,64 @@ class OppScore:
         }
         return result
 
-    def predict(self, opportunity_id: int) -> int:
-        schema = db_schema.get()
-
+    def _load_model(self, schema: str):
+        """Returns the model of the tenant or, if the tenant has none, the generic model"""
         try:
-            model = joblib.load(schema + "_" + self.MODEL_FILENAME)
+            return joblib.load(schema + "_" + self.MODEL_FILENAME)
         except FileNotFoundError:
             """raise HTTPException(
                 status_code=422, detail="No model for opportunity score exists"
             )"""
-            model = joblib.load(self.MODEL_FILENAME)  # Use the generic model
-        finally:
-            opp_record = self._get_record(opportunity_id)
-            prob = model.predict_proba(opp_record)  # type: ignore
-            return int(prob[0][1] * 100)
+            return joblib.load(self.MODEL_FILENAME)  # Use the generic model
+
+    def predict(self, opportunity_id: int) -> int:
+        schema = db_schema.get()
+        model = self._load_model(schema)
+        opp_record = self._get_record(opportunity_id)
+        prob = model.predict_proba(opp_record)  # type: ignore
+        return int(prob[0][1] * 100)
+
+    def score_open(self) -> int:
+        """Scores all the open opportunities of the tenant at once (one query, one prediction and
+        one batch update). Returns the number of scored opportunities"""
+        schema = db_schema.get()
+        model = self._load_model(schema)
+        opp_records = pd.read_sql_query(
+            sql=select(
+                Opportunity.id,
+                Opportunity.expected_amount,
+                Opportunity.expected_amount_curr_code,
+                Opportunity.age,
+                Account.industry_id,
+                Account.annual_revenue,
+                Account.annual_revenue_curr_code,
+                Account.number_of_employees,
+                Account.country_code,
+            )
+            .join_from(Opportunity, Account)
+            .where(Opportunity.status == OppStatus.open),
+            con=get_connectable(schema),
+        )
+        if opp_records.empty:
+            return 0
+
+        opportunity_ids = opp_records.pop("id")
+        for feature in self.CAT_FEATURES:
+            opp_records[feature] = opp_records[feature].astype("category")
+        probs = model.predict_proba(opp_records)[:, 1]  # type: ignore
+
+        with with_db(schema) as db:
+            db.execute(
+                update(Opportunity.__table__)
+                .where(Opportunity.__table__.c.id == bindparam("opportunity_id"))
+                .values(ai_score=bindparam("score")),
+                [
+                    {"opportunity_id": int(opportunity_id), "score": int(prob * 100)}
+                    for opportunity_id, prob in zip(opportunity_ids, probs)
+                ],
+            )
+            db.commit()
+        return len(opportunity_ids)
 
 
 opp_score = OppScore()
@@ -3,12 +3,37 @@ from sqlalchemy.orm import relationship
 from pydantic import EmailStr, AnyUrl, validator
 
 from app.core.constants import COUNTRIES, CURRENCIES
-from app.db.base import Base
+from app.db.base import Base, trigram_index, search_vector_column, search_index
 from app.models.base import AppBase
-from app.models.user import UserTimeStampMixin, UserTimeStampBase
+from app.models.user import USER_TIMESTAMP_FIELDS, UserTimeStampMixin, UserTimeStampBase
 
 # SQLAlchemy models
 class Account(Base, UserTimeStampMixin):
+    __filterable__ = True
+    __filterable_fields__ = (
+        "id",
+        "external_id",
+        "source_url",
+        "name",
+        "annual_revenue",
+        "annual_revenue_curr_code",
+        "number_of_employees",
+        "street",
+        "address_line_2",
+        "address_line_3",
+        "city",
+        "state",
+        "country_code",
+        "postal_code",
+        "fax",
+        "email",
+        "phone",
+        "website",
+        "industry_id",
+        "is_active",
+        *USER_TIMESTAMP_FIELDS,
+    )
+
     id = Column(Integer, primary_key=True)
     external_id = Column(String)
     source_url = Column(String)
@@ -29,6 +54,9 @@ class Account(Base, UserTimeStampMixin):
     website = Column(String)
     industry_id = Column(Integer, ForeignKey("industry.id"))
     is_active = Column(Boolean, default=True)
+    search_vector = search_vector_column(("name", "A"), ("city", "C"))
+
+    __table_args__ = (trigram_index("account", "name"), search_index("account"))
 
     industry = relationship("Industry")
 
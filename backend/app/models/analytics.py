@@ -0,0 +1,48 @@
+from datetime import date
+from sqlalchemy import Boolean, Column, Integer, Date, DateTime, Float, Numeric, Index, false, func
+
+from app.db.base import Base
+from app.models.base import AppBase
+
+
+# SQLAlchemy models
+class PipelineSnapshot(Base):
+    """Daily rollup of the opportunities by owner, industry and stage, taken by the scheduled
+    snapshot job. The open pipeline is as of the time the snapshot was taken and the closed
+    opportunities are those closed (Opportunity.closed_on) since the previous snapshot. The
+    backfilled snapshots (dates missed by the job) have the closures only since their open pipeline
+    is not known"""
+
+    __tablename__ = "pipeline_snapshot"
+
+    id = Column(Integer, primary_key=True)
+    snapshot_date = Column(Date, nullable=False)
+    owner_id = Column(Integer)
+    industry_id = Column(Integer)
+    stage_id = Column(Integer)
+    open_count = Column(Integer, nullable=False)
+    pipeline_amount = Column(Numeric)  # Expected amount of the open opportunities
+    weighted_amount = Column(Numeric)  # Expected amount x probability of the open opportunities
+    won_count = Column(Integer, nullable=False)
+    won_amount = Column(Numeric)
+    won_age = Column(Float)  # Total age (days from start to close) of the won opportunities
+    lost_count = Column(Integer, nullable=False)
+    backfilled = Column(Boolean, nullable=False, server_default=false())
+    created_on = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (Index("ix_pipeline_snapshot_snapshot_date", "snapshot_date"),)
+
+
+# Pydantic models
+class PipelineTrend(AppBase):
+    period: date  # First day of the week or month
+    group_id: int | None = None  # Owner, industry or stage ID if grouped
+    # Open pipeline of the last snapshot of the period (None if all its snapshots were backfilled)
+    open_opportunities: int | None = None
+    pipeline_amount: float | None = None
+    weighted_amount: float | None = None
+    won_opportunities: int
+    lost_opportunities: int
+    won_amount: float
+    win_rate: float | None = None  # Won / (won + lost) in the period
+    velocity: float | None = None  # Average days to close of the won opportunities
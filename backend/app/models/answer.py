@@ -1,18 +1,37 @@
 from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
 from sqlalchemy.orm import relationship
 
-from app.db.base import Base
+from app.db.base import Base, trigram_index, search_vector_column, search_index
 from app.models.base import AppBase
-from app.models.user import UserTimeStampMixin, UserTimeStampBase, UserSummary
+from app.models.user import (
+    USER_TIMESTAMP_FIELDS,
+    UserTimeStampMixin,
+    UserTimeStampBase,
+    UserSummary,
+)
 
 # SQLAlchemy models
 class Answer(Base, UserTimeStampMixin):
+    __filterable__ = True
+    __filterable_fields__ = (
+        "id",
+        "language_code",
+        "question",
+        "answer",
+        "owner_id",
+        "is_active",
+        *USER_TIMESTAMP_FIELDS,
+    )
+
     id = Column(Integer, primary_key=True)
     language_code = Column(String, ForeignKey("shared.language.code"), default="EN")
     question = Column(String, nullable=False)
     answer = Column(String, nullable=False)
     owner_id = Column(Integer, ForeignKey("user.id"))
     is_active = Column(Boolean, default=True)
+    search_vector = search_vector_column(("question", "A"), ("answer", "B"))
+
+    __table_args__ = (trigram_index("answer", "question"), search_index("answer"))
 
     owner = relationship("User", foreign_keys=[owner_id])
 
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, Date, DateTime, Float, Numeric, func
+
+from app.db.base import Base
+
+
+# SQLAlchemy models
+class OppSummary(Base):
+    """Opportunity KPIs by owner and stage for a period (month), read by the dashboards. The rows
+    are derived from the opportunities and refreshed by app.crud.dashboard"""
+
+    __tablename__ = "opp_summary"
+
+    id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer, index=True)
+    stage_id = Column(Integer)
+    period = Column(Date, nullable=False)  # First day of the month of the won counts
+    open_count = Column(Integer, nullable=False)
+    won_month_count = Column(Integer, nullable=False)  # Won with a close date in the month
+    won_quarter_count = Column(Integer, nullable=False)  # Won with a close date in the quarter
+    won_count = Column(Integer, nullable=False)
+    won_age = Column(Float)  # Total age of the won opportunities
+    expected_amount = Column(Numeric)  # Total expected amount of the open opportunities
+    refreshed_on = Column(DateTime, server_default=func.now())
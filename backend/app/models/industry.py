@@ -1,10 +1,10 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, select
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, select, bindparam
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.hybrid import hybrid_property
 
 from app.db.base import Base
 from app.models.base import AppBase
-from app.models.user import UserTimeStampBase, UserTimeStampMixin
+from app.models.user import USER_TIMESTAMP_FIELDS, UserTimeStampBase, UserTimeStampMixin
 from app.api.common import language_code
 
 # SQLAlchemy models
@@ -19,6 +19,11 @@ class IndustryDescription(Base, UserTimeStampMixin):
 
 
 class Industry(Base, UserTimeStampMixin):
+    __filterable__ = True
+    __filterable_fields__ = (
+        "id", "external_id", "is_active", "description", *USER_TIMESTAMP_FIELDS,
+    )
+
     id = Column(Integer, primary_key=True)
     external_id = Column(String)
     is_active = Column(Boolean, default=True)
@@ -37,7 +42,9 @@ class Industry(Base, UserTimeStampMixin):
             select(IndustryDescription.description)
             .where(
                 IndustryDescription.id == cls.id,
-                IndustryDescription.language_code == language_code.get(),
+                IndustryDescription.language_code == bindparam(
+                    "language_code", callable_=language_code.get, unique=True
+                ),
             )
             .scalar_subquery()
         )
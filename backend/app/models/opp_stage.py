@@ -1,11 +1,11 @@
-from sqlalchemy import Column, Integer, String, Numeric, Boolean, ForeignKey, select
+from sqlalchemy import Column, Integer, String, Numeric, Boolean, ForeignKey, select, bindparam
 from sqlalchemy.orm import relationship, column_property
 from sqlalchemy.ext.hybrid import hybrid_property
 from pydantic import confloat
 
 from app.db.base import Base
 from app.models.base import AppBase
-from app.models.user import UserTimeStampMixin, UserTimeStampBase
+from app.models.user import USER_TIMESTAMP_FIELDS, UserTimeStampMixin, UserTimeStampBase
 from app.core.enums import OppStatus
 from app.api.common import language_code
 
@@ -22,6 +22,18 @@ class OppStageDescription(Base, UserTimeStampMixin):
 
 class OppStage(Base, UserTimeStampMixin):
     __tablename__ = "opp_stage"
+    __filterable__ = True
+    __filterable_fields__ = (
+        "id",
+        "external_id",
+        "default_probability",
+        "default_probability_percent",
+        "sort_order",
+        "opp_status",
+        "is_active",
+        "description",
+        *USER_TIMESTAMP_FIELDS,
+    )
 
     id = Column(Integer, primary_key=True)
     external_id = Column(String)
@@ -46,7 +58,9 @@ class OppStage(Base, UserTimeStampMixin):
             select(OppStageDescription.description)
             .where(
                 OppStageDescription.id == cls.id,
-                OppStageDescription.language_code == language_code.get(),
+                OppStageDescription.language_code == bindparam(
+                    "language_code", callable_=language_code.get, unique=True
+                ),
             )
             .scalar_subquery()
         )
@@ -3,12 +3,14 @@ from sqlalchemy.orm import relationship
 
 from app.db.base import Base
 from app.models.base import AppBase
-from app.models.user import UserTimeStampMixin, UserTimeStampBase
+from app.models.user import USER_TIMESTAMP_FIELDS, UserTimeStampMixin, UserTimeStampBase
 from app.core.enums import Priority
 
 # SQLAlchemy models
 class OppTemplate(Base, UserTimeStampMixin):
     __tablename__ = "opp_template"
+    __filterable__ = True
+    __filterable_fields__ = ("id", "description", "is_active", *USER_TIMESTAMP_FIELDS)
 
     id = Column(Integer, primary_key=True)
     description = Column(String)
@@ -22,6 +24,16 @@ class OppTemplate(Base, UserTimeStampMixin):
 
 class OppTemplateTask(Base, UserTimeStampMixin):
     __tablename__ = "opp_template_task"
+    __filterable__ = True
+    __filterable_fields__ = (
+        "id",
+        "description",
+        "opp_template_id",
+        "due_date_offset",
+        "priority",
+        "is_required",
+        *USER_TIMESTAMP_FIELDS,
+    )
 
     id = Column(Integer, primary_key=True)
     description = Column(String)
@@ -1,5 +1,17 @@
 # type: ignore
-from sqlalchemy import Column, Integer, String, Numeric, Date, ForeignKey, select, func
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Numeric,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    select,
+    func,
+    text,
+)
 from sqlalchemy.orm import column_property, relationship
 from sqlalchemy.sql.expression import extract
 from sqlalchemy.ext.hybrid import hybrid_property
@@ -8,14 +20,49 @@ from datetime import date, timedelta
 from pydantic import confloat, NonNegativeFloat, validator, root_validator
 
 from app.core.constants import CURRENCIES
-from app.db.base import Base
+from app.db.base import Base, trigram_index, search_vector_column, search_index
 from app.models.base import AppBase
-from app.models.user import UserSummary, UserTimeStampMixin, UserTimeStampBase
+from app.models.user import (
+    USER_TIMESTAMP_FIELDS,
+    UserSummary,
+    UserTimeStampMixin,
+    UserTimeStampBase,
+)
 from app.core.enums import OppStatus, TaskStatus
 from app.models.task import Task
 
 # SQLAlchemy models
 class Opportunity(Base, UserTimeStampMixin):
+    __filterable__ = True
+    __members_relationship__ = "tasks"
+    __filterable_fields__ = (
+        "id",
+        "external_id",
+        "name",
+        "account_id",
+        "expected_amount",
+        "expected_amount_curr_code",
+        "start_date",
+        "close_date",
+        "owner_id",
+        "probability",
+        "probability_percent",
+        "weighted_amount",
+        "stage_id",
+        "opp_template_id",
+        "status",
+        "ai_score",
+        "close_month",
+        "close_quarter",
+        "close_year",
+        "not_started_task_count",
+        "in_progress_task_count",
+        "completed_task_count",
+        "age",
+        "days_remaining",
+        *USER_TIMESTAMP_FIELDS,
+    )
+
     id = Column(Integer, primary_key=True)
     external_id = Column(String)
     name = Column(String, nullable=False)
@@ -24,12 +71,32 @@ class Opportunity(Base, UserTimeStampMixin):
     expected_amount_curr_code = Column(String, ForeignKey("shared.currency.code"), nullable=False)
     start_date = Column(Date, nullable=False)
     close_date = Column(Date, nullable=False)
-    owner_id = Column(Integer, ForeignKey("user.id"), index=True)
+    owner_id = Column(Integer, ForeignKey("user.id"))
     probability = Column(Numeric(precision=5, scale=4))  # Valid interval is 0.0000 to 1.0000
     stage_id = Column(Integer, ForeignKey("opp_stage.id"))
     opp_template_id = Column(Integer, ForeignKey("opp_template.id"))
     status = Column(String, nullable=False, index=True)
+    # When the status was last changed to won or lost (None if open). Unlike the close date, which
+    # may be backdated, it is when the pipeline snapshots count the opportunity as closed
+    closed_on = Column(DateTime)
     ai_score = Column(Integer)
+    search_vector = search_vector_column(("name", "A"))
+
+    __table_args__ = (
+        trigram_index("opportunity", "name"),
+        search_index("opportunity"),
+        # Open opportunities of an owner (get_open) and the owner's opportunities by status
+        Index("ix_opportunity_owner_id_status", "owner_id", "status"),
+        # Open opportunities by close date (pipeline views) without indexing the closed ones
+        Index(
+            "ix_opportunity_close_date_open",
+            "close_date",
+            postgresql_where=text(f"status = '{OppStatus.open.value}'"),
+        ),
+        # Default sorts of the opportunity lists
+        Index("ix_opportunity_close_date", "close_date"),
+        Index("ix_opportunity_expected_amount", "expected_amount"),
+    )
 
     # Refer to https://docs.sqlalchemy.org/en/14/orm/mapped_sql_expr.html#using-column-property
     probability_percent = column_property(probability * 100)
@@ -48,7 +115,7 @@ class Opportunity(Base, UserTimeStampMixin):
         return (
             select(func.count(Task.id))
             .where(
-                Task.opportunity_id == id,
+                Task.opportunity_id == cls.id,
                 Task.status == TaskStatus.not_started,
             )
             .label("not_started_task_count")
@@ -63,7 +130,7 @@ class Opportunity(Base, UserTimeStampMixin):
         return (
             select(func.count(Task.id))
             .where(
-                Task.opportunity_id == id,
+                Task.opportunity_id == cls.id,
                 Task.status == TaskStatus.in_progress,
             )
             .label("in_progress_task_count")
@@ -78,7 +145,7 @@ class Opportunity(Base, UserTimeStampMixin):
         return (
             select(func.count(Task.id))
             .where(
-                Task.opportunity_id == id,
+                Task.opportunity_id == cls.id,
                 Task.status == TaskStatus.completed,
             )
             .label("completed_task_count")
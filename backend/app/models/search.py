@@ -0,0 +1,10 @@
+from app.core.enums import SearchType
+from app.models.base import AppBase
+
+
+# Pydantic models
+class SearchHit(AppBase):
+    type: SearchType
+    id: int
+    title: str
+    rank: float
@@ -1,6 +1,7 @@
 from sqlalchemy import Integer, Column, String
 
 from app.db.base import Base
+from app.db.shards import DEFAULT_SHARD
 
 # SQLAlchemy models
 class Tenant(Base):
@@ -8,6 +9,8 @@ class Tenant(Base):
     name = Column(String, nullable=False, index=True, unique=True)
     schema = Column(String, nullable=False, unique=True)
     host = Column(String, nullable=False, unique=True)
+    # Shard (PostgreSQL node) of the tenant schema
+    shard = Column(String, nullable=False, default=DEFAULT_SHARD, server_default=DEFAULT_SHARD)
 
     __table_args__ = {"schema": "shared"}
 
@@ -6,26 +6,62 @@ from sqlalchemy import (
     Date,
     DateTime,
     ForeignKey,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from datetime import date, datetime
 
-from app.db.base import Base
+from app.db.base import Base, search_vector_column, search_index
 from app.models.base import AppBase
-from app.models.user import UserTimeStampMixin, UserTimeStampBase, UserSummary
+from app.models.user import (
+    USER_TIMESTAMP_FIELDS,
+    UserTimeStampMixin,
+    UserTimeStampBase,
+    UserSummary,
+)
 from app.core.enums import Priority, TaskStatus
 
 # SQLAlchemy models
 class Task(Base, UserTimeStampMixin):
+    __filterable__ = True
+    __parent_relationship__ = "opportunity"
+    __filterable_fields__ = (
+        "id",
+        "description",
+        "due_date",
+        "completed_on",
+        "owner_id",
+        "priority",
+        "is_required",
+        "status",
+        "opportunity_id",
+        *USER_TIMESTAMP_FIELDS,
+    )
+
     id = Column(Integer, primary_key=True)
     description = Column(String, nullable=False)
     due_date = Column(Date, nullable=False)
     completed_on = Column(DateTime)
-    owner_id = Column(Integer, ForeignKey("user.id"), index=True)
+    owner_id = Column(Integer, ForeignKey("user.id"))
     priority = Column(String, default=Priority.medium)
     is_required = Column(Boolean, default=False)
     status = Column(String, default=TaskStatus.not_started)
     opportunity_id = Column(Integer, ForeignKey("opportunity.id"))
+    search_vector = search_vector_column(("description", "A"))
+
+    __table_args__ = (
+        # Tasks of an opportunity and the task counts by status of the opportunities
+        Index("ix_task_opportunity_id_status", "opportunity_id", "status"),
+        # Task dashboard counts of an owner (index-only with the completion date)
+        Index(
+            "ix_task_owner_id_status_due_date",
+            "owner_id",
+            "status",
+            "due_date",
+            postgresql_include=["completed_on"],
+        ),
+        search_index("task"),
+    )
 
     owner = relationship("User", foreign_keys=[owner_id])
     opportunity = relationship("Opportunity", back_populates="tasks")
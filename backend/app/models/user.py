@@ -40,9 +40,29 @@ class UserTimeStampMixin:
         return relationship("User", primaryjoin=lambda: User.id == cls.updated_by_id)
 
 
+# Fields of the UserTimeStampMixin which API clients may filter, sort and select
+USER_TIMESTAMP_FIELDS = ("created_on", "created_by_id", "updated_on", "updated_by_id")
+
+
 # The User class does not use the UserTimeStampMixin as it was not able to create the relationships correctly (possibly due to self-referencing).
 # The following (using remote_side) is the proper way. Refer to 'Adjacency List Relationships' in SQLAlchemy documentation.
 class User(Base):
+    __filterable__ = True
+    # The password hash and the login and password state (failed_logins, ...) are not exposed
+    __filterable_fields__ = (
+        "id",
+        "email",
+        "first_name",
+        "last_name",
+        "full_name",
+        "employee_id",
+        "language_code",
+        "role_id",
+        "is_active",
+        "last_login_date_time",
+        *USER_TIMESTAMP_FIELDS,
+    )
+
     id = Column(Integer, primary_key=True)
     email = Column(String, nullable=False, unique=True, index=True)
     password = Column(String, nullable=False)  # Password hash
@@ -0,0 +1,167 @@
+"""Throughput and latency of short DB requests under a mixed load with CPU-heavy ML requests.
+Compares the former execution model (async routes calling blocking code in the event loop) with
+the current one (sync routes run in the threadpool, ML work in the ML executor).
+
+The DB requests run a query which takes --db-ms on the database; the ML requests multiply
+matrices for about --ml-ms. Each model is served by uvicorn in a separate process.
+
+Run from the backend directory: python -m benchmarks.concurrency --duration 10
+"""
+import argparse
+import socket
+import statistics
+import time
+from multiprocessing import Process
+from threading import Thread
+import numpy as np
+import requests
+import uvicorn
+from fastapi import FastAPI
+from sqlalchemy import text
+
+from app.core.executors import configure_threadpool, ml_executor
+from app.db.session import engine
+
+MODELS = ["async routes (before)", "sync routes + ML executor"]
+
+
+def db_work(db_ms: int):
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT pg_sleep(:seconds)"), {"seconds": db_ms / 1000}).all()
+
+
+def ml_work(size: int):
+    matrix = np.random.rand(size, size)
+    for _ in range(5):
+        matrix = matrix @ matrix
+        matrix /= np.linalg.norm(matrix)
+    return float(matrix.sum())
+
+
+def create_app(model: str, db_ms: int, ml_size: int) -> FastAPI:
+    app = FastAPI()
+
+    if model == MODELS[0]:
+
+        @app.get("/db")
+        async def async_db():
+            db_work(db_ms)
+            return {}
+
+        @app.get("/ml")
+        async def async_ml():
+            return {"result": ml_work(ml_size)}
+
+    else:
+
+        @app.on_event("startup")
+        async def startup():
+            configure_threadpool()
+
+        @app.get("/db")
+        def sync_db():
+            db_work(db_ms)
+            return {}
+
+        @app.get("/ml")
+        def sync_ml():
+            return {"result": ml_executor.run(ml_work, ml_size)}
+
+    return app
+
+
+def serve(model: str, port: int, db_ms: int, ml_size: int):
+    app = create_app(model, db_ms, ml_size)
+    uvicorn.run(app, port=port, log_level="warning")
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def calibrate_ml_size(ml_ms: int) -> int:
+    """Returns the matrix size for which ml_work takes about ml_ms"""
+    size = 100
+    while True:
+        start = time.perf_counter()
+        ml_work(size)
+        if (time.perf_counter() - start) * 1000 >= ml_ms or size >= 4000:
+            return size
+        size = int(size * 1.25)
+
+
+def run_clients(url: str, clients: int, deadline: float, latencies: list):
+    def client():
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = session.get(url)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    threads = [Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def benchmark(model: str, args, ml_size: int) -> dict:
+    port = get_free_port()
+    server = Process(target=serve, args=(model, port, args.db_ms, ml_size), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{port}"
+
+    for _ in range(100):
+        try:
+            requests.get(f"{base_url}/db").raise_for_status()
+            break
+        except requests.ConnectionError:
+            time.sleep(0.1)
+
+    db_latencies: list[float] = []
+    ml_latencies: list[float] = []
+    deadline = time.perf_counter() + args.duration
+    threads = run_clients(f"{base_url}/db", args.db_clients, deadline, db_latencies)
+    threads += run_clients(f"{base_url}/ml", args.ml_clients, deadline, ml_latencies)
+    for thread in threads:
+        thread.join()
+
+    server.terminate()
+    server.join()
+
+    quantiles = statistics.quantiles(db_latencies, n=100)
+    return {
+        "db_rps": len(db_latencies) / args.duration,
+        "db_p50": quantiles[49] * 1000,
+        "db_p95": quantiles[94] * 1000,
+        "ml_rps": len(ml_latencies) / args.duration,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per model")
+    parser.add_argument("--db-clients", type=int, default=8)
+    parser.add_argument("--ml-clients", type=int, default=2)
+    parser.add_argument("--db-ms", type=int, default=5)
+    parser.add_argument("--ml-ms", type=int, default=200)
+    args = parser.parse_args()
+
+    ml_size = calibrate_ml_size(args.ml_ms)
+    print(
+        f"{args.db_clients} DB clients ({args.db_ms} ms queries), "
+        f"{args.ml_clients} ML clients (~{args.ml_ms} ms), {args.duration:.0f} s per model"
+    )
+    print(f"{'':<28}{'DB req/s':>10}{'DB p50 ms':>11}{'DB p95 ms':>11}{'ML req/s':>10}")
+    for model in MODELS:
+        result = benchmark(model, args, ml_size)
+        print(
+            f"{model:<28}{result['db_rps']:>10.1f}{result['db_p50']:>11.1f}"
+            f"{result['db_p95']:>11.1f}{result['ml_rps']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Compares the default serialization of a page of opportunities (Pydantic validation,
+jsonable_encoder and json) with the fast path (precompiled projection and orjson)
+
+Run from the backend directory: python -m benchmarks.serialization --rows 100
+"""
+import argparse
+import json
+import timeit
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from app.api.serialization import compile_projection, orjson_default
+from app.models.base import Page
+from app.models.opportunity import OpportunityRead
+
+
+def make_user(id: int):
+    return SimpleNamespace(
+        id=id,
+        email=f"user{id}@presalesly.com",
+        first_name="First",
+        last_name=f"Last {id}",
+        employee_id=None,
+        full_name=f"First Last {id}",
+    )
+
+
+def make_opportunity(id: int):
+    owner = make_user(id % 10)
+    return SimpleNamespace(
+        id=id,
+        external_id=f"EXT-{id}",
+        name=f"Opportunity {id}",
+        expected_amount=Decimal("125000.50"),
+        expected_amount_curr_code="USD",
+        start_date=date(2022, 1, 1),
+        close_date=date(2022, 12, 31),
+        probability=Decimal("0.2500"),
+        owner_id=owner.id,
+        account_id=id % 50,
+        stage_id=2,
+        account=SimpleNamespace(id=id % 50, name=f"Account {id % 50}"),
+        stage=SimpleNamespace(id=2, description="Qualification"),
+        owner=owner,
+        opp_template_id=None,
+        status="Open",
+        ai_score=72,
+        probability_percent=Decimal("25.0000"),
+        weighted_amount=Decimal("31250.125"),
+        age=120,
+        days_remaining=245,
+        close_month=Decimal("12"),
+        close_quarter=Decimal("4"),
+        close_year=Decimal("2022"),
+        not_started_task_count=3,
+        in_progress_task_count=1,
+        completed_task_count=4,
+        created_by=owner,
+        updated_by=None,
+        created_on=datetime(2022, 1, 1, 10, 30),
+        updated_on=None,
+    )
+
+
+def serialize_default(page: dict) -> bytes:
+    """Mirrors FastAPI's response_model handling followed by JSONResponse rendering"""
+    value = Page[OpportunityRead].parse_obj(page)
+    content = jsonable_encoder(value)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def serialize_fast(page: dict) -> bytes:
+    project = compile_projection(OpportunityRead)
+    content = {
+        "items": [project(item) for item in page["items"]],
+        "total": page["total"],
+        "page": int(page["page"]),
+        "size": page["size"],
+    }
+    return orjson.dumps(content, default=orjson_default)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100, help="Number of items in the page")
+    parser.add_argument("--repeat", type=int, default=200, help="Number of pages to serialize")
+    args = parser.parse_args()
+
+    page = {
+        "items": [make_opportunity(id) for id in range(args.rows)],
+        "total": args.rows,
+        "page": 1.0,
+        "size": args.rows,
+    }
+
+    # Both paths must produce the same document
+    assert json.loads(serialize_default(page)) == json.loads(serialize_fast(page))
+
+    default_time = timeit.timeit(lambda: serialize_default(page), number=args.repeat)
+    fast_time = timeit.timeit(lambda: serialize_fast(page), number=args.repeat)
+
+    print(f"Rows per page: {args.rows} | Pages: {args.repeat}")
+    print(f"Default (Pydantic + json): {default_time / args.repeat * 1000:.3f} ms/page")
+    print(f"Fast (projection + orjson): {fast_time / args.repeat * 1000:.3f} ms/page")
+    print(f"Speedup: {default_time / fast_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Compares the text filters on a large synthetic table: the former lower(...) LIKE filters,
+the ILIKE filters without an index and the ILIKE and similarity filters with a trigram index.
+The table is created in a scratch schema which is dropped at the end.
+
+Requires the pg_trgm extension to be available on the database server.
+Run from the backend directory: python -m benchmarks.text_search --rows 500000
+"""
+import argparse
+from sqlalchemy import Column, Integer, MetaData, String, Table, func, select, text
+
+from app.db.base import trigram_index
+from app.db.filter import Operator, _escape_like
+from app.db.session import engine
+from app.db.tenant import create_extensions
+
+WORDS = ["Cloud", "Migration", "Renewal", "Expansion", "Upgrade", "Pilot", "Analytics", "Support"]
+
+
+def explain(connection, query) -> tuple[str, float]:
+    """Returns the scan of the plan and the execution time (ms) of the query"""
+    compiled = query.compile(dialect=connection.dialect)
+    plan = connection.exec_driver_sql(
+        f"EXPLAIN (ANALYZE, FORMAT JSON) {compiled}", compiled.params
+    ).scalar()[0]
+
+    node = plan["Plan"]
+    # Descends to the scan of the table
+    while "Scan" not in node["Node Type"] and "Plans" in node:
+        node = node["Plans"][0]
+    return node["Node Type"], plan["Execution Time"]
+
+
+def get_queries(table, search: str):
+    name = table.c.name
+    return {
+        "lower(name) LIKE (before)": select(func.count()).where(
+            func.lower(name).contains(func.lower(search))
+        ),
+        "name ILIKE": select(func.count()).where(
+            Operator("contains").function(name, f"%{_escape_like(search)}%")
+        ),
+        "name % (similar)": select(func.count()).where(Operator("similar").function(name, search)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--search", default="expansion 4217")
+    parser.add_argument("--schema", default="benchmark_text_search")
+    args = parser.parse_args()
+
+    index = trigram_index("opportunity", "name")
+    table = Table(
+        "opportunity",
+        MetaData(schema=args.schema),
+        Column("id", Integer, primary_key=True),
+        Column("name", String, nullable=False),
+        index,
+    )
+
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {args.schema}"))
+        create_extensions(connection)
+        table.create(bind=connection)
+        index.drop(bind=connection)
+        # Ex: 'Account 217 - Expansion 4217'
+        connection.execute(
+            text(
+                f"INSERT INTO {args.schema}.opportunity (id, name) "
+                "SELECT i, 'Account ' || (i % 5000) || ' - ' "
+                "|| (:words)[1 + i % cardinality(:words)] || ' ' || i "
+                "FROM generate_series(1, :rows) AS i"
+            ),
+            {"rows": args.rows, "words": WORDS},
+        )
+        connection.execute(text(f"ANALYZE {args.schema}.opportunity"))
+
+    try:
+        with engine.begin() as connection:
+            results = {
+                label: explain(connection, query)
+                for label, query in get_queries(table, args.search).items()
+            }
+
+            index.create(bind=connection)
+            connection.execute(text(f"ANALYZE {args.schema}.opportunity"))
+
+            for label, query in get_queries(table, args.search).items():
+                results[f"{label} + trigram index"] = explain(connection, query)
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE"))
+
+    print(f"{args.rows} rows, search '{args.search}'")
+    for label, (scan, time) in results.items():
+        print(f"{label:<45} {scan:<18} {time:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
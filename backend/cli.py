@@ -1,9 +1,23 @@
+from collections import Counter
+from datetime import date, datetime
+from enum import Enum
+from pathlib import Path
+from time import perf_counter
 import typer
 
+from app.core.config import settings
+from app.core.maintenance import MAINTENANCE_TASKS, run_all
+from app.db.advisor import advise
+from app.db.move import move_tenant
+from app.crud.dashboard import refresh_dashboards
+from app.crud.analytics import snapshot_pipeline
 from app.db.tenant import (
     create_tenant,
+    create_tenants,
     get_tenants,
     delete_tenant,
+    reload_tenant_caches,
+    sync_schema,
 )
 
 app = typer.Typer()
@@ -12,7 +26,9 @@ app.add_typer(tenant_app, name="tenant")
 
 
 @tenant_app.command()
-def create():
+def create(
+    shard: str = typer.Option(None, help="Shard of the tenant. Default: per the placement policy")
+):
     """
     Create a tenant
 
@@ -27,19 +43,46 @@ def create():
         typer.echo("Tenant creation canceled")
         raise typer.Exit()
 
-    create_tenant(name=name, schema=schema, host=host)
+    create_tenant(name=name, schema=schema, host=host, shard=shard)
     typer.echo(f"Tenant created - Name: {name} | Schema: {schema} | Host: {host}")
 
 
+@tenant_app.command("create-many")
+def create_many(
+    file: Path = typer.Argument(
+        ...,
+        exists=True,
+        dir_okay=False,
+        help="CSV file with the columns name, schema, host and, optionally, shard",
+    )
+):
+    """Create the tenants of a CSV file. A tenant which fails is skipped"""
+    failed = 0
+    for name, error in create_tenants(filepath=file):
+        if error is None:
+            typer.echo(f"Tenant created - Name: {name}")
+        else:
+            failed += 1
+            # The DB error without the statement. Ex: the schema already exists
+            message = str(getattr(error, "orig", error)).strip()
+            typer.echo(f"Tenant not created - Name: {name} | Error: {message}", err=True)
+
+    if failed:
+        raise typer.Exit(code=1)
+
+
 @tenant_app.command()
 def list():
     """Show all the tenants"""
     tenants = get_tenants()
     if tenants is not None:
         if len(tenants) != 0:
-            typer.echo("ID | Name | Schema | Host")
+            typer.echo("ID | Name | Schema | Host | Shard")
             for tenant in tenants:
-                typer.echo(f"{tenant.id} | {tenant.name} | {tenant.schema} | {tenant.host}")
+                typer.echo(
+                    f"{tenant.id} | {tenant.name} | {tenant.schema} | {tenant.host} | "
+                    f"{tenant.shard}"
+                )
         else:
             typer.echo("No tenants found")
 
@@ -61,5 +104,153 @@ def delete():
         print(e)
 
 
+@tenant_app.command()
+def move(
+    name: str = typer.Argument(..., help="Name of the tenant"),
+    shard: str = typer.Argument(..., help="Shard to which the tenant schema is moved"),
+    keep_source: bool = typer.Option(False, help="Keep the source schema (as <schema>_moved)"),
+    lock_timeout: float = typer.Option(5, help="Seconds to wait for blocking the writes"),
+    catchup_timeout: float = typer.Option(30, help="Seconds the writes may be blocked"),
+):
+    """Move the schema of a tenant to another shard. The tenant stays online: its writes are only
+    blocked while the target shard catches up. Requires TENANT_LISTEN (with PgBouncer in transaction
+    pooling mode, a direct LISTEN_DATABASE_URI), so that the workers switch to the target shard at
+    once"""
+    try:
+        downtime = move_tenant(
+            name=name,
+            target=shard,
+            keep_source=keep_source,
+            lock_timeout=lock_timeout,
+            catchup_timeout=catchup_timeout,
+            progress=typer.echo,
+        )
+    except Exception as e:
+        message = str(getattr(e, "orig", e)).strip()
+        typer.echo(f"Tenant not moved - Name: {name} | Error: {message}", err=True)
+        raise typer.Exit(code=1)
+
+    typer.echo(f"Tenant moved - Name: {name} | Shard: {shard} | Writes blocked: {downtime:.2f} s")
+
+
+@tenant_app.command("reload-cache")
+def reload_cache():
+    """Make the running workers reload the tenants (Ex: after the tenant table was edited)"""
+    reload_tenant_caches()
+    typer.echo("Tenant reload notified")
+
+
+@tenant_app.command("sync")
+def sync_all():
+    """Add the missing columns and indexes to the schemas of all the tenants"""
+    tenants = get_tenants()
+    for tenant in tenants or []:
+        sync_schema(schema=tenant.schema)
+        typer.echo(f"Schema synced - Tenant: {tenant.name}")
+
+
+@tenant_app.command("refresh-dashboards")
+def refresh_all_dashboards():
+    """Refresh the dashboard summaries of all the tenants (Ex: scheduled on the 1st of the month)"""
+    tenants = get_tenants()
+    for tenant in tenants or []:
+        refresh_dashboards(schema=tenant.schema)
+        typer.echo(f"Dashboards refreshed - Tenant: {tenant.name}")
+
+
+@tenant_app.command("snapshot-pipeline")
+def snapshot_all_pipelines(
+    snapshot_date: datetime = typer.Option(
+        None,
+        "--date",
+        formats=["%Y-%m-%d"],
+        help="Snapshot date. Default: today, after backfilling the dates missed since the last "
+        "snapshot",
+    ),
+):
+    """Take the daily pipeline snapshot of all the tenants (Ex: scheduled daily at 23:30)"""
+    snapshot_day: date | None = snapshot_date.date() if snapshot_date else None
+    tenants = get_tenants()
+    for tenant in tenants or []:
+        snapshot_pipeline(schema=tenant.schema, snapshot_date=snapshot_day)
+        typer.echo(
+            f"Pipeline snapshot taken - Tenant: {tenant.name} | "
+            f"Date: {snapshot_day or date.today()}"
+        )
+
+
+MaintenanceTask = Enum("MaintenanceTask", {name: name for name in MAINTENANCE_TASKS}, type=str)
+
+
+@app.command("run-all")
+def run_all_tenants(
+    task: MaintenanceTask = typer.Argument(..., help="Maintenance task"),
+    workers: int = typer.Option(4, help="Tenants processed in parallel"),
+    processes: bool = typer.Option(
+        False, help="Use a process pool (CPU-bound tasks) instead of a thread pool"
+    ),
+    checkpoint: Path = typer.Option(
+        None,
+        help="Checkpoint file, deleted once the task completed on all the tenants. "
+        "Default: <task>.checkpoint.jsonl",
+    ),
+    resume: bool = typer.Option(
+        False, help="Skip the tenants completed in the checkpoint of a failed or interrupted run"
+    ),
+):
+    """Run a maintenance task on all the tenants (Ex: nightly rescoring or reindexing)"""
+    checkpoint = checkpoint or Path(f"{task.value}.checkpoint.jsonl")
+    tenants = get_tenants() or []
+    start = perf_counter()
+    completed = failed = 0
+
+    for result in run_all(task.value, tenants, workers, processes, checkpoint, resume):
+        if result.error is None:
+            completed += 1
+            typer.echo(f"Done - Tenant: {result.name} | {result.seconds:.2f} s")
+        else:
+            failed += 1
+            typer.echo(f"Failed - Tenant: {result.name} | {result.error}", err=True)
+
+    skipped = len(tenants) - completed - failed
+    typer.echo(
+        f"{task.value}: {completed} done, {failed} failed, {skipped} skipped (already done) "
+        f"in {perf_counter() - start:.2f} s"
+    )
+    if failed:
+        typer.echo(f"Rerun with --resume to retry the failed tenants. Checkpoint: {checkpoint}")
+        raise typer.Exit(code=1)
+
+
+@app.command("index-advisor")
+def index_advisor(
+    schema: str = typer.Argument(..., help="Schema of the tenant in which the specs are explained"),
+    log_file: str = typer.Option(settings.QUERY_SPEC_LOG, help="Log of the filter and sort specs"),
+):
+    """Replay the logged filter and sort specs through EXPLAIN and report the missing indexes"""
+    if not log_file:
+        typer.echo("No spec log file. Set QUERY_SPEC_LOG or pass --log-file")
+        raise typer.Exit(code=1)
+
+    reports = advise(schema=schema, log_file=log_file)
+    missing = Counter()
+    for report in reports:
+        typer.echo(
+            f"[{report.count}x] {report.model} | filter: {report.filter} | sort: {report.sort}"
+        )
+        if report.error:
+            typer.echo(f"    Not explained: {report.error}")
+        for scan in report.scans:
+            typer.echo(f"    {scan}")
+        for column in report.missing:
+            typer.echo(f"    Missing index: {column}")
+            missing[column] += report.count
+
+    failed = sum(1 for report in reports if report.error)
+    typer.echo(f"\n{len(reports) - failed} distinct specs explained, {failed} failed")
+    for column, count in missing.most_common():
+        typer.echo(f"Missing index: {column} (used by {count} logged queries)")
+
+
 if __name__ == "__main__":
     app()